@@ -1,35 +1,61 @@
-import pandas as pd
 import numpy as np
+from trace_ingest import invocation_matrix_from_counts, normalize_matrix
+from demand_cache import convert_trace, has_trace, load_trace, select_apps, build_rollups, build_sparse_series, fold_sparse_series, load_rollup, save_demand_matrix, save_lambda
+from calibration import calibrate_lambda
 
 # Load dataset 
 # For real data, please refer to repository  : 
 #https://github.com/Azure/AzurePublicDataset/blob/master/AzureFunctionsInvocationTrace2021.md
-df = pd.read_csv('AzureFunctionsInvocationTraceForTwoWeeksJan2021.txt')
+trace_file = 'AzureFunctionsInvocationTraceForTwoWeeksJan2021.txt'   # or a list / glob, e.g. 'traces/*.txt.gz'
+number_of_apps = 10             # K apps (clients) in the demand matrix; the simulations use all of them
+app_selection = "count"         # "count": busiest K apps, "peak": most peak-hour (8 AM–8 PM) invocations,
+                                # "first": first K unique apps in file order (the shipped data.py)
+chunksize = 1_000_000           # Rows per chunk, memory stays flat regardless of trace size
+workers = None                  # Processes converting a multi-file trace, one file each (None = all cores)
+observed_Phi = 16.6667          # Flat price in force while the trace was recorded, for the λ_u calibration
+sparse_buckets = (60, 3600)     # Series (seconds per step) also cached as non-zero cells only (dsp_cli.py --sparse)
 
+# Step 1: One-time conversion of the CSV to columnar .npy files (app codes, end_timestamp, duration).
+# Reruns skip CSV parsing and memory-map the columns instead. Several files are parsed in parallel
+# and their app codes renumbered in file order, so the cache equals that of one concatenated file.
+# The same pass ranks apps by invocations and by peak-hour invocations with bounded-memory
+# heavy-hitter sketches, so no per-app count table is ever built.
+if not has_trace():
+    convert_trace(trace_file, chunksize=chunksize, workers=workers)
+trace = load_trace()
+selected_apps = select_apps(trace, number_of_apps, app_selection)
+# Columns in app name order everywhere (rollups, sparse series, demand matrix, λ_u, demand_apps.npy),
+# the order of the original groupby/unstack, so column k is the same app in every cached file
+selected_apps = selected_apps[np.argsort(trace["app_names"][selected_apps], kind="stable")]
 
-# Step 2: Convert end_timestamp (in seconds) to hour of the day
-df["hour"] = pd.to_datetime(df["end_timestamp"], unit='s').dt.hour
+# Steps 2-4: One pass over end_timestamp (in seconds) counts invocations per minute for the
+# selected apps; minute, hour, day and hour-of-day rollups (raw and normalized) are summed from it
+# and cached side by side, so other resolutions never need another trace scan. The sparse_buckets
+# series are also stored as non-zero cells only, which is all a minute series of many apps needs,
+# and the hourly one is folded into a sparse hour-of-day demand matrix for the 24-hour simulations
+build_rollups(trace, apps=selected_apps, block=chunksize)
+for bucket_seconds in sparse_buckets:
+    build_sparse_series(trace, apps=selected_apps, bucket_seconds=bucket_seconds, block=chunksize)
+if 3600 in sparse_buckets:
+    fold_sparse_series()
+counts = np.asarray(load_rollup("hour_of_day", normalized=False))
+apps = list(trace["app_names"][selected_apps])
+invocation_matrix = invocation_matrix_from_counts(counts, apps)    # already in name order, nothing is re-sorted
 
-# Step 3: Choose 10 unique app IDs
-unique_apps = df["app"].unique()[:10]  # First 10 unique apps
-df = df[df["app"].isin(unique_apps)]
+# Step 5: Normalize each column to 0–100 range
+normalized_matrix = normalize_matrix(invocation_matrix)
 
-# Step 4: Count invocations per hour per app
-invocation_matrix = (
-    df.groupby(["hour", "app"])
-    .size()
-    .unstack(fill_value=0)
-    .reindex(index=range(24), fill_value=0)  # Ensure 24 hours
-)
+# Step 6: Save the demand matrix to the cache (loaded by the simulations with np.load(mmap_mode="r"))
+save_demand_matrix(normalized_matrix.to_numpy(), invocation_matrix.to_numpy(), list(invocation_matrix.columns))
 
-# Step 5: Normalize each column to 0–100 range
-normalized_matrix = invocation_matrix.apply(lambda col: 
-    100 * (col - col.min()) / (col.max() - col.min()) if col.max() > col.min() else 0
-)
+# Step 7: Calibrate λ_u per app: the value at which the client model's optimal consumption
+# max(λ_u / φ - 1, 0) best fits the app's hourly δ_u at the observed price (cache/lambda.npy,
+# used by 05_ instead of the uniform λ_u)
+save_lambda(calibrate_lambda(normalized_matrix.to_numpy(), observed_Phi).Lambda)
 
-# Step 6: Save as a .py file with a variable
+# Step 8: Also save as a .py file with a variable
 with open("data.py", "w") as f:
-    f.write("data = [\n")
+    f.write("Delta_List = [\n")
     for row in normalized_matrix.to_numpy():
         formatted = ", ".join(f"{val:.2f}" for val in row)
         f.write(f"    [{formatted}],\n")
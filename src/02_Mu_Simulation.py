@@ -1,73 +1,56 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import minimize
 import sys
-from data import Delta_List
+from demand_cache import load_demand_matrix
+from sweep import sweep_hourly
+from sweep_runner import run_sweep
+from result_cache import open_result_cache
+from equilibrium import stackelberg_equilibrium
+from report import figure, line_panel, series, render_report, report_dir
 
-
-# Define utility functions for clients and provider
-def client_utility(Delta_u, Lambda_u, Phi):
-    # λ_u * log(1+ δ_u ) - δ_u * φ
-    result = Lambda_u * np.log(1 + Delta_u) -  (Delta_u * Phi )
-    #print("Delta_u=" , Delta_u ,",Lambda_u=" , Lambda_u , ",Phi= " , Phi , ",Lambda_u * np.log(1 + Delta_u)=" ,Lambda_u * np.log(1 + Delta_u) , ",Delta_u * Phi=" , Delta_u * Phi , ",result=" ,  result)
-    return result
-
-def provider_utility(Phi, Lambda_List, Mu):
-    # sum((λ_u / δ_u) -1) * (φ - μ )
-    Q = np.sum([optimal_consumption(Lambda_u, Phi) for Lambda_u in Lambda_List])
-    
-    return (Phi - Mu) * Q
-
-def optimal_consumption(Lambda_u, Phi):
-    #print ("Lambda_u=" , Lambda_u , "Phi = " , Phi)
-    # (λ_u / δ_u) -1
-    return max((Lambda_u / Phi) - 1, 0)
+Delta_List = load_demand_matrix()         # δ_u per hour and client, memory-mapped from the cache
 
 
 # Mu ranges from 6 to 16.6667, validated against Azure Functions 2021 Trace invocation patterns
 # Simulation parameters
 simulation_duration = 24        # 24 hours
-number_of_providers = 10        # Number of clients
+number_of_providers = Delta_List.shape[1]   # Number of clients: the K apps selected by the loader
 peak_hours_Phi = 16.6667        # for floating point numbers we assumed 0.00001667 GB-S for  100,000 function calls
 off_peak_hours_Phi = 8.333      # for  100,000 function calls
 Min_Mu = 6                          # Marginal cost for the provider for  100,000 function calls
+workers = 1                         # Worker processes for the μ sweep (1 = serial)
 
 Lambda_List = np.full(number_of_providers ,800 )  # Utility parameters for each client    
 
 
-Mu_list=[]
-provider_utility_list = []
+Mu_list = [Min_Mu + (peak_hours_Phi - Min_Mu )/10 * Mu_w for Mu_w in range(11)]
+Delta = np.asarray(Delta_List)[:simulation_duration, :number_of_providers]
+
+# Utility for every (μ, hour) in one sweep
+metrics, _ = run_sweep(Delta, {"Mu": np.array(Mu_list)},
+                       {"Lambda": Lambda_List[0], "peak_Phi": peak_hours_Phi, "off_peak_Phi": off_peak_hours_Phi},
+                       kernel=sweep_hourly, workers=workers,
+                       cache=open_result_cache())
+utility_grid = metrics["provider_utility"]
+provider_utility_list = list(np.sum(np.maximum(utility_grid, 0), axis=1))
+
 # Simulation
-for Mu_w in range(11):
-    Mu = Min_Mu + (peak_hours_Phi - Min_Mu )/10 * Mu_w 
-    Mu_list.append(Mu)
-    
-    this_hour_utility =0
+for Mu_w, Mu in enumerate(Mu_list):
     print ("*****************************")
     print ( "Mu = ", Mu)
     print ("*****************************")
     for hour in range(simulation_duration):
-        if 8 <= hour < 20:
-            Phi = peak_hours_Phi
-        else:
-            Phi = off_peak_hours_Phi
-        utility =  provider_utility(Phi, Lambda_List, Mu)
-        print("Hour=" , hour , ",utility =" ,utility)
-        if utility>0 :
-            this_hour_utility += utility
-        
-    provider_utility_list.append(this_hour_utility);
-   
-    # Results
-   
-        
-    
+        print("Hour=" , hour , ",utility =" ,utility_grid[Mu_w, hour])
 
-plt.plot(Mu_list, provider_utility_list, marker='x', label='Serverless utility function θ (Azure Functions 2021 Trace)')
+# Stackelberg equilibrium: the provider's best-response φ for every (μ, hour) instead of the fixed tariff
+equilibrium = stackelberg_equilibrium(np.broadcast_to(Lambda_List, (len(Mu_list), simulation_duration, number_of_providers)),
+                                      np.array(Mu_list)[:, None])
+for Mu_w, Mu in enumerate(Mu_list):
+    print("Mu = ", Mu, ",equilibrium Phi =", equilibrium["Phi"][Mu_w, 0],
+          ",equilibrium utility =", np.sum(equilibrium["provider_utility"][Mu_w]))
 
-plt.xlabel('μ')
-plt.ylabel('Serverless utility function(θ)')
 
-plt.xticks(Mu_list)
-plt.legend()
-plt.show()
+figures = [figure("provider_utility_by_mu", [
+    line_panel([series(provider_utility_list, x=Mu_list, marker='x',
+                       label='Serverless utility function θ (Azure Functions 2021 Trace)')],
+               xlabel='μ', ylabel='Serverless utility function(θ)', xticks=Mu_list)])]
+print("Report:", render_report(figures, report_dir("02_Mu_Simulation"), "μ sweep (Azure Functions 2021 Trace)"))
@@ -1,98 +1,58 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from data import Delta_List
+from demand_cache import load_demand_matrix, load_lambda
+from dsp_kernels import adaptive_price as adaptive_price_kernel
+from pricing_policies import time_of_use, evaluate_policies
+from load_shifting import peak_share
+from report import figure, line_panel, bar_panel, series, render_report, report_dir
+
+Delta_List = load_demand_matrix()         # δ_u per hour and client, memory-mapped from the cache
 
 # Simulation parameters
 simulation_duration = 24        # 24 hours
-number_of_providers = 10        # Number of developers
+number_of_providers = Delta_List.shape[1]   # Number of developers: the K apps selected by the loader
 peak_hours_Phi = 16.6667        # DSP price φ ($0.00001667 per GB-s) per 100,000 invocations, peak hours (8 AM–8 PM) [1]
 off_peak_hours_Phi = 8.333      # DSP price φ ($0.00000833 per GB-s) per 100,000 invocations, off-peak hours (8 PM–8 AM) [1]
 static_Phi = 16.6667            # Static price ($0.00001667 per GB-s) per 100,000 invocations [1]
 Mu = 6                          # Marginal cost μ per 100,000 invocations [30]
 Lambda_u = 800                  # λ_u: Client utility parameter per developer [33]
+flexibility = 0.3               # Share of its daily demand a developer moves towards cheaper hours (load_shifting.py)
 
 # Smith and Lee (2024) adaptive pricing parameters [6]
 adaptive_min_Phi = 12           # Minimum price ($0.000012 per GB-s) per 100,000 invocations
 adaptive_max_Phi = 20           # Maximum price ($0.000020 per GB-s) per 100,000 invocations
 
-# Define utility functions (from existing scripts)
-def client_utility(Delta_u, Lambda_u, Phi):
-    # λ_u * log(1 + δ_u) - δ_u * φ
-    return Lambda_u * np.log(1 + Delta_u) - (Delta_u * Phi)
-
-def provider_utility(Phi, Lambda_List, Mu):
-    # sum((λ_u / φ) - 1) * (φ - μ)
-    Q = np.sum([max((Lambda_u / Phi) - 1, 0) for Lambda_u in Lambda_List])
-    return (Phi - Mu) * Q
-
 # Adaptive pricing model (simplified linear regression approximation of Smith and Lee [6])
 def adaptive_price(hour, Delta_List):
     # Predict price based on previous hour's total invocations
-    if hour == 0:
-        return (adaptive_min_Phi + adaptive_max_Phi) / 2  # Initial price: midpoint
-    prev_invocations = sum(Delta_List[hour-1])  # Total δ_u for previous hour
-    # Linear mapping: min_invocations=700 (10*70), max_invocations=1000 (10*100)
-    normalized = (prev_invocations - 700) / (1000 - 700)
-    price = adaptive_min_Phi + normalized * (adaptive_max_Phi - adaptive_min_Phi)
-    return max(min(price, adaptive_max_Phi), adaptive_min_Phi)
+    # Linear mapping: min_invocations=70 per developer (700 for 10), max_invocations=100 per developer (1000 for 10)
+    return adaptive_price_kernel(hour, Delta_List, adaptive_min_Phi, adaptive_max_Phi,
+                                 70 * number_of_providers, 100 * number_of_providers)
 
 # Simulation
-Lambda_List = np.full(number_of_providers, Lambda_u)  # Uniform λ_u for all developers
-resource_utilization_dsp = []
-resource_utilization_adaptive = []
-provider_utility_dsp = []
-provider_utility_adaptive = []
-client_cost_dsp = []
-client_cost_adaptive = []
-client_cost_static = []
-
-for hour in range(simulation_duration):
-    # DSP pricing
-    Phi_dsp = peak_hours_Phi if 8 <= hour < 20 else off_peak_hours_Phi
-    # Adaptive pricing (Smith and Lee [6])
-    Phi_adaptive = adaptive_price(hour, Delta_List)
-    # Static pricing
-    Phi_static = static_Phi
-
-    hour_utilization_dsp = 0
-    hour_utilization_adaptive = 0
-    hour_cost_dsp = 0
-    hour_cost_adaptive = 0
-    hour_cost_static = 0
-
-    for provider in range(number_of_providers):
-        Delta_u = Delta_List[hour][provider]  # δ_u from Azure trace [33]
-
-        # DSP model
-        utility_dsp = client_utility(Delta_u, Lambda_List[provider], Phi_dsp)
-        if utility_dsp > 0 and Delta_u > 0:
-            hour_utilization_dsp += Delta_u
-            hour_cost_dsp += Delta_u * Phi_dsp
-
-        # Adaptive model
-        utility_adaptive = client_utility(Delta_u, Lambda_List[provider], Phi_adaptive)
-        if utility_adaptive > 0 and Delta_u > 0:
-            hour_utilization_adaptive += Delta_u
-            hour_cost_adaptive += Delta_u * Phi_adaptive
-
-        # Static model
-        hour_cost_static += Delta_u * Phi_static
-
-    resource_utilization_dsp.append(hour_utilization_dsp)
-    resource_utilization_adaptive.append(hour_utilization_adaptive)
-    provider_utility_dsp.append(provider_utility(Phi_dsp, Lambda_List, Mu))
-    provider_utility_adaptive.append(provider_utility(Phi_adaptive, Lambda_List, Mu))
-    client_cost_dsp.append(hour_cost_dsp / number_of_providers)
-    client_cost_adaptive.append(hour_cost_adaptive / number_of_providers)
-    client_cost_static.append(hour_cost_static / number_of_providers)
-
-# Calculate total costs and savings
-total_cost_dsp = sum(client_cost_dsp) * number_of_providers
-total_cost_adaptive = sum(client_cost_adaptive) * number_of_providers
-total_cost_static = sum(client_cost_static) * number_of_providers
-
-cost_savings_dsp = (total_cost_static - total_cost_dsp) / total_cost_static * 100
-cost_savings_adaptive = (total_cost_static - total_cost_adaptive) / total_cost_static * 100
+# λ_u per developer calibrated from the trace by the loader (calibration.py), uniform λ_u without a calibration
+Lambda_List = load_lambda(np.full(number_of_providers, Lambda_u))
+Delta = np.asarray(Delta_List)[:simulation_duration, :number_of_providers]  # δ_u from Azure trace [33]
+hours = np.arange(simulation_duration)
+
+# DSP pricing and adaptive pricing (Smith and Lee [6]) evaluated together: axes (policy, hour).
+# More policies (tiered, schedule, user-defined callables) can be added to this dict.
+policies = {
+    "DSP": time_of_use(peak_hours_Phi, off_peak_hours_Phi),
+    "Adaptive [6]": lambda Delta: adaptive_price(hours, Delta),
+}
+result = evaluate_policies(policies, Delta, Lambda_List, Mu, static_Phi)
+metrics = result["metrics"]
+
+resource_utilization_dsp, resource_utilization_adaptive = metrics["resource_utilization"]
+provider_utility_dsp, provider_utility_adaptive = metrics["provider_utility"]
+client_cost_dsp, client_cost_adaptive = metrics["cost_dynamic"] / number_of_providers
+# Static model
+client_cost_static = np.sum(Delta * static_Phi, axis=-1) / number_of_providers
+
+# Total costs and savings against the static model
+total_cost_dsp, total_cost_adaptive = result["totals"]["total_cost"]
+total_cost_static = result["total_cost_static"]
+cost_savings_dsp, cost_savings_adaptive = result["totals"]["cost_savings"]
 
 # Print results
 print(f"DSP Cost Savings: {cost_savings_dsp:.2f}%")
@@ -100,45 +60,44 @@ print(f"Adaptive Pricing [6] Cost Savings: {cost_savings_adaptive:.2f}%")
 print(f"DSP Provider Utility: {sum(provider_utility_dsp):.2f}")
 print(f"Adaptive Provider Utility: {sum(provider_utility_adaptive):.2f}")
 
-# Plot results
-plt.figure(figsize=(12, 8))
-
-# Resource Utilization
-plt.subplot(2, 2, 1)
-plt.plot(resource_utilization_dsp, marker='x', label='DSP')
-plt.plot(resource_utilization_adaptive, marker='s', label='Adaptive [6]')
-plt.title('A. Resource Utilization')
-plt.xlabel('Hour')
-plt.ylabel('Number of Functions (δ)')
-plt.legend()
-
-# Provider Utility
-plt.subplot(2, 2, 2)
-plt.plot(provider_utility_dsp, marker='x', label='DSP')
-plt.plot(provider_utility_adaptive, marker='s', label='Adaptive [6]')
-plt.title('B. Provider Utility')
-plt.xlabel('Hour')
-plt.ylabel('Utility Function (θ)')
-plt.legend()
-
-# Client Cost
-plt.subplot(2, 2, 3)
-plt.plot(client_cost_dsp, marker='x', label='DSP')
-plt.plot(client_cost_adaptive, marker='s', label='Adaptive [6]')
-plt.plot(client_cost_static, marker='o', label='Static')
-plt.title('C. Average Developer Cost')
-plt.xlabel('Hour')
-plt.ylabel('Cost ($)')
-plt.legend()
-
-# Total Cost Savings
-plt.subplot(2, 2, 4)
-labels = ['DSP', 'Adaptive [6]']
-savings = [cost_savings_dsp, cost_savings_adaptive]
-plt.bar(labels, savings)
-plt.title('D. Total Cost Savings')
-plt.ylabel('Savings (%)')
-
-plt.tight_layout()
-plt.savefig('dsp_vs_adaptive_comparison.png')
-plt.show()
+# Load shifting: developers move part of their daily demand to the hours each tariff makes cheaper
+shifted = evaluate_policies(policies, Delta, Lambda_List, Mu, static_Phi, flexibility=flexibility, window=simulation_duration)
+shifted_metrics = shifted["metrics"]
+resource_utilization_dsp_shifted, resource_utilization_adaptive_shifted = shifted_metrics["resource_utilization"]
+client_cost_dsp_shifted, client_cost_adaptive_shifted = shifted_metrics["cost_dynamic"] / number_of_providers
+cost_savings_dsp_shifted, cost_savings_adaptive_shifted = shifted["totals"]["cost_savings"]
+peak = policies["DSP"](Delta) == peak_hours_Phi
+print(f"DSP Cost Savings with load shifting ({flexibility:.0%} flexible): {cost_savings_dsp_shifted:.2f}%")
+print(f"Adaptive Pricing [6] Cost Savings with load shifting: {cost_savings_adaptive_shifted:.2f}%")
+print(f"Peak-hour share of utilization under DSP: {peak_share(resource_utilization_dsp, peak):.2%} -> "
+      f"{peak_share(resource_utilization_dsp_shifted, peak):.2%}")
+
+# Plot results (off-screen, report.py)
+figures = [figure("dsp_vs_adaptive_comparison", [
+    # Resource Utilization
+    line_panel([series(resource_utilization_dsp, marker='x', label='DSP'),
+                series(resource_utilization_adaptive, marker='s', label='Adaptive [6]')],
+               'A. Resource Utilization', 'Hour', 'Number of Functions (δ)'),
+    # Provider Utility
+    line_panel([series(provider_utility_dsp, marker='x', label='DSP'),
+                series(provider_utility_adaptive, marker='s', label='Adaptive [6]')],
+               'B. Provider Utility', 'Hour', 'Utility Function (θ)'),
+    # Client Cost
+    line_panel([series(client_cost_dsp, marker='x', label='DSP'),
+                series(client_cost_adaptive, marker='s', label='Adaptive [6]'),
+                series(client_cost_static, marker='o', label='Static')],
+               'C. Average Developer Cost', 'Hour', 'Cost ($)'),
+    # Total Cost Savings
+    bar_panel(['DSP', 'Adaptive [6]'], [cost_savings_dsp, cost_savings_adaptive], 'D. Total Cost Savings', 'Savings (%)'),
+], layout=(2, 2), figsize=(12, 8)), figure("load_shifting", [
+    line_panel([series(resource_utilization_dsp, marker='x', label='DSP'),
+                series(resource_utilization_dsp_shifted, marker='o', label='DSP (shifted)'),
+                series(resource_utilization_adaptive_shifted, marker='s', label='Adaptive [6] (shifted)')],
+               'A. Resource Utilization with Load Shifting', 'Hour', 'Number of Functions (δ)'),
+    line_panel([series(client_cost_static, marker='o', label='Static'),
+                series(client_cost_dsp, marker='x', label='DSP'),
+                series(client_cost_dsp_shifted, marker='+', label='DSP (shifted)'),
+                series(client_cost_adaptive_shifted, marker='s', label='Adaptive [6] (shifted)')],
+               'B. Average Developer Cost with Load Shifting', 'Hour', 'Cost ($)'),
+], layout=(1, 2), figsize=(12, 4))]
+print("Report:", render_report(figures, report_dir("05_DSP_vs_Adaptive_Simulation"), "DSP vs adaptive pricing [6]"))
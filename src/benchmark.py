@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from dsp_kernels import dsp_price, hourly_metrics, provider_utility, cost_savings, adaptive_price
+from sweep import sweep_utilities
+from synthetic_trace import generate_csv
+
+# Benchmarks of the simulation stages on synthetic workloads of increasing size:
+#
+#   ingest    streaming trace ingestion (trace_ingest.stream_invocation_counts)   rows/s
+#   files     the same trace split into ingest_files files, ingested in parallel  rows/s
+#             (trace_ingest.parallel_invocation_counts, one worker per file)
+#   hourly    hour x client loop of 01_/05_ (dsp_kernels.hourly_metrics)          client-hours/s
+#   provider  provider_utility for every hour (dsp_kernels.provider_utility)      client-hours/s
+#   grid      μ x λ utility surfaces of 03_/04_ (sweep.sweep_utilities)           cells/s
+#   index     price sweep answered from the sorted price-response index          price-client-hours/s
+#             (price_index, built and queried; 100 prices per case)
+#   calibrate per-app λ fit to the demand under the DSP tariff (calibration)      client-hours/s
+#   shift     daily load shifting of every client under the DSP tariff           client-hours/s
+#             (load_shifting.shift_demand, 30% of the demand movable)
+#   schedule  per-hour price schedule with a 20% developer saving and 60%         client-hours/s
+#             participation over a two-week matrix (schedule_optimizer)
+#   sparse    DSP and adaptive hourly metrics over a minute-level matrix with 1% entries/s
+#             non-zero cells (sparse_demand.hourly_metrics)
+#   events    worker-pool replay of a synthetic columnar trace (event_sim)        events/s
+#
+# Every case records wall time, peak traced memory and throughput. Before timing anything the
+# kernels are checked against the cost_savings printed by the original scripts on data.py,
+# and the sparse kernel against the dense one, so a speedup cannot silently change the results.
+#
+#   python benchmark.py [--full] [--out benchmark_results.json]
+
+# cost_savings printed by 01_Lambda_simulation.py for λ = 100..900 (λ = 0 prints no savings)
+reference_lambda_cost_savings = {
+    100: 44.67278295891647,
+    200: 37.423390350820256,
+    300: 31.273498432432373,
+    400: 26.730677924362645,
+    500: 26.730677924362645,
+    600: 26.730677924362645,
+    700: 26.730677924362645,
+    800: 26.730677924362645,
+    900: 26.730677924362645,
+}
+# Printed by 05_DSP_vs_Adaptive_Simulation.py (rounded to 2 decimals)
+reference_compare = {"dsp_cost_savings": 26.73, "adaptive_cost_savings": 26.63,
+                     "dsp_provider_utility": 86757.34, "adaptive_provider_utility": 95520.00}
+rtol = 1e-9
+
+quick_sizes = {
+    "ingest": [10_000, 100_000],
+    "files": [100_000],
+    "hourly": [(10, 24), (1_000, 24), (1_000, 336)],
+    "provider": [(10, 24), (1_000, 336)],
+    "grid": [10 ** 2, 10 ** 4],
+    "index": [(1_000, 24), (100_000, 24)],
+    "calibrate": [(1_000, 24), (10_000, 336)],
+    "shift": [(1_000, 24), (10_000, 336)],
+    "schedule": [(1_000, 336)],
+    "sparse": [(1_000, 20_160)],
+    "events": [100_000],
+}
+full_sizes = {
+    "ingest": [10_000, 100_000, 1_000_000, 10_000_000],
+    "files": [1_000_000, 10_000_000],
+    "hourly": [(10, 24), (1_000, 24), (100_000, 24), (10, 336), (1_000, 336), (10_000, 336)],
+    "provider": [(10, 24), (1_000, 24), (100_000, 24), (100_000, 336)],
+    "grid": [10 ** 2, 10 ** 4, 10 ** 6],
+    "index": [(1_000, 24), (100_000, 24), (1_000_000, 24)],
+    "calibrate": [(1_000, 24), (100_000, 24), (100_000, 336)],
+    "shift": [(1_000, 24), (100_000, 24), (100_000, 336)],
+    "schedule": [(1_000, 336), (100_000, 336)],
+    "sparse": [(1_000, 20_160), (100_000, 20_160)],
+    "events": [100_000, 10_000_000],
+}
+index_prices = 100
+sparse_density = 0.01           # share of non-zero (minute, app) cells in the sparse case
+ingest_files = 4
+peak_hours_Phi = 16.6667
+off_peak_hours_Phi = 8.333
+Mu = 6
+Lambda_u = 800
+
+
+def synthetic_demand(hours, apps, seed=0):
+    # δ_u in 0–100 like the normalized Azure matrix
+    return np.random.default_rng(seed).uniform(0, 100, size=(hours, apps))
+
+
+def synthetic_sparse_demand(steps, apps, density=sparse_density, seed=0):
+    # About density * steps * apps non-zero δ_u in 0–100 at random cells
+    from sparse_demand import SparseDemand
+    rng = np.random.default_rng(seed)
+    key = np.unique(rng.integers(0, steps * apps, int(density * steps * apps)))
+    return SparseDemand(key // apps, key % apps, rng.uniform(0, 100, len(key)), (steps, apps))
+
+
+def check_correctness():
+    # Re-run the 01_ λ loop and the 05_ comparison through the kernels on the shipped data.py
+    from data import Delta_List
+    Delta = np.asarray(Delta_List, dtype=np.float64)
+    hours = np.arange(Delta.shape[0])
+    Phi = dsp_price(hours, peak_hours_Phi, off_peak_hours_Phi)
+    failures = []
+
+    Lambda_values = np.array(sorted(reference_lambda_cost_savings), dtype=np.float64)
+    metrics = hourly_metrics(Delta, Lambda_values[:, None, None], Phi, Mu, peak_hours_Phi)
+    savings = cost_savings(metrics["cost_static"].sum(axis=-1), metrics["cost_dynamic"].sum(axis=-1))
+    for Lambda, value in zip(Lambda_values, savings):
+        expected = reference_lambda_cost_savings[int(Lambda)]
+        if not np.isclose(value, expected, rtol=rtol, atol=0):
+            failures.append(f"lambda={Lambda:g}: cost_savings {value!r} != {expected!r}")
+
+    Phi_both = np.stack([Phi, adaptive_price(hours, Delta)])
+    metrics = hourly_metrics(Delta, Lambda_u, Phi_both, Mu, peak_hours_Phi)
+    total_static = np.sum(Delta * peak_hours_Phi)
+    savings = cost_savings(np.full(2, total_static), metrics["cost_dynamic"].sum(axis=-1))
+    utility = metrics["provider_utility"].sum(axis=-1)
+    measured = {"dsp_cost_savings": savings[0], "adaptive_cost_savings": savings[1],
+                "dsp_provider_utility": utility[0], "adaptive_provider_utility": utility[1]}
+    for name, expected in reference_compare.items():
+        if round(float(measured[name]), 2) != expected:
+            failures.append(f"compare {name}: {measured[name]:.2f} != {expected:.2f}")
+
+    from sparse_demand import as_sparse, hourly_metrics as sparse_hourly_metrics
+    sparse = sparse_hourly_metrics(as_sparse(Delta), Lambda_u, Phi_both, Mu, peak_hours_Phi)
+    for name, values in metrics.items():
+        if not np.allclose(sparse[name], values, rtol=rtol, atol=0):
+            failures.append(f"sparse {name} differs from the dense kernel")
+    return failures
+
+
+def measure(stage, size, work, unit, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"stage": stage, "size": size, "seconds": seconds, "peak_bytes": peak,
+            "throughput": work / seconds if seconds > 0 else float("inf"), "unit": unit}
+
+
+def bench_ingest(rows, tmp):
+    from trace_ingest import stream_invocation_counts
+    path = os.path.join(tmp, f"trace_{rows}.csv")
+    generated = generate_csv(path, rows, apps=100)
+    return measure("ingest", generated, generated, "rows/s", lambda: stream_invocation_counts(path, 10))
+
+
+def bench_files(rows, tmp):
+    # Rows split into ingest_files CSV files with the header repeated, counted in parallel
+    from trace_ingest import parallel_invocation_counts
+    path = os.path.join(tmp, f"trace_{rows}.csv")
+    generated = generate_csv(path, rows, apps=100)
+    per_file = -(-generated // ingest_files)
+    paths = [os.path.join(tmp, f"trace_{rows}_{k}.csv") for k in range(ingest_files)]
+    with open(path) as f:
+        header = f.readline()
+        for part in paths:
+            with open(part, "w") as out:
+                out.write(header)
+                out.writelines(line for _, line in zip(range(per_file), f))
+    return measure("files", generated, generated, "rows/s",
+                   lambda: parallel_invocation_counts(paths, 10, workers=ingest_files))
+
+
+def bench_hourly(size):
+    apps, hours = size
+    Delta = synthetic_demand(hours, apps)
+    Phi = dsp_price(np.arange(hours), peak_hours_Phi, off_peak_hours_Phi)
+    return measure("hourly", list(size), apps * hours, "client-hours/s",
+                   lambda: hourly_metrics(Delta, Lambda_u, Phi, Mu, peak_hours_Phi))
+
+
+def bench_provider(size):
+    apps, hours = size
+    Lambda_List = np.random.default_rng(1).uniform(0, 900, apps)
+    Phi = dsp_price(np.arange(hours), peak_hours_Phi, off_peak_hours_Phi)
+    return measure("provider", list(size), apps * hours, "client-hours/s",
+                   lambda: provider_utility(Phi, Lambda_List, Mu))
+
+
+def bench_grid(cells):
+    side = int(round(np.sqrt(cells)))
+    Delta = synthetic_demand(24, 10)
+    axes = {"Lambda": np.linspace(100, 900, side), "Mu": np.linspace(6, 8, side)}
+    return measure("grid", side * side, side * side, "cells/s", lambda: sweep_utilities(Delta, axes))
+
+
+def bench_index(size):
+    from price_index import price_response_index, indexed_hourly_metrics
+    apps, hours = size
+    Delta = synthetic_demand(hours, apps)
+    Lambda_List = np.random.default_rng(1).uniform(0, 900, apps)
+    Phi = np.random.default_rng(2).uniform(1, 30, (index_prices, hours))
+    return measure("index", list(size), index_prices * apps * hours, "price-client-hours/s",
+                   lambda: indexed_hourly_metrics(price_response_index(Delta, Lambda_List), Phi, Mu, peak_hours_Phi))
+
+
+def bench_calibrate(size):
+    from calibration import calibrate_lambda
+    apps, hours = size
+    Delta = synthetic_demand(hours, apps)
+    Phi = dsp_price(np.arange(hours), peak_hours_Phi, off_peak_hours_Phi)
+    return measure("calibrate", list(size), apps * hours, "client-hours/s", lambda: calibrate_lambda(Delta, Phi))
+
+
+def bench_shift(size):
+    from load_shifting import shift_demand
+    apps, hours = size
+    Delta = synthetic_demand(hours, apps)
+    Phi = dsp_price(np.arange(hours), peak_hours_Phi, off_peak_hours_Phi)
+    return measure("shift", list(size), apps * hours, "client-hours/s",
+                   lambda: shift_demand(Delta, Lambda_u, Phi, window=24))
+
+
+def bench_schedule(size):
+    from schedule_optimizer import slot_table, optimize_schedule
+    apps, hours = size
+    Delta = synthetic_demand(hours, apps)
+    return measure("schedule", list(size), apps * hours, "client-hours/s",
+                   lambda: optimize_schedule(slot_table(Delta, Lambda_u, Mu), min_savings=20, min_participation=0.6))
+
+
+def bench_sparse(size):
+    from sparse_demand import step_totals, hourly_metrics as sparse_hourly_metrics
+    apps, steps = size
+    demand = synthetic_sparse_demand(steps, apps)
+    step = np.arange(steps)
+    Phi = np.stack([dsp_price(step // 60, peak_hours_Phi, off_peak_hours_Phi),
+                    adaptive_price(step, step_totals(demand), 12, 20, 70 * apps, 100 * apps)])
+    return measure("sparse", list(size), len(demand.value), "entries/s",
+                   lambda: sparse_hourly_metrics(demand, Lambda_u, Phi, Mu, peak_hours_Phi))
+
+
+def bench_events(rows, tmp):
+    from synthetic_trace import generate_columns
+    from demand_cache import load_trace
+    from event_sim import simulate_trace
+    cache = os.path.join(tmp, f"events_{rows}")
+    generated = generate_columns(rows, 1000, cache)
+    trace = load_trace(cache)
+    return measure("events", generated, generated, "events/s", lambda: simulate_trace(trace, cache=cache))
+
+
+def run(sizes):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes["ingest"]:
+            results.append(bench_ingest(rows, tmp))
+        for rows in sizes["files"]:
+            results.append(bench_files(rows, tmp))
+        for rows in sizes["events"]:
+            results.append(bench_events(rows, tmp))
+    results += [bench_hourly(size) for size in sizes["hourly"]]
+    results += [bench_provider(size) for size in sizes["provider"]]
+    results += [bench_grid(cells) for cells in sizes["grid"]]
+    results += [bench_index(size) for size in sizes["index"]]
+    results += [bench_calibrate(size) for size in sizes["calibrate"]]
+    results += [bench_shift(size) for size in sizes["shift"]]
+    results += [bench_schedule(size) for size in sizes["schedule"]]
+    results += [bench_sparse(size) for size in sizes["sparse"]]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DSP simulation stages")
+    parser.add_argument("--full", action="store_true", help="run up to 100k apps, 336 hours and 10^6 grid cells")
+    parser.add_argument("--out", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    failures = check_correctness()
+    if failures:
+        print("Correctness check failed:")
+        for failure in failures:
+            print("  " + failure)
+        sys.exit(1)
+    print("Correctness check passed")
+
+    results = run(full_sizes if args.full else quick_sizes)
+    for r in results:
+        print(f"{r['stage']:9s} {str(r['size']):>14s} {r['seconds']:9.4f}s "
+              f"{r['peak_bytes'] / 2 ** 20:9.1f} MiB {r['throughput']:14.4g} {r['unit']}")
+    with open(args.out, "w") as f:
+        json.dump({"correctness": "passed", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import instrumentation
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Per-app λ_u calibration from observed demand, with the client model of dsp_kernels: under the
+# price φ_h in force in hour h a client consumes optimal_consumption(λ_u, φ_h) = max(λ_u / φ_h - 1, 0).
+# λ_u is the least-squares fit of that response to the observed δ_uh over all hours,
+#
+#   min_λ  sum_h (max(λ / φ_h - 1, 0) - δ_uh)^2
+#
+# Between two consecutive prices of the tariff the set of responding hours (φ_h < λ) is fixed,
+# so the objective is a quadratic in λ on each segment. With the hours sorted by price, prefix
+# sums give every segment's closed-form minimum (clipped to the segment) and its residual, and
+# the best segment wins. All apps of a block are fitted at once as (apps, segments) arrays; blocks
+# of block_apps bound the memory and can be spread over a process pool.
+#
+# Under a flat price (the trace was recorded at one price) this is λ_u = φ * mean(1 + δ_uh), the
+# value at which the client's optimal consumption is its average observed demand. Apps that never
+# consume get λ_u = 0.
+
+LambdaFit = namedtuple("LambdaFit", ["Lambda", "rmse", "responsive_hours"])
+
+block_apps = 10_000             # apps per fitted block / parallel task
+
+
+def _prefix(values):
+    # out[k] = sum(values[:k]) along the first (hour) axis
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+
+def fit_lambda(Delta, Phi):
+    # λ_u for every client column of Delta (hours, clients) under prices Phi (scalar or (hours,))
+    Delta = np.asarray(Delta, dtype=np.float64)
+    Phi = np.broadcast_to(np.asarray(Phi, dtype=np.float64), Delta.shape[:1])
+    if np.any(Phi <= 0):
+        raise ValueError("prices must be positive")
+    order = np.argsort(Phi, kind="stable")
+    Phi_sorted = Phi[order]
+    x = (1 / Phi_sorted)[:, None]
+    D = Delta[order]                                    # hours by rising price
+
+    # Segment k: the k cheapest hours respond, λ in [Phi_sorted[k - 1], Phi_sorted[k]]
+    low = np.concatenate([[0.0], Phi_sorted])[:, None]
+    high = np.concatenate([Phi_sorted, [np.inf]])[:, None]
+    S_xx = _prefix(x * x)
+    S_xy = _prefix(x * (1 + D))                         # sum of x_h * (1 + δ_h) over responding hours
+    S_dd = _prefix(D * D)
+    S_yy = S_dd + 2 * _prefix(D) + np.arange(len(Phi) + 1)[:, None]
+    idle = S_dd[-1] - S_dd                              # sum of δ_h^2 over the other hours
+    Lambda = np.clip(np.divide(S_xy, S_xx, out=np.zeros_like(S_xy), where=S_xx > 0), low, high)
+    residual = Lambda * Lambda * S_xx - 2 * Lambda * S_xy + S_yy + idle
+
+    best = np.argmin(residual, axis=0)[None]
+    consumes = np.any(D > 0, axis=0)
+    rss = np.maximum(np.take_along_axis(residual, best, axis=0)[0], 0.0)
+    return LambdaFit(np.where(consumes, np.take_along_axis(Lambda, best, axis=0)[0], 0.0),
+                     np.sqrt(rss / max(len(Phi), 1)), np.where(consumes, best[0], 0))
+
+
+def _fit_block(start, Delta, Phi, block):
+    return fit_lambda(np.asarray(Delta[:, start:start + block]), Phi)
+
+
+def calibrate_lambda(Delta, Phi, workers=1, block=block_apps):
+    # LambdaFit over all client columns, block by block (in a process pool with workers > 1)
+    from sweep_runner import pool_context
+    starts = range(0, np.shape(Delta)[1], block)
+    task = partial(_fit_block, Delta=Delta, Phi=Phi, block=block)
+    with instrumentation.stage("calibrate_lambda"):
+        if workers == 1 or len(starts) == 1:
+            parts = [task(start) for start in starts]
+        else:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=pool_context()) as pool:
+                parts = list(pool.map(task, starts))
+    instrumentation.count("calibrated_apps", np.shape(Delta)[1])
+    if not parts:
+        return LambdaFit(np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.intp))
+    return LambdaFit(*(np.concatenate(values) for values in zip(*parts)))
@@ -0,0 +1,517 @@
+import os
+import shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import instrumentation
+
+# Columnar, memory-mapped cache of the raw trace and of the hourly demand matrix.
+# Everything is a plain .npy file so it loads with np.load(mmap_mode="r") and no copy.
+#
+#   cache/trace/app.npy            int32   app code per invocation (first-seen order for converted traces,
+#                                          over all files of a multi-file trace in order)
+#   cache/trace/end_timestamp.npy  float64 seconds
+#   cache/trace/duration.npy       float64 seconds
+#   cache/trace/app_names.npy      str     app ID per code
+#   cache/trace/arrival_order.npy  int64   row numbers grouped by arrival hour (event_sim.arrival_index)
+#   cache/trace/heavy_hitters_<by>.npy int64 [code, count, error] rows of the busiest apps by invocations
+#                                          (count) or by peak-hour invocations (peak), largest first
+#   cache/demand_matrix.npy        float64 hour x app, normalized 0–100 (Delta_List)
+#   cache/invocation_matrix.npy    int64   hour x app, raw counts
+#   cache/demand_apps.npy          str     app ID per column
+#   cache/lambda.npy               float64 calibrated λ_u per column of the demand matrix (calibration.py)
+#   cache/invocation_series_<b>.npy int64  bucket x app counts over the whole trace (b = 60s, 3600s,
+#                                          86400s, ... or hour_of_day), first apps in code order or the
+#                                          selected apps in selection order
+#   cache/demand_series_<b>.npy    float64 the same, normalized 0–100 per app
+#   cache/sparse_series_<b>_*.npy          the same series as non-zero cells only (build_sparse_series):
+#                                          _step, _client int64 sorted by (step, client), _count int64,
+#                                          _value float64 normalized 0–100, _shape (steps, apps); b =
+#                                          hour_of_day is the hourly one folded (fold_sparse_series), the
+#                                          demand matrix without its zero cells
+
+cache_dir = os.environ.get("DSP_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+trace_columns = {"app": np.int32, "end_timestamp": np.float64, "duration": np.float64}
+copy_block = 1 << 24            # bytes per copy when finalizing a column
+default_chunksize = 1_000_000   # rows per chunk, same as trace_ingest
+seconds_per_hour = 3600
+hours_per_day = 24
+rollup_buckets = {"minute": 60, "hour": 3600, "day": 86400, "hour_of_day": "hour_of_day"}
+app_rankings = ("count", "peak")    # heavy-hitter rankings kept while converting the trace
+app_selections = ("first",) + app_rankings
+
+# pandas and trace_ingest are imported inside the functions that parse or bucket the trace,
+# so loading the cache only costs a NumPy import
+
+
+def trace_dir(cache=None):
+    return os.path.join(cache or cache_dir, "trace")
+
+
+def finalize_column(raw_paths, npy_path, dtype):
+    # Concatenate raw column parts behind a .npy header, then drop the raw files
+    dtype = np.dtype(dtype)
+    if isinstance(raw_paths, str):
+        raw_paths = [raw_paths]
+    rows = sum(os.path.getsize(path) for path in raw_paths) // dtype.itemsize
+    with open(npy_path, "wb") as f:
+        np.lib.format.write_array_header_1_0(
+            f, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)})
+        for path in raw_paths:
+            with open(path, "rb") as raw:
+                shutil.copyfileobj(raw, f, copy_block)
+            os.remove(path)
+    return rows
+
+
+def write_raw_columns(chunks, out_dir, suffix=".raw"):
+    # Append each chunk's columns (dicts of arrays keyed like trace_columns) to raw files
+    os.makedirs(out_dir, exist_ok=True)
+    raw_files = {name: open(os.path.join(out_dir, name + suffix), "wb") for name in trace_columns}
+    try:
+        for columns in chunks:
+            for name, dtype in trace_columns.items():
+                raw_files[name].write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+    finally:
+        for f in raw_files.values():
+            f.close()
+    return [os.path.join(out_dir, name + suffix) for name in trace_columns]
+
+
+def finalize_trace(out_dir, app_names, suffixes=(".raw",)):
+    # Turn the raw column parts (in `suffixes` order) into the cached .npy columns
+    rows = 0
+    for name, dtype in trace_columns.items():
+        rows = finalize_column([os.path.join(out_dir, name + suffix) for suffix in suffixes],
+                               os.path.join(out_dir, name + ".npy"), dtype)
+    np.save(os.path.join(out_dir, "app_names.npy"), np.asarray(app_names, dtype=str))
+    return rows
+
+
+def _peak_rows(end_timestamp):
+    from dsp_kernels import peak_start, peak_end
+    from trace_ingest import hour_of_day
+    hour = hour_of_day(end_timestamp)
+    return (peak_start <= hour) & (hour < peak_end)
+
+
+def _rank_chunk(sketches, app, end_timestamp):
+    # Feed one chunk of app codes to the count and peak-hour heavy-hitter sketches
+    sketches["count"].update(app)
+    sketches["peak"].update(app[_peak_rows(end_timestamp)])
+
+
+def _convert_file(item, out_dir, chunksize, capacity):
+    # Raw column parts of one trace file, app codes in first-seen order within that file,
+    # and heavy-hitter sketches of those codes
+    import pandas as pd
+    from heavy_hitters import MisraGries
+    from trace_ingest import read_trace_chunks
+    path, suffix = item
+    app_codes = {}
+    sketches = {by: MisraGries(capacity) for by in app_rankings}
+
+    def columns():
+        for chunk in read_trace_chunks(path, tuple(trace_columns), chunksize):
+            for app in pd.unique(chunk["app"]):
+                if app not in app_codes:
+                    app_codes[app] = len(app_codes)
+            columns = {
+                "app": chunk["app"].map(app_codes).to_numpy(np.int32),
+                "end_timestamp": chunk["end_timestamp"].to_numpy(np.float64),
+                "duration": chunk["duration"].to_numpy(np.float64),
+            }
+            _rank_chunk(sketches, columns["app"], columns["end_timestamp"])
+            yield columns
+
+    write_raw_columns(columns(), out_dir, suffix)
+    return list(app_codes), sketches
+
+
+def _recode_part(path, codes, block):
+    # Rewrite a raw app column part from file-local to trace-wide codes, in place
+    if np.array_equal(codes, np.arange(len(codes))) or not os.path.getsize(path):
+        return
+    part = np.memmap(path, dtype=trace_columns["app"], mode="r+")
+    for start in range(0, len(part), block):
+        part[start:start + block] = codes[part[start:start + block]]
+    part.flush()
+    del part
+
+
+def save_heavy_hitters(sketches, cache=None):
+    for by, sketch in sketches.items():
+        np.save(os.path.join(trace_dir(cache), f"heavy_hitters_{by}.npy"), sketch.table())
+
+
+def convert_trace(path, cache=None, chunksize=default_chunksize, workers=None, capacity=None):
+    # One-time conversion of the CSV trace to columnar .npy files, streamed chunk by chunk.
+    # `path` may be a list or glob of (compressed) files: each is converted by its own worker with
+    # local app codes, which are then renumbered in trace order, the same as one concatenated file.
+    # The same pass ranks the apps with bounded-memory heavy-hitter sketches (see select_apps).
+    from heavy_hitters import MisraGries, default_capacity
+    from sweep_runner import pool_context
+    from trace_ingest import trace_files
+    files = trace_files(path)
+    out_dir = trace_dir(cache)
+    suffixes = [".raw"] if len(files) == 1 else [f".{index:06d}.raw" for index in range(len(files))]
+    capacity = capacity or default_capacity
+    task = partial(_convert_file, out_dir=out_dir, chunksize=chunksize, capacity=capacity)
+    workers = min(workers or os.cpu_count() or 1, len(files))
+
+    with instrumentation.stage("convert_trace"):
+        if workers == 1:
+            parts = [task(item) for item in zip(files, suffixes)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+                parts = list(pool.map(task, zip(files, suffixes)))
+        app_codes = {}
+        sketches = {by: MisraGries(capacity) for by in app_rankings}
+        for (apps, file_sketches), suffix in zip(parts, suffixes):
+            for app in apps:
+                app_codes.setdefault(app, len(app_codes))
+            codes = np.array([app_codes[app] for app in apps], dtype=trace_columns["app"])
+            _recode_part(os.path.join(out_dir, "app" + suffix), codes, chunksize)
+            for by, sketch in file_sketches.items():
+                if sketch.keys is not None:
+                    sketch.keys = codes[sketch.keys]
+                sketches[by].merge(sketch)
+        rows = finalize_trace(out_dir, list(app_codes), suffixes)
+        save_heavy_hitters(sketches, cache)
+    instrumentation.count("trace_files", len(files))
+    instrumentation.count("trace_rows", rows)
+    return rows
+
+
+def has_trace(cache=None):
+    return os.path.exists(os.path.join(trace_dir(cache), "app_names.npy"))
+
+
+def load_trace(cache=None):
+    # Zero-copy views of the columnar trace
+    out_dir = trace_dir(cache)
+    instrumentation.count("cache_hits")
+    trace = {name: np.load(os.path.join(out_dir, name + ".npy"), mmap_mode="r") for name in trace_columns}
+    trace["app_names"] = np.load(os.path.join(out_dir, "app_names.npy"))
+    return trace
+
+
+def rank_apps(trace, capacity=None, block=default_chunksize):
+    # Heavy-hitter sketches from the cached columns, for caches written without them
+    from heavy_hitters import MisraGries, default_capacity
+    sketches = {by: MisraGries(capacity or default_capacity) for by in app_rankings}
+    for start in range(0, len(trace["app"]), block):
+        _rank_chunk(sketches, np.asarray(trace["app"][start:start + block]), trace["end_timestamp"][start:start + block])
+    return sketches
+
+
+def select_apps(trace, number_of_apps=10, by="first", cache=None, block=default_chunksize):
+    # Codes of the apps to simulate: the first `number_of_apps` unique apps in trace order
+    # ("first"), or the busiest ones by invocations ("count") or by peak-hour invocations ("peak")
+    # from the heavy-hitter ranking kept with the cached trace
+    if by not in app_selections:
+        raise ValueError(f"Unknown app selection {by!r}, expected one of {app_selections}")
+    if by == "first":
+        return np.arange(min(number_of_apps, len(trace["app_names"])))
+    path = os.path.join(trace_dir(cache), f"heavy_hitters_{by}.npy")
+    if not os.path.exists(path):
+        save_heavy_hitters(rank_apps(trace, block=block), cache)
+    ranking = np.load(path)
+    if number_of_apps > len(ranking) and len(ranking) and ranking[0, 2]:
+        raise ValueError(f"only {len(ranking)} apps are ranked by {by}; convert the trace with a larger capacity")
+    return ranking[:number_of_apps, 0]
+
+
+def app_columns(app, apps):
+    # Column of each app code in `apps`, -1 for apps that are not selected
+    apps = np.asarray(apps)
+    order = np.argsort(apps, kind="stable")
+    position = np.searchsorted(apps[order], app).clip(0, max(len(apps) - 1, 0))
+    found = apps[order][position] == app if len(apps) else np.zeros(np.shape(app), dtype=bool)
+    return np.where(found, order[position], -1)
+
+
+def _selected_rows(app, apps, number_of_apps):
+    # (row mask, column per selected row) of a block of app codes
+    if apps is None:
+        selected = app < number_of_apps
+        return selected, app[selected]
+    column = app_columns(app, apps)
+    selected = column >= 0
+    return selected, column[selected]
+
+
+def invocation_counts_from_trace(trace, number_of_apps=10, block=default_chunksize, apps=None):
+    # Hour x app counts of the first `number_of_apps` unique apps (or of the app codes `apps`, in
+    # that order), read in blocks from the mmapped columns
+    from trace_ingest import hours_per_day, hour_of_day
+    number_of_apps = min(number_of_apps, len(trace["app_names"])) if apps is None else len(apps)
+    counts = np.zeros((hours_per_day, number_of_apps), dtype=np.int64)
+    for start in range(0, len(trace["app"]), block):
+        selected, column = _selected_rows(np.asarray(trace["app"][start:start + block]), apps, number_of_apps)
+        cell = hour_of_day(trace["end_timestamp"][start:start + block][selected]) * number_of_apps + column
+        counts += np.bincount(cell, minlength=hours_per_day * number_of_apps).reshape(hours_per_day, number_of_apps)
+    codes = np.arange(number_of_apps) if apps is None else np.asarray(apps)
+    return counts, list(trace["app_names"][codes])
+
+
+def save_demand_matrix(normalized_matrix, invocation_matrix=None, apps=None, cache=None):
+    out_dir = cache or cache_dir
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "demand_matrix.npy"), np.asarray(normalized_matrix, dtype=np.float64))
+    if invocation_matrix is not None:
+        np.save(os.path.join(out_dir, "invocation_matrix.npy"), np.asarray(invocation_matrix, dtype=np.int64))
+    if apps is not None:
+        np.save(os.path.join(out_dir, "demand_apps.npy"), np.array(apps, dtype=str))
+
+
+def load_demand_matrix(cache=None, name="demand_matrix"):
+    # δ_u per hour and app (Delta_List) as a read-only memory map.
+    # The first run without a cache seeds it from the shipped data.py.
+    path = os.path.join(cache or cache_dir, name + ".npy")
+    if not os.path.exists(path) and name == "demand_matrix":
+        from data import Delta_List
+        instrumentation.count("cache_misses")
+        save_demand_matrix(Delta_List, cache=cache)
+    else:
+        instrumentation.count("cache_hits")
+    return np.load(path, mmap_mode="r")
+
+
+def save_lambda(Lambda, cache=None):
+    out_dir = cache or cache_dir
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "lambda.npy"), np.asarray(Lambda, dtype=np.float64))
+
+
+def load_lambda(default=None, cache=None):
+    # Calibrated λ_u per client written by the loader (or dsp_cli.py calibrate), else `default`
+    # (e.g. a uniform λ). A calibration that does not match the demand matrix columns is ignored.
+    path = os.path.join(cache or cache_dir, "lambda.npy")
+    if not os.path.exists(path):
+        return default
+    Lambda = np.load(path)
+    demand_path = os.path.join(cache or cache_dir, "demand_matrix.npy")
+    if os.path.exists(demand_path) and np.load(demand_path, mmap_mode="r").shape[1] != len(Lambda):
+        return default
+    return Lambda
+
+
+def series_name(bucket_seconds, normalized=True):
+    bucket = bucket_seconds if bucket_seconds == "hour_of_day" else f"{int(bucket_seconds)}s"
+    return f"{'demand' if normalized else 'invocation'}_series_{bucket}"
+
+
+def _open_series(out_dir, bucket_seconds, steps, number_of_apps, normalized):
+    return np.lib.format.open_memmap(os.path.join(out_dir, series_name(bucket_seconds, normalized) + ".npy"),
+                                     mode="w+", dtype=np.float64 if normalized else np.int64,
+                                     shape=(steps, number_of_apps))
+
+
+def _trace_steps(trace, bucket_seconds, block):
+    last = 0.0
+    for start in range(0, len(trace["end_timestamp"]), block):
+        last = max(last, float(np.max(trace["end_timestamp"][start:start + block], initial=0.0)))
+    return int(last // bucket_seconds) + 1
+
+
+def _count_series(trace, counts, bucket_seconds, block, apps=None):
+    # counts[step, app] += invocations, one pass over the mmapped trace columns
+    number_of_apps = counts.shape[1]
+    flat = counts.reshape(-1)
+    for start in range(0, len(trace["app"]), block):
+        selected, column = _selected_rows(np.asarray(trace["app"][start:start + block]), apps, number_of_apps)
+        step = np.floor_divide(trace["end_timestamp"][start:start + block][selected], bucket_seconds).astype(np.int64)
+        cells, cell_counts = np.unique(step * number_of_apps + column, return_counts=True)
+        flat[cells] += cell_counts
+
+
+def _row_block(counts, block, multiple=1):
+    return max(1, block // max(counts.shape[1], 1) // multiple) * multiple
+
+
+def _rollup_series(fine, coarse, ratio, block, fold=False):
+    # coarse[i] = sum(fine[i * ratio:(i + 1) * ratio]), or with fold=True coarse[i] = sum(fine[i::ratio])
+    rows = _row_block(fine, block, ratio)
+    for start in range(0, len(fine), rows):
+        window = np.asarray(fine[start:start + rows])
+        pad = -len(window) % ratio
+        if pad:
+            window = np.concatenate([window, np.zeros((pad, window.shape[1]), dtype=window.dtype)])
+        window = window.reshape(-1, ratio, window.shape[1])
+        if fold:
+            coarse += window.sum(axis=0)
+        else:
+            coarse[start // ratio:start // ratio + len(window)] = window.sum(axis=1)
+
+
+def _normalize_series(counts, normalized, block):
+    # Min-max normalization to 0–100 per app column, streamed in row blocks
+    number_of_apps = counts.shape[1]
+    col_min = np.full(number_of_apps, np.iinfo(np.int64).max)
+    col_max = np.zeros(number_of_apps, dtype=np.int64)
+    rows = _row_block(counts, block)
+    for start in range(0, len(counts), rows):
+        col_min = np.minimum(col_min, counts[start:start + rows].min(axis=0))
+        col_max = np.maximum(col_max, counts[start:start + rows].max(axis=0))
+    col_range = (col_max - col_min).astype(np.float64)
+    for start in range(0, len(counts), rows):
+        window = counts[start:start + rows].astype(np.float64)
+        normalized[start:start + rows] = np.divide(100 * (window - col_min), col_range,
+                                                   out=np.zeros_like(window), where=col_range > 0)
+
+
+def build_demand_series(trace, number_of_apps=10, bucket_seconds=3600, cache=None, block=default_chunksize, apps=None):
+    # Counts per time bucket (not folded into hour of day) x app over the whole trace, plus the
+    # min-max normalized 0–100 series. Both are written through np.lib.format.open_memmap,
+    # so a 20,160-minute x many-app series never has to fit in memory.
+    out_dir = cache or cache_dir
+    os.makedirs(out_dir, exist_ok=True)
+    number_of_apps = min(number_of_apps, len(trace["app_names"])) if apps is None else len(apps)
+    with instrumentation.stage("demand_series"):
+        steps = _trace_steps(trace, bucket_seconds, block)
+        counts = _open_series(out_dir, bucket_seconds, steps, number_of_apps, False)
+        _count_series(trace, counts, bucket_seconds, block, apps)
+        normalized = _open_series(out_dir, bucket_seconds, steps, number_of_apps, True)
+        _normalize_series(counts, normalized, block)
+        counts.flush()
+        normalized.flush()
+    instrumentation.count("trace_rows_bucketed", len(trace["app"]))
+    return steps
+
+
+def build_rollups(trace, number_of_apps=10, buckets=(60, 3600, 86400), hour_of_day=True,
+                  cache=None, block=default_chunksize, apps=None):
+    # Multi-resolution rollup from a single pass over the trace: the finest bucket is counted from
+    # the trace, every coarser bucket is summed from the one below it (each must divide the next),
+    # and the hour-of-day view is folded from the hourly series. Raw counts and normalized views
+    # are stored side by side as invocation_series_* / demand_series_* (columns in app code order,
+    # or in the order of the app codes `apps`, e.g. from select_apps).
+    out_dir = cache or cache_dir
+    os.makedirs(out_dir, exist_ok=True)
+    number_of_apps = min(number_of_apps, len(trace["app_names"])) if apps is None else len(apps)
+    buckets = sorted(set(buckets) | ({seconds_per_hour} if hour_of_day else set()))
+    for fine, coarse in zip(buckets, buckets[1:]):
+        if coarse % fine:
+            raise ValueError(f"rollup bucket {coarse}s is not a multiple of {fine}s")
+
+    steps = {buckets[0]: _trace_steps(trace, buckets[0], block)}
+    series = {buckets[0]: _open_series(out_dir, buckets[0], steps[buckets[0]], number_of_apps, False)}
+    with instrumentation.stage("rollup_count"):
+        _count_series(trace, series[buckets[0]], buckets[0], block, apps)
+    instrumentation.count("trace_rows_bucketed", len(trace["app"]))
+    for fine, coarse in zip(buckets, buckets[1:]):
+        steps[coarse] = -(-steps[fine] // (coarse // fine))
+        series[coarse] = _open_series(out_dir, coarse, steps[coarse], number_of_apps, False)
+        _rollup_series(series[fine], series[coarse], coarse // fine, block)
+    if hour_of_day:
+        steps["hour_of_day"] = hours_per_day
+        series["hour_of_day"] = _open_series(out_dir, "hour_of_day", hours_per_day, number_of_apps, False)
+        series["hour_of_day"][:] = 0
+        _rollup_series(series[seconds_per_hour], series["hour_of_day"], hours_per_day, block, fold=True)
+
+    for bucket, counts in series.items():
+        normalized = _open_series(out_dir, bucket, steps[bucket], number_of_apps, True)
+        _normalize_series(counts, normalized, block)
+        counts.flush()
+        normalized.flush()
+    return steps
+
+
+def _merge_cells(parts):
+    # (sorted unique cell keys, summed counts) of several (keys, counts) pairs
+    key, inverse = np.unique(np.concatenate([cells for cells, _ in parts]), return_inverse=True)
+    count = np.bincount(inverse, weights=np.concatenate([counts for _, counts in parts]), minlength=len(key))
+    return key, count.astype(np.int64)
+
+
+def _sparse_counts(trace, number_of_apps, bucket_seconds, block, apps=None):
+    # (cell keys step * number_of_apps + column, counts, steps) of the non-zero cells, one pass over
+    # the mmapped trace. Blocks are reduced on their own and merged once the pending cells outgrow
+    # the merged ones, so memory and sorting scale with the non-zero cells.
+    key, count = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pending = []
+    last = 0.0
+    for start in range(0, len(trace["app"]), block):
+        end_timestamp = trace["end_timestamp"][start:start + block]
+        last = max(last, float(np.max(end_timestamp, initial=0.0)))
+        selected, column = _selected_rows(np.asarray(trace["app"][start:start + block]), apps, number_of_apps)
+        step = np.floor_divide(end_timestamp[selected], bucket_seconds).astype(np.int64)
+        pending.append(np.unique(step * number_of_apps + column, return_counts=True))
+        if sum(len(cells) for cells, _ in pending) >= len(key):
+            key, count = _merge_cells([(key, count)] + pending)
+            pending = []
+    if pending:
+        key, count = _merge_cells([(key, count)] + pending)
+    return key, count, int(last // bucket_seconds) + 1
+
+
+def sparse_series_name(bucket_seconds):
+    bucket = bucket_seconds if bucket_seconds == "hour_of_day" else f"{int(bucket_seconds)}s"
+    return f"sparse_series_{bucket}"
+
+
+def _save_sparse_series(out_dir, bucket_seconds, key, count, steps, number_of_apps):
+    # Min-max normalize the non-zero cells (sorted cell keys, counts) per app and store them. A
+    # column without a zero cell keeps its minimum as an explicit 0.
+    client = key % number_of_apps
+    col_max = np.zeros(number_of_apps, dtype=np.int64)
+    np.maximum.at(col_max, client, count)
+    col_min = np.full(number_of_apps, np.iinfo(np.int64).max)
+    np.minimum.at(col_min, client, count)
+    col_min = np.where(np.bincount(client, minlength=number_of_apps) < steps, 0, col_min)
+    col_range = (col_max - col_min).astype(np.float64)[client]
+    value = np.divide(100 * (count.astype(np.float64) - col_min[client]), col_range,
+                      out=np.zeros(len(count)), where=col_range > 0)
+    name = os.path.join(out_dir, sparse_series_name(bucket_seconds))
+    for suffix, values in (("step", key // number_of_apps), ("client", client), ("count", count),
+                           ("value", value), ("shape", np.array([steps, number_of_apps]))):
+        np.save(f"{name}_{suffix}.npy", values)
+
+
+def build_sparse_series(trace, number_of_apps=10, bucket_seconds=60, cache=None, block=default_chunksize, apps=None):
+    # build_demand_series without the zero cells: counts per time bucket x app and their min-max
+    # normalized 0–100 values, stored as sorted coordinates. Memory scales with the non-zero
+    # cells, not steps x apps.
+    out_dir = cache or cache_dir
+    os.makedirs(out_dir, exist_ok=True)
+    number_of_apps = min(number_of_apps, len(trace["app_names"])) if apps is None else len(apps)
+    with instrumentation.stage("sparse_series"):
+        key, count, steps = _sparse_counts(trace, number_of_apps, bucket_seconds, block, apps)
+        _save_sparse_series(out_dir, bucket_seconds, key, count, steps, number_of_apps)
+    instrumentation.count("trace_rows_bucketed", len(trace["app"]))
+    instrumentation.count("sparse_cells", len(count))
+    return steps
+
+
+def fold_sparse_series(cache=None):
+    # Hour-of-day sparse series from the cached hourly one (hour 0 of the trace is midnight): the
+    # demand matrix as non-zero cells, with the same normalization, for the 24-hour simulations
+    out_dir = cache or cache_dir
+    hourly = load_sparse_series(seconds_per_hour, cache, normalized=False)
+    number_of_apps = hourly.shape[1]
+    with instrumentation.stage("sparse_series"):
+        key, count = _merge_cells([(np.asarray(hourly.step) % hours_per_day * number_of_apps + hourly.client,
+                                    np.asarray(hourly.value))])
+        _save_sparse_series(out_dir, "hour_of_day", key, count, hours_per_day, number_of_apps)
+    return hours_per_day
+
+
+def load_sparse_series(bucket_seconds=60, cache=None, normalized=True):
+    # sparse_demand.SparseDemand of a series from build_sparse_series, memory-mapped
+    from sparse_demand import SparseDemand
+    name = os.path.join(cache or cache_dir, sparse_series_name(bucket_seconds))
+    step, client, value = (np.load(f"{name}_{suffix}.npy", mmap_mode="r")
+                           for suffix in ("step", "client", "value" if normalized else "count"))
+    return SparseDemand(step, client, value, tuple(int(n) for n in np.load(f"{name}_shape.npy")))
+
+
+def load_demand_series(bucket_seconds=3600, cache=None, normalized=True):
+    # δ_u per time bucket and app over the full horizon, memory-mapped
+    return np.load(os.path.join(cache or cache_dir, series_name(bucket_seconds, normalized) + ".npy"), mmap_mode="r")
+
+
+def load_rollup(resolution="hour", cache=None, normalized=True):
+    # minute / hour / day / hour_of_day view (or a bucket in seconds) from build_rollups, zero copy
+    return load_demand_series(rollup_buckets.get(resolution, resolution), cache, normalized)
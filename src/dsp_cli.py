@@ -0,0 +1,417 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import instrumentation
+from demand_cache import load_demand_matrix
+
+# Single entry point for the DSP simulations, headless by default:
+#
+#   python dsp_cli.py lambda  [--lambdas 0 100 ... 900]       cost savings per λ      (01_)
+#   python dsp_cli.py mu      [--mus ...]                      provider utility per μ  (02_)
+#   python dsp_cli.py grid    [--lambdas ...] [--mus ...]      λ x μ utility surfaces  (03_)
+#   python dsp_cli.py hourly  [--mus ...]                      hour x μ surfaces       (04_)
+#   python dsp_cli.py compare [--flexibility 0.3]              DSP vs adaptive vs static (05_), optionally
+#                                                              with clients shifting demand to cheaper hours
+#   python dsp_cli.py bootstrap [--replicates 10000] [--resample hours apps days] [--lambda-sigma 0.1]
+#                                                              confidence intervals of cost savings and
+#                                                              provider utility (dsp and adaptive)
+#   python dsp_cli.py horizon [--bucket 3600] [--window 168]   DSP vs adaptive over the whole trace,
+#                                                              streamed from the cached demand series
+#   python dsp_cli.py calibrate [--observed-phi 16.6667]       per-app λ fitted to the demand matrix,
+#                                                              saved to <cache>/lambda.npy
+#   python dsp_cli.py schedule [--tiers 3] [--min-savings 20] [--min-participation 0.6]
+#                                                              provider-optimal price per hour of the day
+#                                                              (or K tiers) over the demand matrix
+#   python dsp_cli.py simulate [--capacity 1000] [--cold-start 1] [--keep-alive 600]
+#                                                              invocation-level worker pool replay of the
+#                                                              cached trace; DSP vs adaptive with its μ per hour
+#
+# --calibrated makes compare, bootstrap and schedule use the per-app λ of the calibration instead of --lambda.
+# --sparse makes lambda, mu, grid, hourly, compare and horizon visit only the non-zero demand cells
+# (sparse_demand): they read the sparse series cached by the loader (hour of day, or --bucket for
+# horizon) and never build the dense steps x apps matrix.
+#
+# Each command writes <out>/<command>.json (parameters and scalar results) and
+# <out>/<command>.npz (all arrays) and prints the JSON summary as one line on stdout.
+# matplotlib is only imported with --plot, scipy never; sweeps and the equilibrium
+# solver are imported by the commands that use them.
+
+simulation_duration = 24        # 24 hours
+peak_hours_Phi = 16.6667        # φ per 100,000 function calls, peak hours (8 AM–8 PM)
+off_peak_hours_Phi = 8.333      # φ per 100,000 function calls, off-peak hours
+static_Phi = 16.6667            # Static price per 100,000 function calls
+Mu = 6                          # Marginal cost μ per 100,000 function calls
+Lambda_u = 800                  # λ_u: Client utility parameter per developer
+adaptive_min_Phi = 12           # Smith and Lee (2024) adaptive pricing range [6]
+adaptive_max_Phi = 20
+
+
+def demand(args, sparse=False):
+    if sparse:
+        # The loader's sparse hour-of-day matrix, never densified; the shipped data.py (no trace
+        # converted yet) is small enough to convert
+        from demand_cache import load_sparse_series
+        from sparse_demand import as_sparse, window, first_clients
+        try:
+            Delta = load_sparse_series("hour_of_day", args.cache)
+        except FileNotFoundError:
+            Delta = as_sparse(load_demand_matrix(args.cache))
+        Delta = window(Delta, 0, args.hours or Delta.shape[0])
+        return first_clients(Delta, args.clients) if args.clients else Delta
+    Delta = np.asarray(load_demand_matrix(args.cache))
+    return Delta[:args.hours, :args.clients] if args.clients else Delta[:args.hours]
+
+
+def client_lambda(args, number_of_clients):
+    # --lambda for every client, or the cached calibration with --calibrated
+    if not args.calibrated:
+        return args.Lambda
+    from demand_cache import load_lambda
+    Lambda = load_lambda(cache=args.cache)
+    if Lambda is None:
+        raise SystemExit("No calibrated λ: run dsp_cli.py calibrate first")
+    return Lambda[:number_of_clients]
+
+
+def result_cache(args):
+    # Sweep cells are reused from <cache>/results.sqlite unless --no-result-cache
+    if args.no_result_cache:
+        return None
+    from result_cache import ResultCache, result_cache_path
+    return ResultCache(result_cache_path(args.cache))
+
+
+def fixed_parameters(args, **overrides):
+    fixed = {"Mu": args.mu, "Lambda": args.Lambda, "peak_Phi": args.peak_phi, "off_peak_Phi": args.off_peak_phi}
+    fixed.update(overrides)
+    return fixed
+
+
+def run_lambda(args):
+    from dsp_kernels import cost_savings
+    from sweep import sweep_hourly
+    from sweep_runner import run_sweep
+    Delta = demand(args, args.sparse)
+    Lambda_values = np.asarray(args.lambdas if args.lambdas else np.arange(10) * 100, dtype=np.float64)
+    fixed = fixed_parameters(args)
+    del fixed["Lambda"]
+    metrics, _ = run_sweep(Delta, {"Lambda": Lambda_values}, fixed, kernel=sweep_hourly, workers=args.workers, cache=result_cache(args))
+    total_cost_static = np.sum(metrics["cost_static"], axis=-1)
+    total_cost_dynamic = np.sum(metrics["cost_dynamic"], axis=-1)
+    savings = cost_savings(total_cost_static, total_cost_dynamic)
+    arrays = dict(metrics, Lambda=Lambda_values, total_cost_static=total_cost_static,
+                  total_cost_dynamic=total_cost_dynamic, cost_savings=savings)
+    summary = {"Lambda": Lambda_values.tolist(), "cost_savings": savings.tolist()}
+    return summary, arrays
+
+
+def run_mu(args):
+    from sweep import sweep_hourly
+    from sweep_runner import run_sweep
+    from equilibrium import stackelberg_equilibrium
+    Delta = demand(args, args.sparse)
+    Mu_values = np.asarray(args.mus if args.mus else
+                           [args.mu + (args.peak_phi - args.mu) / 10 * Mu_w for Mu_w in range(11)], dtype=np.float64)
+    fixed = fixed_parameters(args)
+    del fixed["Mu"]
+    metrics, _ = run_sweep(Delta, {"Mu": Mu_values}, fixed, kernel=sweep_hourly, workers=args.workers, cache=result_cache(args))
+    provider_utility = np.sum(np.maximum(metrics["provider_utility"], 0), axis=-1)
+    equilibrium = stackelberg_equilibrium(np.full((len(Mu_values), Delta.shape[1]), args.Lambda, dtype=np.float64), Mu_values)
+    arrays = {"Mu": Mu_values, "hourly_provider_utility": metrics["provider_utility"],
+              "provider_utility": provider_utility, "equilibrium_Phi": equilibrium["Phi"],
+              "equilibrium_provider_utility": equilibrium["provider_utility"]}
+    summary = {"Mu": Mu_values.tolist(), "provider_utility": provider_utility.tolist(),
+               "equilibrium_Phi": equilibrium["Phi"].tolist()}
+    return summary, arrays
+
+
+def run_grid(args):
+    from sweep_runner import run_sweep
+    Delta = demand(args, args.sparse)
+    axes = {"Lambda": np.asarray(args.lambdas if args.lambdas else np.arange(100, 900, 100), dtype=np.float64),
+            "Mu": np.asarray(args.mus if args.mus else np.arange(6, 8.2, 0.2), dtype=np.float64)}
+    fixed = fixed_parameters(args)
+    del fixed["Lambda"], fixed["Mu"]
+    (provider, clients), timings = run_sweep(Delta, axes, fixed, workers=args.workers, cache=result_cache(args))
+    arrays = dict(axes, provider_utility=provider, clients_utility=clients)
+    summary = {"shape": list(provider.shape), "max_provider_utility": float(provider.max()),
+               "max_clients_utility": float(clients.max()), "chunks": len(timings)}
+    return summary, arrays
+
+
+def run_hourly(args):
+    from sweep_runner import run_sweep
+    Delta = demand(args, args.sparse)
+    axes = {"hour": np.arange(Delta.shape[0]),
+            "Mu": np.asarray(args.mus if args.mus else np.arange(6, 8.2, 0.2), dtype=np.float64)}
+    fixed = fixed_parameters(args)
+    del fixed["Mu"]
+    (provider, clients), timings = run_sweep(Delta, axes, fixed, workers=args.workers, cache=result_cache(args))
+    arrays = dict(axes, provider_utility=provider, clients_utility=clients)
+    summary = {"shape": list(provider.shape), "max_provider_utility": float(provider.max()),
+               "max_clients_utility": float(clients.max()), "chunks": len(timings)}
+    return summary, arrays
+
+
+def run_compare(args):
+    from pricing_policies import time_of_use, lagged_adaptive, evaluate_policies
+    from sparse_demand import step_totals
+    Delta = demand(args, args.sparse)
+    number_of_clients = Delta.shape[1]
+    policies = {"dsp": time_of_use(args.peak_phi, args.off_peak_phi),
+                "adaptive": lagged_adaptive(adaptive_min_Phi, adaptive_max_Phi)}
+    result = evaluate_policies(policies, Delta, client_lambda(args, number_of_clients), args.mu, static_Phi)
+    metrics, totals = result["metrics"], result["totals"]
+    arrays = dict(metrics, Phi=result["Phi"], cost_savings=totals["cost_savings"], total_cost=totals["total_cost"],
+                  client_cost=metrics["cost_dynamic"] / number_of_clients,
+                  client_cost_static=(step_totals(Delta)[:, 0] * static_Phi if args.sparse
+                                      else np.sum(Delta * static_Phi, axis=-1)) / number_of_clients)
+    summary = {"policies": result["names"], "cost_savings": totals["cost_savings"].tolist(),
+               "provider_utility": totals["provider_utility"].tolist()}
+    if args.flexibility:
+        shifted = evaluate_policies(policies, Delta, client_lambda(args, number_of_clients), args.mu, static_Phi,
+                                    flexibility=args.flexibility, window=args.shift_window)
+        arrays.update(shifted_resource_utilization=shifted["metrics"]["resource_utilization"],
+                      shifted_client_cost=shifted["metrics"]["cost_dynamic"] / number_of_clients,
+                      shifted_cost_savings=shifted["totals"]["cost_savings"])
+        summary.update(shifted_cost_savings=shifted["totals"]["cost_savings"].tolist(),
+                       shifted_provider_utility=shifted["totals"]["provider_utility"].tolist())
+    return summary, arrays
+
+
+def run_bootstrap(args):
+    from monte_carlo import bootstrap, point_estimate, confidence_intervals
+    series = None
+    if "days" in args.resample:
+        from demand_cache import load_demand_series
+        try:
+            series = load_demand_series(3600, args.cache, normalized=False)
+        except FileNotFoundError:
+            raise SystemExit("No hourly series: run 00_Load_dataset_from_AzureFunctionsInvocationTrace2021.py first")
+        # Same columns as the demand matrix (and the calibrated λ_u): every cached app unless --clients
+        if args.clients:
+            series = series[:, :args.clients]
+    Delta = demand(args)
+    params = {"Lambda": client_lambda(args, Delta.shape[1]), "Mu": args.mu, "peak_Phi": args.peak_phi,
+              "off_peak_Phi": args.off_peak_phi}
+    samples = bootstrap(Delta, args.replicates, args.seed, args.resample, series, args.lambda_sigma, args.mu_sigma,
+                        args.workers, **params)
+    point = point_estimate(Delta, **params)
+    summary = {"replicates": args.replicates, "resample": args.resample, "level": args.level,
+               "point_estimate": {name: values.tolist() for name, values in point.items()},
+               "intervals": confidence_intervals(samples, args.level)}
+    return summary, samples
+
+
+def run_horizon(args):
+    from demand_cache import has_trace, load_trace, build_demand_series, load_demand_series
+    from demand_cache import build_sparse_series, load_sparse_series
+    from horizon import simulate_horizon, demand_windows
+    from sparse_demand import first_clients
+    build, load = (build_sparse_series, load_sparse_series) if args.sparse else (build_demand_series, load_demand_series)
+    try:
+        series = load(args.bucket, args.cache)
+    except FileNotFoundError:
+        if not has_trace(args.cache):
+            raise SystemExit("No cached trace: run 00_Load_dataset_from_AzureFunctionsInvocationTrace2021.py first")
+        build(load_trace(args.cache), args.clients or 10, args.bucket, args.cache)
+        series = load(args.bucket, args.cache)
+    if args.clients:
+        series = first_clients(series, args.clients) if args.sparse else series[:, :args.clients]
+    out_dir = os.path.join(args.out, "horizon")
+    totals = simulate_horizon(demand_windows(series, args.window), out_dir, args.Lambda, args.mu,
+                              args.peak_phi, args.off_peak_phi, static_Phi, args.bucket, adaptive_min_Phi, adaptive_max_Phi)
+    # Per-step metrics are already on disk, the npz only holds the totals
+    summary = dict(totals, metrics_dir=out_dir)
+    return summary, {name: np.asarray(value) for name, value in totals.items()}
+
+
+def run_calibrate(args):
+    from calibration import calibrate_lambda
+    from demand_cache import save_lambda
+    Delta = np.asarray(load_demand_matrix(args.cache))[:args.hours]
+    Phi = np.asarray(args.observed_phi, dtype=np.float64)
+    fit = calibrate_lambda(Delta, Phi if Phi.size > 1 else Phi[0], args.workers)
+    save_lambda(fit.Lambda, args.cache)
+    summary = {"clients": len(fit.Lambda), "mean_Lambda": float(np.mean(fit.Lambda)),
+               "min_Lambda": float(np.min(fit.Lambda)), "max_Lambda": float(np.max(fit.Lambda)),
+               "mean_rmse": float(np.mean(fit.rmse))}
+    return summary, fit._asdict()
+
+
+def run_schedule(args):
+    from schedule_optimizer import slot_table, optimize_schedule, evaluate_schedules
+    from dsp_kernels import dsp_price
+    Delta = demand(args)
+    Lambda = client_lambda(args, Delta.shape[1])
+    prices = np.arange(args.phi_min, args.phi_max + args.phi_step / 2, args.phi_step)
+    table = slot_table(Delta, Lambda, args.mu, static_Phi, prices, args.slots)
+    fit = optimize_schedule(table, args.min_savings, args.min_participation, args.tiers)
+    # The optimized schedule and the DSP tariff, evaluated on the demand matrix itself
+    dsp = dsp_price(np.arange(args.slots), args.peak_phi, args.off_peak_phi)
+    totals = evaluate_schedules(Delta, np.stack([fit.Phi, dsp]), Lambda, args.mu, static_Phi, args.workers)
+    arrays = dict(Phi=fit.Phi, dsp_Phi=dsp, prices=prices, table_provider_utility=table.provider_utility,
+                  table_cost=table.cost, table_participation=table.participation,
+                  **{name: values for name, values in totals.items()})
+    summary = {"schedule": fit.Phi.tolist(), "feasible": fit.feasible,
+               "provider_utility": totals["provider_utility"].tolist(), "cost_savings": totals["cost_savings"].tolist(),
+               "participation": (totals["participation"] / max(table.client_hours, 1)).tolist(),
+               "policies": ["optimized", "dsp"]}
+    return summary, arrays
+
+
+def run_simulate(args):
+    from demand_cache import has_trace, load_trace
+    from event_sim import simulate_trace, fold_hours, effective_mu, mean_latency, latency_percentile
+    from pricing_policies import time_of_use, lagged_adaptive, evaluate_policies
+    if not has_trace(args.cache):
+        raise SystemExit("No cached trace: run 00_Load_dataset_from_AzureFunctionsInvocationTrace2021.py first")
+    stats = simulate_trace(load_trace(args.cache), args.capacity, args.cold_start, args.keep_alive, args.cache)
+    folded = fold_hours(stats)
+    Mu_hours = effective_mu(folded, args.mu, args.idle_cost, args.wait_cost, args.normalize_mu)
+    Delta = demand(args)
+    Lambda = client_lambda(args, Delta.shape[1])
+    policies = {"dsp": time_of_use(args.peak_phi, args.off_peak_phi),
+                "adaptive": lagged_adaptive(adaptive_min_Phi, adaptive_max_Phi)}
+    result = evaluate_policies(policies, Delta, Lambda, Mu_hours[:len(Delta)], static_Phi)
+    nominal = evaluate_policies(policies, Delta, Lambda, args.mu, static_Phi)
+    invocations = float(np.sum(stats["invocations"]))
+    arrays = {"hour_" + name: values for name, values in stats.items()}
+    arrays.update(Mu=Mu_hours, Mu_step=effective_mu(stats, args.mu, args.idle_cost, args.wait_cost, args.normalize_mu),
+                  mean_latency=mean_latency(folded), p95_latency=latency_percentile(folded, 95),
+                  provider_utility=result["metrics"]["provider_utility"], Phi=result["Phi"])
+    summary = {"invocations": invocations,
+               "cold_start_rate": float(np.sum(stats["cold_starts"])) / max(invocations, 1),
+               "mean_wait": float(np.sum(stats["wait_seconds"])) / max(invocations, 1),
+               "Mu": Mu_hours.tolist(), "p95_latency": arrays["p95_latency"].tolist(),
+               "policies": result["names"],
+               "provider_utility": result["totals"]["provider_utility"].tolist(),
+               "provider_utility_nominal_mu": nominal["totals"]["provider_utility"].tolist()}
+    return summary, arrays
+
+
+def plot(command, arrays, out):
+    # One off-screen figure per command through report.py (long series are decimated there)
+    from report import figure, line_panel, surface_panel, hist_panel, series, render_figure
+    if command == "lambda":
+        panels = [line_panel([series(arrays["cost_savings"], x=arrays["Lambda"], marker='x')],
+                             xlabel='λ', ylabel='Total cost save%')]
+    elif command == "mu":
+        panels = [line_panel([series(arrays["provider_utility"], x=arrays["Mu"], marker='x')],
+                             xlabel='μ', ylabel='Serverless utility function(θ)')]
+    elif command in ("grid", "hourly"):
+        y_name = "Lambda" if command == "grid" else "hour"
+        panels = [surface_panel(arrays["Mu"], arrays[y_name], arrays[name], xlabel='μ',
+                                ylabel='λ' if command == "grid" else 'hour', zlabel='θ')
+                  for name in ("provider_utility", "clients_utility")]
+    elif command == "horizon":
+        panels = [line_panel([series(np.load(os.path.join(out, "horizon", policy + "_resource_utilization.npy"), mmap_mode="r"),
+                                     label=label) for policy, label in (("dsp", 'DSP'), ("adaptive", 'Adaptive [6]'))],
+                             xlabel='Step', ylabel='Number of functions (δ)')]
+    elif command == "simulate":
+        panels = [line_panel([series(arrays["Mu"], marker='x', label='effective μ')], xlabel='Hour', ylabel='μ'),
+                  line_panel([series(arrays["p95_latency"], marker='x', label='p95'),
+                              series(arrays["mean_latency"], marker='o', label='mean')], xlabel='Hour', ylabel='Latency (s)')]
+    elif command == "schedule":
+        panels = [line_panel([series(arrays["Phi"], marker='x', label='Optimized'),
+                              series(arrays["dsp_Phi"], marker='o', label='DSP')], xlabel='Hour', ylabel='Price (φ)')]
+    elif command == "calibrate":
+        panels = [hist_panel([arrays["Lambda"]], ('λ_u',), xlabel='λ', ylabel='Clients')]
+    elif command == "bootstrap":
+        panels = [hist_panel(arrays["cost_savings_all"].T, ('DSP', 'Adaptive [6]'),
+                             xlabel='Total cost save%', ylabel='Replicates')]
+    else:
+        panels = [line_panel([series(arrays["client_cost"][k], marker='x', label=label)
+                              for k, label in enumerate(('DSP', 'Adaptive [6]'))]
+                             + [series(arrays["client_cost_static"], marker='o', label='Static')]
+                             + [series(arrays["shifted_client_cost"][k], marker='+', label=label + ' (shifted)')
+                                for k, label in enumerate(('DSP', 'Adaptive [6]')) if "shifted_client_cost" in arrays],
+                             xlabel='Hour', ylabel='Cost ($)')]
+    return os.path.join(out, render_figure(figure(command, panels), out)[0])
+
+
+commands = {"lambda": run_lambda, "mu": run_mu, "grid": run_grid, "hourly": run_hourly, "compare": run_compare,
+            "bootstrap": run_bootstrap, "horizon": run_horizon, "calibrate": run_calibrate, "schedule": run_schedule,
+            "simulate": run_simulate}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dynamic Serverless Pricing (DSP) simulations")
+    parser.add_argument("command", choices=commands)
+    parser.add_argument("--lambdas", type=float, nargs="+")
+    parser.add_argument("--mus", type=float, nargs="+")
+    parser.add_argument("--lambda", dest="Lambda", type=float, default=Lambda_u)
+    parser.add_argument("--mu", type=float, default=Mu)
+    parser.add_argument("--peak-phi", type=float, default=peak_hours_Phi)
+    parser.add_argument("--off-peak-phi", type=float, default=off_peak_hours_Phi)
+    parser.add_argument("--hours", type=int, default=simulation_duration)
+    parser.add_argument("--clients", type=int, help="use only the first N clients of the demand matrix")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--bucket", type=int, default=3600, help="horizon: seconds per time step")
+    parser.add_argument("--window", type=int, default=168, help="horizon: time steps per streamed window")
+    parser.add_argument("--sparse", action="store_true",
+                        help="lambda, mu, grid, hourly, compare, horizon: load and visit only the non-zero demand cells")
+    parser.add_argument("--replicates", type=int, default=10_000, help="bootstrap: number of replicates")
+    parser.add_argument("--resample", nargs="*", default=["hours"], choices=["hours", "apps", "days"],
+                        help="bootstrap: what to resample with replacement")
+    parser.add_argument("--lambda-sigma", type=float, default=0.0, help="bootstrap: lognormal noise on λ")
+    parser.add_argument("--mu-sigma", type=float, default=0.0, help="bootstrap: lognormal noise on μ")
+    parser.add_argument("--level", type=float, default=0.95, help="bootstrap: confidence level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--observed-phi", type=float, nargs="+", default=[static_Phi],
+                        help="calibrate: price in force while the demand was observed (one value or one per hour)")
+    parser.add_argument("--calibrated", action="store_true", help="use the calibrated per-app λ instead of --lambda")
+    parser.add_argument("--flexibility", type=float, default=0.0,
+                        help="compare: share of its demand a client moves towards cheaper hours (load shifting)")
+    parser.add_argument("--shift-window", type=int, default=24, help="compare: hours within which demand is moved")
+    parser.add_argument("--slots", type=int, default=24, help="schedule: price slots per day (hour %% slots)")
+    parser.add_argument("--tiers", type=int, help="schedule: K cyclic tiers with movable boundaries instead of a price per slot")
+    parser.add_argument("--min-savings", type=float, help="schedule: minimum developer cost saving against static pricing (%%)")
+    parser.add_argument("--min-participation", type=float, help="schedule: minimum share of client-hours with demand that take part")
+    parser.add_argument("--phi-min", type=float, default=1.0, help="schedule: lowest candidate price")
+    parser.add_argument("--phi-max", type=float, default=100.0, help="schedule: highest candidate price")
+    parser.add_argument("--phi-step", type=float, default=0.5, help="schedule: candidate price step")
+    parser.add_argument("--capacity", type=int, default=1000, help="simulate: concurrent executions of the worker pool")
+    parser.add_argument("--cold-start", type=float, default=1.0, help="simulate: seconds added to a cold start")
+    parser.add_argument("--keep-alive", type=float, default=600.0, help="simulate: seconds a container stays warm")
+    parser.add_argument("--idle-cost", type=float, default=0.1, help="simulate: warm idle second / execution second cost")
+    parser.add_argument("--wait-cost", type=float, default=1.0, help="simulate: queued second / execution second cost")
+    parser.add_argument("--normalize-mu", action="store_true",
+                        help="simulate: scale the effective μ to a mean of --mu (cost only moves between hours)")
+    parser.add_argument("--cache", help="cache directory (default: DSP_CACHE_DIR or src/cache)")
+    parser.add_argument("--no-result-cache", action="store_true", help="recompute every sweep cell")
+    parser.add_argument("--out", default=".", help="directory for <command>.json and <command>.npz")
+    parser.add_argument("--plot", action="store_true", help="also render <command>.png (imports matplotlib)")
+    parser.add_argument("--report", help="write a JSON run report (stage timers and counters) to this path")
+    parser.add_argument("--profile", choices=["cpu", "memory", "all"], help="with --report: add cProfile and/or tracemalloc")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    args = parse_args(argv)
+    if args.report:
+        instrumentation.enable(profile=args.profile in ("cpu", "all"), memory=args.profile in ("memory", "all"))
+    with instrumentation.stage(args.command):
+        summary, arrays = commands[args.command](args)
+    os.makedirs(args.out, exist_ok=True)
+    np.savez(os.path.join(args.out, args.command + ".npz"), **arrays)
+    summary = {"command": args.command, **summary}
+    if args.plot:
+        with instrumentation.stage("plot"):
+            summary["figure"] = plot(args.command, arrays, args.out)
+    summary["seconds"] = time.perf_counter() - start
+    with open(os.path.join(args.out, args.command + ".json"), "w") as f:
+        json.dump({"parameters": vars(args), "summary": summary}, f, indent=2)
+    if args.report:
+        instrumentation.disable()
+        summary["report"] = instrumentation.write_report(args.report)
+    json.dump(summary, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import numpy as np
+import instrumentation
+from collections import namedtuple
+
+# Vectorized utility kernels shared by the simulation scripts.
+# Inputs broadcast with NumPy rules. Clients are always the last axis and hours the one
+# before it, leading axes hold scenarios (λ, μ, φ, ...):
+#   Delta  δ_u   (..., hours, clients)
+#   Lambda λ_u   broadcastable to (..., hours, clients), e.g. a scalar, (clients,) or (scenarios, 1, clients)
+#   Phi    φ     (..., hours)
+#   Mu     μ     broadcastable to Phi
+
+hours_per_day = 24
+peak_start = 8                  # peak hours are 8 AM–8 PM
+peak_end = 20
+
+ClientResult = namedtuple("ClientResult", ["utility", "participating", "cost_static", "cost_dynamic"])
+
+
+def dsp_price(hours, peak_Phi, off_peak_Phi, peak_start=peak_start, peak_end=peak_end):
+    # φ = peak price for peak_start <= hour < peak_end, off-peak price otherwise
+    hour = np.mod(hours, hours_per_day)
+    peak = (peak_start <= hour) & (hour < peak_end)
+    if np.ndim(peak) == 0:
+        # A single hour only depends on one of the two prices
+        return np.asarray(peak_Phi if peak else off_peak_Phi, dtype=np.float64)
+    return np.where(peak, peak_Phi, off_peak_Phi)
+
+
+def adaptive_price(hours, Delta, min_Phi=12, max_Phi=20, min_invocations=700, max_invocations=1000):
+    # Adaptive pricing (simplified linear regression approximation of Smith and Lee [6]):
+    # price from the previous hour's total invocations, linearly mapped onto [min_Phi, max_Phi].
+    # Delta is (..., hours, clients), leading axes (e.g. replicates) give one price row each.
+    hours = np.asarray(hours)
+    prev_invocations = np.sum(np.take(Delta, hours - 1, axis=-2), axis=-1)  # Total δ_u for previous hour
+    normalized = (prev_invocations - min_invocations) / (max_invocations - min_invocations)
+    price = min_Phi + normalized * (max_Phi - min_Phi)
+    price = np.maximum(np.minimum(price, max_Phi), min_Phi)
+    # Initial price: midpoint
+    return np.where(hours == 0, (min_Phi + max_Phi) / 2, price)
+
+
+def client_utility(Delta_u, Lambda_u, Phi):
+    # λ_u * log(1+ δ_u ) - δ_u * φ
+    return Lambda_u * np.log(1 + Delta_u) - (Delta_u * Phi)
+
+
+def optimal_consumption(Lambda_u, Phi):
+    # max((λ_u / φ) - 1, 0)
+    return np.maximum((Lambda_u / Phi) - 1, 0)
+
+
+def aggregate_consumption(Phi, Lambda_List):
+    # Q = sum_u max((λ_u / φ) - 1, 0), summed over the client axis
+    Phi = np.asarray(Phi, dtype=np.float64)
+    return np.sum(optimal_consumption(np.asarray(Lambda_List, dtype=np.float64), Phi[..., None]), axis=-1)
+
+
+def provider_utility(Phi, Lambda_List, Mu):
+    # (φ - μ ) * sum((λ_u / φ) -1)
+    return (np.asarray(Phi, dtype=np.float64) - Mu) * aggregate_consumption(Phi, Lambda_List)
+
+
+def evaluate_clients(Delta, Lambda, Phi, static_Phi):
+    # Utility, participation mask (θ_u > 0 and δ_u > 0) and per-client static/DSP cost tensors
+    Delta = np.asarray(Delta, dtype=np.float64)
+    Phi = np.asarray(Phi, dtype=np.float64)[..., None]
+    static_Phi = np.asarray(static_Phi, dtype=np.float64)[..., None]
+    utility = client_utility(Delta, Lambda, Phi)
+    participating = (utility > 0) & (Delta > 0)
+    cost_static = np.where(participating, Delta * static_Phi, 0.0)
+    cost_dynamic = np.where(participating, Delta * Phi, 0.0)
+    return ClientResult(utility, participating, cost_static, cost_dynamic)
+
+
+def hourly_metrics(Delta, Lambda, Phi, Mu, static_Phi):
+    # Per-hour aggregates of the hour x client simulation loop, the client axis is reduced:
+    # resource_utilization, client_count, provider_utility, client_utility (sum over
+    # participating clients), cost_static and cost_dynamic (sums over participating clients)
+    with instrumentation.stage("hourly_metrics"):
+        clients = evaluate_clients(Delta, Lambda, Phi, static_Phi)
+        participating = clients.participating
+        Delta = np.asarray(Delta, dtype=np.float64)
+        Lambda_hours = np.broadcast_to(Lambda, np.broadcast_shapes(np.shape(Lambda), participating.shape))
+        metrics = {
+            "resource_utilization": np.sum(np.where(participating, Delta, 0.0), axis=-1),
+            "client_count": np.sum(participating, axis=-1),
+            "provider_utility": provider_utility(Phi, Lambda_hours, Mu),
+            "client_utility": np.sum(np.where(participating, clients.utility, 0.0), axis=-1),
+            "cost_static": np.sum(clients.cost_static, axis=-1),
+            "cost_dynamic": np.sum(clients.cost_dynamic, axis=-1),
+        }
+    if instrumentation.enabled:
+        instrumentation.count("client_hours", participating.size)
+        instrumentation.count("participating_client_hours", int(np.sum(metrics["client_count"])))
+    return metrics
+
+
+def cost_savings(total_cost_static, total_cost_dynamic):
+    # (static - dynamic) / static * 100, 0 where nobody participated
+    total_cost_static = np.asarray(total_cost_static, dtype=np.float64)
+    saved = total_cost_static - total_cost_dynamic
+    return np.divide(saved, total_cost_static, out=np.zeros_like(saved), where=total_cost_static > 0) * 100
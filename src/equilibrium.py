@@ -0,0 +1,62 @@
+import numpy as np
+from dsp_kernels import optimal_consumption, provider_utility
+
+# Stackelberg equilibrium of the DSP game: the provider (leader) sets φ, the clients
+# (followers) respond with their closed-form optimal consumption max((λ_u / φ) - 1, 0).
+#
+# With the clients sorted by λ descending, on the price segment λ_(k+1) < φ <= λ_(k) exactly
+# the top k clients consume, and the provider utility is
+#     θ(φ) = (φ - μ) * (Λ_k / φ - k),   Λ_k = λ_(1) + ... + λ_(k)
+# which is concave in φ with its maximum at φ = sqrt(μ * Λ_k / k). The best response is the
+# best of these stationary points clipped to their segments (and to [Phi_min, Phi_max]),
+# so a batch of instances is solved with one sort and a few array operations, no optimizer.
+
+
+def leader_price(Lambda_List, Mu, Phi_min=0.0, Phi_max=np.inf):
+    # Provider-optimal φ for every instance of a batch.
+    # Lambda_List (..., clients), Mu / Phi_min / Phi_max broadcastable to the batch shape (...).
+    # Returns (Phi, provider utility θ, aggregate consumption Q), each of the batch shape.
+    Lambda_List = np.asarray(Lambda_List, dtype=np.float64)
+    Lambda_sorted = -np.sort(-Lambda_List, axis=-1)
+    number_of_clients = Lambda_sorted.shape[-1]
+    Mu = np.asarray(Mu, dtype=np.float64)[..., None]
+    Phi_min = np.asarray(Phi_min, dtype=np.float64)[..., None]
+    Phi_max = np.asarray(Phi_max, dtype=np.float64)[..., None]
+    if np.any(Phi_min > Phi_max):
+        raise ValueError("Phi_min must not exceed Phi_max")
+
+    k = np.arange(1, number_of_clients + 1)
+    Lambda_k = np.cumsum(Lambda_sorted, axis=-1)
+    segment_low = np.maximum(np.concatenate([Lambda_sorted[..., 1:], np.zeros_like(Lambda_sorted[..., :1])], axis=-1), Phi_min)
+    segment_high = np.minimum(Lambda_sorted, Phi_max)
+    stationary = np.sqrt(np.maximum(Mu, 0) * Lambda_k / k)
+    Phi = np.clip(stationary, segment_low, segment_high)
+    utility = (Phi - Mu) * (Lambda_k / np.where(Phi > 0, Phi, np.inf) - k)
+    utility = np.where((segment_low <= segment_high) & (Phi > 0), utility, -np.inf)
+
+    # Segment above every λ: nobody consumes, θ = 0
+    Phi_idle = np.broadcast_to(np.maximum(np.maximum(Lambda_sorted[..., :1], Phi_min), np.finfo(np.float64).tiny),
+                               utility[..., :1].shape)
+    Phi = np.concatenate([Phi, Phi_idle], axis=-1)
+    utility = np.concatenate([utility, np.where(Phi_idle <= Phi_max, 0.0, -np.inf)], axis=-1)
+
+    best = np.argmax(utility, axis=-1)[..., None]
+    Phi_best = np.take_along_axis(Phi, best, axis=-1)[..., 0]
+    if np.any(np.isneginf(np.take_along_axis(utility, best, axis=-1))):
+        raise ValueError("No feasible price in [Phi_min, Phi_max]")
+    Q = np.sum(optimal_consumption(Lambda_List, Phi_best[..., None]), axis=-1)
+    return Phi_best, provider_utility(Phi_best, Lambda_List, Mu[..., 0]), Q
+
+
+def stackelberg_equilibrium(Lambda_hours, Mu, Phi_min=0.0, Phi_max=np.inf):
+    # Equilibrium for each hour (and scenario) of an hourly λ profile (..., hours, clients):
+    # the leader's price, the followers' optimal consumption and both sides' outcome
+    Lambda_hours = np.asarray(Lambda_hours, dtype=np.float64)
+    Phi, utility, Q = leader_price(Lambda_hours, Mu, Phi_min, Phi_max)
+    consumption = optimal_consumption(Lambda_hours, Phi[..., None])
+    return {
+        "Phi": Phi,
+        "provider_utility": utility,
+        "consumption": consumption,
+        "aggregate_consumption": Q,
+    }
@@ -0,0 +1,282 @@
+import os
+import heapq
+import numpy as np
+import instrumentation
+from collections import deque
+
+# Invocation-level discrete-event simulation of a finite worker pool, replayed from the raw trace.
+#
+# Every invocation arrives at end_timestamp - duration and runs for `duration` on one of
+# `capacity` workers. An app keeps a warm container for keep_alive seconds after each execution;
+# a start without one pays a cold start of cold_start seconds, and arrivals that find every worker
+# busy wait in a FIFO queue. Completions live in a heap (at most `capacity` entries); arrivals are
+# not pushed to it but read in time order from array batches of one hour each, so memory is
+# bounded by one hour of events plus the pool state. Dispatches are recorded in lists and
+# aggregated per batch with array operations into per-hour accumulators:
+#
+#   invocations, cold_starts            by arrival hour
+#   wait_seconds, latency_seconds       by arrival hour (latency = wait + cold start + duration)
+#   latency_histogram                   by arrival hour, log-spaced latency_bins
+#   execution_seconds, cold_start_seconds, idle_seconds
+#                                       worker time per hour (intervals split at hour boundaries)
+#
+# effective_mu turns these into a load-dependent marginal cost per hour,
+#   μ_h = μ * r_h,   r_h = (execution + cold start + idle_cost * warm idle + wait_cost * wait) / execution
+# which is μ when every start is warm, nothing waits and no container idles; few invocations per
+# hour pay for idle containers, bursts pay for cold starts and queueing, so a saturated or
+# cold-start-heavy pool costs the provider more than an efficient one. Warm idle seconds can
+# outnumber execution seconds by an order of magnitude, so keep idle_cost small (it is the cost
+# of an idle second per execution second). normalize=True divides r_h by its mean over the hours
+# with executions instead: mean μ_h = μ and the pool only moves cost between hours.
+# fold_hours turns the horizon into hour-of-day values for the 24-hour simulations (hourly_metrics
+# takes μ per hour).
+#
+# The arrival order is an index over the columnar cache (hour buckets of row numbers), built once:
+#
+#   cache/trace/arrival_order.npy    int64  row numbers grouped by arrival hour
+#   cache/trace/arrival_offsets.npy  int64  first position of every hour in arrival_order
+
+defaults = {
+    "capacity": 1000,           # concurrent executions
+    "cold_start": 1.0,          # seconds added to a start without a warm container
+    "keep_alive": 600.0,        # seconds a container stays warm after an execution
+    "idle_cost": 0.1,           # cost of a warm idle second relative to an execution second
+    "wait_cost": 1.0,           # cost of a queued second relative to an execution second
+}
+latency_bins = np.concatenate([[0.0], np.geomspace(1e-3, 86400, 160), [np.inf]])
+hour_stats = ("invocations", "cold_starts", "wait_seconds", "latency_seconds",
+              "execution_seconds", "cold_start_seconds", "idle_seconds")
+seconds_per_hour = 3600
+
+
+def _arrival_hours(trace, start, stop):
+    begin = np.asarray(trace["end_timestamp"][start:stop]) - np.asarray(trace["duration"][start:stop])
+    return np.maximum(np.floor_divide(begin, seconds_per_hour), 0).astype(np.int64)
+
+
+def arrival_index(trace, cache=None, block=1_000_000):
+    # (order, offsets): row numbers grouped by arrival hour, memory-mapped; two passes over the columns
+    from demand_cache import trace_dir
+    out_dir = trace_dir(cache)
+    order_path = os.path.join(out_dir, "arrival_order.npy")
+    offsets_path = os.path.join(out_dir, "arrival_offsets.npy")
+    if not os.path.exists(offsets_path):
+        rows = len(trace["app"])
+        counts = np.zeros(0, dtype=np.int64)
+        for start in range(0, rows, block):
+            hours = np.bincount(_arrival_hours(trace, start, start + block))
+            counts = np.pad(counts, (0, max(0, len(hours) - len(counts))))
+            counts[:len(hours)] += hours
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        order = np.lib.format.open_memmap(order_path, mode="w+", dtype=np.int64, shape=(rows,))
+        cursor = offsets[:-1].copy()
+        for start in range(0, rows, block):
+            hours = _arrival_hours(trace, start, start + block)
+            sort = np.argsort(hours, kind="stable")
+            hours = hours[sort]
+            first = np.searchsorted(hours, hours, side="left")
+            order[cursor[hours] + np.arange(len(hours)) - first] = start + sort
+            cursor += np.bincount(hours, minlength=len(cursor))
+        order.flush()
+        del order
+        np.save(offsets_path, offsets)
+    return np.load(order_path, mmap_mode="r"), np.load(offsets_path)
+
+
+def arrival_batches(trace, order, offsets):
+    # (arrival, duration, app) arrays sorted by arrival time, one arrival hour at a time
+    for hour in range(len(offsets) - 1):
+        rows = np.sort(order[offsets[hour]:offsets[hour + 1]])
+        if not len(rows):
+            continue
+        duration = np.maximum(np.asarray(trace["duration"][rows], dtype=np.float64), 0.0)
+        arrival = np.asarray(trace["end_timestamp"][rows], dtype=np.float64) - duration
+        sort = np.argsort(arrival, kind="stable")
+        yield arrival[sort], duration[sort], np.asarray(trace["app"][rows])[sort]
+
+
+def _hourly_add(acc, hours, values):
+    # acc[name][hours] += values, growing the per-hour arrays as the horizon extends
+    size = int(hours.max()) + 1 if len(hours) else 0
+    if size > len(acc):
+        acc.resize(size)
+    acc.values[:size] += np.bincount(hours, weights=values, minlength=size)
+
+
+def _spread(acc, begin, end):
+    # Add the length of every interval [begin, end) to the hours it overlaps
+    hour = np.maximum(np.floor_divide(begin, seconds_per_hour), 0).astype(np.int64)
+    while len(begin):
+        edge = (hour + 1) * float(seconds_per_hour)
+        _hourly_add(acc, hour, np.minimum(end, edge) - begin)
+        rest = end > edge
+        begin, end, hour = edge[rest], end[rest], hour[rest] + 1
+
+
+class _Hourly:
+    # Growable per-hour accumulator (2-D with trailing columns for the latency histogram)
+
+    def __init__(self, columns=None):
+        self.columns = columns
+        self.values = np.zeros((0,) if columns is None else (0, columns))
+
+    def __len__(self):
+        return len(self.values)
+
+    def resize(self, size):
+        grown = np.zeros((size,) + self.values.shape[1:])
+        grown[:len(self.values)] = self.values
+        self.values = grown
+
+
+class WorkerPoolSimulator:
+
+    def __init__(self, capacity=defaults["capacity"], cold_start=defaults["cold_start"],
+                 keep_alive=defaults["keep_alive"]):
+        self.capacity = capacity
+        self.cold_start = cold_start
+        self.keep_alive = keep_alive
+        self.busy = 0
+        self.completions = []       # heap of (finish time, app)
+        self.queue = deque()        # (arrival, duration, app) waiting for a worker
+        self.idle = {}              # app -> deque of times its warm containers became idle
+        self.dispatched = []        # (arrival, start, cold, duration) since the last aggregation
+        self.expired = []           # (idle since, idle until) of containers that left the warm pool
+        self.hours = {name: _Hourly() for name in hour_stats}
+        self.hours["latency_histogram"] = _Hourly(len(latency_bins) - 1)
+        self.events = 0
+
+    def _dispatch(self, arrival, start, duration, app):
+        warm = self.idle.get(app)
+        cold = 1
+        if warm:
+            keep_alive = self.keep_alive
+            while warm and start - warm[0] > keep_alive:
+                since = warm.popleft()
+                self.expired.append((since, since + keep_alive))
+            if warm:
+                since = warm.pop()
+                self.expired.append((since, start))
+                cold = 0
+        heapq.heappush(self.completions, (start + cold * self.cold_start + duration, app))
+        self.dispatched.append((arrival, start, cold, duration))
+
+    def _complete_until(self, time):
+        # Finish every execution that ends by `time`; freed workers take queued arrivals first
+        completions, queue, idle = self.completions, self.queue, self.idle
+        while completions and completions[0][0] <= time:
+            finish, app = heapq.heappop(completions)
+            warm = idle.get(app)
+            if warm is None:
+                warm = idle[app] = deque()
+            warm.append(finish)
+            if queue:
+                arrival, duration, queued_app = queue.popleft()
+                self._dispatch(arrival, finish, duration, queued_app)
+            else:
+                self.busy -= 1
+
+    def run(self, arrival, duration, app):
+        # Replay one batch of arrivals (sorted by time), then aggregate it
+        capacity, queue = self.capacity, self.queue
+        for time, length, code in zip(arrival.tolist(), duration.tolist(), app.tolist()):
+            if self.completions and self.completions[0][0] <= time:
+                self._complete_until(time)
+            if self.busy < capacity:
+                self.busy += 1
+                self._dispatch(time, time, length, code)
+            else:
+                queue.append((time, length, code))
+        self.events += len(arrival)
+        self._aggregate()
+
+    def finish(self):
+        # Drain the pool after the last arrival and expire the warm containers
+        self._complete_until(np.inf)
+        for warm in self.idle.values():
+            self.expired.extend((since, since + self.keep_alive) for since in warm)
+        self.idle = {}
+        self._aggregate()
+        return self.stats()
+
+    def _aggregate(self):
+        if self.dispatched:
+            arrival, start, cold, duration = np.array(self.dispatched, dtype=np.float64).T
+            self.dispatched = []
+            hour = np.maximum(np.floor_divide(arrival, seconds_per_hour), 0).astype(np.int64)
+            wait = start - arrival
+            latency = wait + cold * self.cold_start + duration
+            _hourly_add(self.hours["invocations"], hour, np.ones(len(hour)))
+            _hourly_add(self.hours["cold_starts"], hour, cold)
+            _hourly_add(self.hours["wait_seconds"], hour, wait)
+            _hourly_add(self.hours["latency_seconds"], hour, latency)
+            histogram = self.hours["latency_histogram"]
+            if hour.max() + 1 > len(histogram):
+                histogram.resize(int(hour.max()) + 1)
+            np.add.at(histogram.values, (hour, np.searchsorted(latency_bins, latency, side="right") - 1), 1)
+            ready = start + cold * self.cold_start
+            _spread(self.hours["cold_start_seconds"], start, ready)
+            _spread(self.hours["execution_seconds"], ready, ready + duration)
+        if self.expired:
+            since, until = np.array(self.expired, dtype=np.float64).T
+            self.expired = []
+            _spread(self.hours["idle_seconds"], since, until)
+
+    def stats(self):
+        # Per-hour arrays over the replayed horizon, all of the same length
+        hours = max(len(acc) for acc in self.hours.values())
+        result = {}
+        for name, acc in self.hours.items():
+            if len(acc) < hours:
+                acc.resize(hours)
+            result[name] = acc.values.copy()
+        return result
+
+
+def simulate_trace(trace, capacity=defaults["capacity"], cold_start=defaults["cold_start"],
+                   keep_alive=defaults["keep_alive"], cache=None):
+    # Replay the cached trace through the worker pool, per-hour stats over the whole horizon
+    order, offsets = arrival_index(trace, cache)
+    simulator = WorkerPoolSimulator(capacity, cold_start, keep_alive)
+    with instrumentation.stage("event_simulation"):
+        for arrival, duration, app in arrival_batches(trace, order, offsets):
+            simulator.run(arrival, duration, app)
+        stats = simulator.finish()
+    instrumentation.count("simulated_invocations", simulator.events)
+    return stats
+
+
+def fold_hours(stats, hours_per_day=24):
+    # Hour-of-day sums of per-hour stats (hour 0 of the trace is midnight)
+    folded = {}
+    for name, values in stats.items():
+        padded = np.zeros((-(-len(values) // hours_per_day) * hours_per_day,) + values.shape[1:])
+        padded[:len(values)] = values
+        folded[name] = padded.reshape((-1, hours_per_day) + values.shape[1:]).sum(axis=0)
+    return folded
+
+
+def effective_mu(stats, Mu=6, idle_cost=defaults["idle_cost"], wait_cost=defaults["wait_cost"], normalize=False):
+    # Load-dependent marginal cost per hour (with mean μ if normalize); hours without executions keep the nominal μ
+    execution = stats["execution_seconds"]
+    cost = execution + stats["cold_start_seconds"] + idle_cost * stats["idle_seconds"] + wait_cost * stats["wait_seconds"]
+    busy = execution > 0
+    ratio = np.divide(cost, execution, out=np.ones_like(execution), where=busy)
+    if normalize and np.any(busy):
+        ratio = np.where(busy, ratio / np.mean(ratio[busy]), 1.0)
+    return Mu * ratio
+
+
+def mean_latency(stats):
+    invocations = stats["invocations"]
+    return np.divide(stats["latency_seconds"], invocations, out=np.zeros_like(invocations), where=invocations > 0)
+
+
+def latency_percentile(stats, q=95):
+    # Upper bin edge holding the q-th percentile of latency per hour (0 for hours without arrivals)
+    histogram = stats["latency_histogram"]
+    cumulative = np.cumsum(histogram, axis=-1)
+    total = cumulative[..., -1:]
+    position = np.argmax(cumulative >= total * q / 100, axis=-1)
+    edges = latency_bins[1:][position]
+    return np.where(total[..., 0] > 0, np.minimum(edges, np.max(latency_bins[np.isfinite(latency_bins)])), 0.0)
@@ -0,0 +1,75 @@
+import numpy as np
+
+# Bounded-memory heavy hitters for picking the busiest apps during a streaming pass.
+#
+# MisraGries keeps at most `capacity` counters, so choosing the top 1,000 of millions of apps
+# never needs a count per app. Misra–Gries counters (isomorphic to Space-Saving, Agarwal et al.
+# 2012, "Mergeable summaries") make chunk updates and merges vectorized: add the chunk's (or the
+# other sketch's) counts, and when more than `capacity` keys remain, subtract the
+# (capacity + 1)-th largest count from all of them and drop the ones that reach zero.
+#
+#   counts[key] <= true count <= counts[key] + error,   error <= total / (capacity + 1)
+#
+# so every key with more than total / (capacity + 1) occurrences is kept, and top(k) is exact
+# whenever the k-th count exceeds the (k + 1)-th by more than `error`. With capacity >= the
+# number of distinct keys nothing is ever subtracted and the counts are exact.
+
+default_capacity = 10_000
+
+
+class MisraGries:
+
+    def __init__(self, capacity=default_capacity):
+        self.capacity = capacity
+        self.keys = None
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.error = 0              # sum of the subtracted counts, the largest possible undercount
+        self.total = 0
+
+    def update(self, keys, weights=None):
+        # Count a chunk of keys (ints or strings), each with weight 1 or `weights`
+        keys = np.asarray(keys)
+        if not len(keys):
+            return
+        if weights is None:
+            keys, counts = np.unique(keys, return_counts=True)
+        else:
+            keys, inverse = np.unique(keys, return_inverse=True)
+            counts = np.zeros(len(keys), dtype=np.int64)
+            np.add.at(counts, inverse, np.asarray(weights, dtype=np.int64))
+        self.total += int(counts.sum())
+        self._add(keys, counts.astype(np.int64))
+
+    def merge(self, other):
+        # Fold another sketch (e.g. of another file or worker) into this one
+        if other.keys is not None:
+            self._add(other.keys, other.counts)
+        self.error += other.error
+        self.total += other.total
+
+    def _add(self, keys, counts):
+        if self.keys is not None:
+            keys = np.concatenate([self.keys, keys])
+            counts = np.concatenate([self.counts, counts])
+        keys, inverse = np.unique(keys, return_inverse=True)
+        merged = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(merged, inverse, counts)
+        if len(keys) > self.capacity:
+            cut = int(np.partition(merged, len(merged) - self.capacity - 1)[len(merged) - self.capacity - 1])
+            merged -= cut
+            self.error += cut
+            keep = merged > 0
+            keys, merged = keys[keep], merged[keep]
+        self.keys, self.counts = keys, merged
+
+    def top(self, k):
+        # (keys, count lower bounds) of the k largest counters, ties in key order
+        if self.keys is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        order = np.argsort(-self.counts, kind="stable")[:k]
+        return self.keys[order], self.counts[order]
+
+    def table(self):
+        # (counters, 3) int64 rows [key, count, error], largest first, for integer keys
+        keys, counts = self.top(self.capacity)
+        return np.column_stack([keys, counts, np.full(len(keys), self.error)]).astype(np.int64)
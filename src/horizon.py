@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import instrumentation
+from demand_cache import finalize_column
+from dsp_kernels import dsp_price, adaptive_price, hourly_metrics, cost_savings
+from sparse_demand import SparseDemand, window, step_totals, hourly_metrics as sparse_hourly_metrics
+
+# Streaming simulation of the 01_/05_ hour x client loop over an arbitrary horizon
+# (e.g. 336 hourly steps for the two-week trace, or 20,160 minute buckets).
+#
+# The demand series is consumed as a stream of windows of time steps. Per-step metrics are
+# appended to raw files on disk and turned into .npy arrays at the end, and only running
+# totals are kept in memory, so memory does not grow with the horizon. A sparse series
+# (sparse_demand.SparseDemand, e.g. demand_cache.load_sparse_series) streams windows of its
+# non-zero entries, so minute steps over many apps cost time per invocation, not per cell.
+
+step_metrics = ("resource_utilization", "client_count", "provider_utility", "client_utility",
+                "cost_static", "cost_dynamic")
+policies = ("dsp", "adaptive")
+
+
+def demand_windows(series, window_steps=168):
+    # (first step, δ_u window) pairs read from a (memory-mapped) steps x clients series
+    for start in range(0, series.shape[0], window_steps):
+        if isinstance(series, SparseDemand):
+            yield start, window(series, start, start + window_steps)
+        else:
+            yield start, np.asarray(series[start:start + window_steps], dtype=np.float64)
+
+
+def step_hours(steps, step_seconds=3600):
+    # Hour of day of each step, step 0 starting at midnight
+    return (np.asarray(steps) * step_seconds // 3600) % 24
+
+
+class MetricsWriter:
+    # Appends per-step metric arrays to <out_dir>/<name>.raw, close() writes <name>.npy
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.files = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def append(self, metrics):
+        for name, values in metrics.items():
+            if name not in self.files:
+                self.files[name] = open(os.path.join(self.out_dir, name + ".raw"), "wb")
+            self.files[name].write(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+    def close(self):
+        for name, f in self.files.items():
+            f.close()
+            finalize_column(os.path.join(self.out_dir, name + ".raw"), os.path.join(self.out_dir, name + ".npy"), np.float64)
+        self.files = {}
+
+
+def simulate_horizon(windows, out_dir, Lambda=800, Mu=6, peak_Phi=16.6667, off_peak_Phi=8.333,
+                     static_Phi=16.6667, step_seconds=3600, adaptive_min_Phi=12, adaptive_max_Phi=20):
+    # DSP and adaptive pricing over every window; per-step metrics go to <out_dir>/<policy>_<metric>.npy.
+    # The adaptive price of a window's first step uses the previous window's last step.
+    writer = MetricsWriter(out_dir)
+    totals = {"steps": 0, "cost_static": 0.0}
+    for policy in policies:
+        totals[policy + "_cost"] = 0.0
+        totals[policy + "_provider_utility"] = 0.0
+    previous = None
+
+    for start, Delta in windows:
+        instrumentation.count("horizon_windows")
+        sparse = isinstance(Delta, SparseDemand)
+        number_of_steps, number_of_clients = Delta.shape
+        steps = np.arange(start, start + number_of_steps)
+        Phi_dsp = dsp_price(step_hours(steps, step_seconds), peak_Phi, off_peak_Phi)
+        # The adaptive price only needs the total demand per step
+        step_demand = step_totals(Delta)
+        with_previous = step_demand if previous is None else np.concatenate([previous, step_demand])
+        offset = 0 if previous is None else 1
+        Phi_adaptive = adaptive_price(np.arange(offset, offset + number_of_steps), with_previous,
+                                      adaptive_min_Phi, adaptive_max_Phi, 70 * number_of_clients, 100 * number_of_clients)
+        kernel = sparse_hourly_metrics if sparse else hourly_metrics
+        metrics = kernel(Delta, Lambda, np.stack([Phi_dsp, Phi_adaptive]), Mu, static_Phi)
+
+        step_static = step_demand[:, 0] * static_Phi if sparse else np.sum(Delta * static_Phi, axis=-1)
+        record = {"cost_static_all": step_static, "Phi_dsp": Phi_dsp, "Phi_adaptive": Phi_adaptive}
+        for k, policy in enumerate(policies):
+            for name in step_metrics:
+                record[f"{policy}_{name}"] = metrics[name][k]
+            totals[policy + "_cost"] += float(np.sum(metrics["cost_dynamic"][k]))
+            totals[policy + "_provider_utility"] += float(np.sum(metrics["provider_utility"][k]))
+        writer.append(record)
+
+        totals["cost_static"] += float(np.sum(step_static))
+        totals["steps"] += number_of_steps
+        previous = with_previous[-1:]
+
+    writer.close()
+    for policy in policies:
+        totals[policy + "_cost_savings"] = float(cost_savings(totals["cost_static"], totals[policy + "_cost"]))
+    return totals
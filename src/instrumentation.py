@@ -0,0 +1,130 @@
+import atexit
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Opt-in instrumentation of the simulation pipeline: per-stage timers, counters and an optional
+# cProfile / tracemalloc hook, exported as a JSON run report.
+#
+#   with stage("sweep"):            times the block (nested stages are reported as "sweep/chunk")
+#   count("client_hours", n)        adds to a counter
+#
+# Disabled (the default), stage() returns one shared nullcontext and count() returns at once,
+# so the hooks can stay in the kernels. Counters that need extra work (e.g. summing a mask)
+# are guarded with `if instrumentation.enabled:` at the call site.
+#
+# Enable with enable() / write_report(path), the --report / --profile options of dsp_cli.py,
+# or for any script with the environment:
+#   DSP_REPORT=run.json [DSP_PROFILE=cpu,memory] python 05_DSP_vs_Adaptive_Simulation.py
+# Counters are per process: sweep workers in a process pool are timed as a whole by the parent.
+
+enabled = False
+profile_top = 30                # functions kept from the cProfile stats
+
+_null_stage = nullcontext()
+_stages = {}
+_counters = {}
+_stack = []
+_profiler = None
+_memory = False
+_started = None
+
+
+def reset():
+    global _started
+    _stages.clear()
+    _counters.clear()
+    _stack.clear()
+    _started = time.perf_counter()
+
+
+def enable(profile=False, memory=False):
+    # Start collecting; profile=True runs cProfile, memory=True tracks peak memory per stage
+    global enabled, _profiler, _memory
+    reset()
+    enabled = True
+    if profile:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _memory = memory
+
+
+def disable():
+    global enabled, _memory
+    enabled = False
+    if _profiler is not None:
+        _profiler.disable()
+    if _memory:
+        tracemalloc.stop()
+        _memory = False
+
+
+def stage(name):
+    return _timed(name) if enabled else _null_stage
+
+
+@contextmanager
+def _timed(name):
+    path = "/".join([frame[0] for frame in _stack] + [name])
+    frame = [name, 0]           # [name, highest peak of finished child stages]
+    _stack.append(frame)
+    if _memory:
+        if len(_stack) > 1:
+            _stack[-2][1] = max(_stack[-2][1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _stack.pop()
+        record = _stages.setdefault(path, {"calls": 0, "seconds": 0.0})
+        record["calls"] += 1
+        record["seconds"] += seconds
+        if _memory:
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            record["peak_bytes"] = max(record.get("peak_bytes", 0), peak)
+            if _stack:
+                _stack[-1][1] = max(_stack[-1][1], peak)
+
+
+def count(name, value=1):
+    if enabled:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def _profile_stats():
+    import pstats
+    stats = pstats.Stats(_profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:profile_top]
+    return [{"function": f"{file}:{line}({function})", "calls": calls, "total_seconds": total,
+             "cumulative_seconds": cumulative}
+            for (file, line, function), (_, calls, total, cumulative, _) in rows]
+
+
+def report():
+    result = {
+        "wall_seconds": time.perf_counter() - _started if _started is not None else 0.0,
+        "stages": {name: dict(record) for name, record in sorted(_stages.items())},
+        "counters": dict(sorted(_counters.items())),
+    }
+    if _profiler is not None:
+        result["profile"] = _profile_stats()
+    return result
+
+
+def write_report(path):
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=2)
+    return path
+
+
+if os.environ.get("DSP_REPORT"):
+    _options = os.environ.get("DSP_PROFILE", "").split(",")
+    enable(profile="cpu" in _options, memory="memory" in _options)
+    atexit.register(lambda: write_report(os.environ["DSP_REPORT"]))
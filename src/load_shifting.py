@@ -0,0 +1,116 @@
+import numpy as np
+import instrumentation
+
+# Load shifting: clients move part of their demand between the slots of a day (or any window of
+# `window` slots) towards cheaper prices, instead of only participating or not at their observed δ_uh.
+#
+# A share `flexibility` of every client's demand in a window can be moved; the rest stays in the
+# slot it was observed in. The client reallocates the window's demand D_u to maximize the summed
+# client_utility of dsp_kernels under the window's prices,
+#
+#   max_x  sum_s λ_u log(1 + x_s) - φ_s x_s   s.t.  sum_s x_s = D_u,  x_s >= l_s = (1 - flexibility) δ_us
+#
+# The objective is concave and separable, so the optimum is water-filling with one multiplier ν_u
+# for the demand constraint:
+#
+#   x_s(ν) = max(λ_u / (φ_s + ν) - 1, l_s),   sum_s x_s(ν) = D_u
+#
+# g(ν) = sum_s x_s(ν) - D_u is convex and decreasing, so Newton steps started left of the root
+# rise monotonically to it without overshooting. By Jensen, sum_s 1 / (φ_s + ν) >= S / (mean φ + ν),
+# so ν_0 = λ_u S / (S + D_u) - mean φ (exact under a flat price) is left of the root, as is
+# λ_u / (D_u + 1) - min φ (the cheapest slot alone takes D_u); the larger of the two leaves a few
+# Newton steps. All clients of a block of block_clients, of every window and every price scenario
+# take their steps together as one array problem with reused buffers; the last step's residual is
+# folded back into the moved demand so that every window's demand is conserved exactly.
+#
+# Clients with λ_u <= 0 put their movable demand into the window's cheapest slot. The shifted
+# demand has the layout of dsp_kernels and goes straight into hourly_metrics / evaluate_policies.
+
+default_flexibility = 0.3       # share of a client's demand it is willing to move
+block_clients = 1024            # clients solved together (buffers of block_clients x slots stay in cache)
+max_iterations = 50
+tolerance = 1e-10               # Newton stops at g(ν) <= tolerance * (D_u + 1)
+
+
+def _windows(values, window, axis_shape):
+    # (..., slots, x) -> (..., windows, window, x)
+    return values.reshape(values.shape[:-2] + (-1, window) + axis_shape)
+
+
+def water_fill(Lambda, Phi, floor, total, iterations=max_iterations, tol=tolerance):
+    # x (..., slots, clients) maximizing sum_s λ log(1 + x_s) - φ_s x_s with sum_s x_s = total
+    # and x >= floor. Lambda and total are (..., 1, clients), Phi is (..., slots, 1).
+    positive = Lambda > 0
+    Lambda = np.where(positive, Lambda, 1.0)
+    slots = Phi.shape[-2]
+    Phi_min = np.min(Phi, axis=-2, keepdims=True)
+    nu = np.maximum(Lambda * slots / (slots + total) - np.mean(Phi, axis=-2, keepdims=True),
+                    Lambda / (total + 1) - Phi_min)
+    shape = np.broadcast_shapes(Phi.shape, floor.shape, nu.shape)
+    inv, x, kept = np.empty(shape), np.empty(shape), np.empty(shape)
+    active = np.empty(shape, dtype=bool)
+    for _ in range(iterations):
+        np.reciprocal(np.add(Phi, nu, out=inv), out=inv)
+        np.multiply(Lambda, inv, out=x)
+        x -= 1
+        np.greater(x, floor, out=active)
+        g = np.sum(np.maximum(x, floor, out=kept), axis=-2, keepdims=True) - total
+        if np.all(g <= tol * (total + 1)):
+            break
+        x += 1
+        x *= inv
+        x *= active
+        slope = np.sum(x, axis=-2, keepdims=True)      # -g'(ν)
+        nu = nu + np.divide(g, slope, out=np.zeros_like(g), where=slope > 0)
+    x = np.maximum(Lambda / (Phi + nu) - 1, floor)
+
+    # Rescale the moved part so that sum_s x_s = total exactly
+    movable = total - np.sum(floor, axis=-2, keepdims=True)
+    moved = np.sum(x, axis=-2, keepdims=True) - (total - movable)
+    x = floor + (x - floor) * np.divide(movable, moved, out=np.zeros_like(moved), where=moved > 0)
+    # λ <= 0 (or nothing moved): the movable demand goes to the cheapest slot
+    cheapest = np.arange(slots)[:, None] == np.argmin(Phi, axis=-2)[..., None, :]
+    idle = ~positive | ~(moved > 0)
+    return np.where(idle, floor + np.where(cheapest, movable, 0.0), x)
+
+
+def shift_demand(Delta, Lambda, Phi, flexibility=default_flexibility, window=None):
+    # Shifted δ_us for Delta (..., slots, clients) under prices Phi (..., slots); leading axes of
+    # Delta and Phi broadcast (e.g. one row of Phi per policy). Lambda is a scalar, (clients,) or
+    # (..., 1, clients). Demand is moved within consecutive windows of `window` slots (one window
+    # over all slots by default); slots must be a multiple of window.
+    Delta = np.asarray(Delta, dtype=np.float64)
+    Phi = np.asarray(Phi, dtype=np.float64)
+    Lambda = np.asarray(Lambda, dtype=np.float64)
+    slots, clients = Delta.shape[-2:]
+    window = window or slots
+    if slots % window:
+        raise ValueError(f"{slots} slots are not a multiple of the window ({window})")
+    if not 0 <= flexibility <= 1:
+        raise ValueError("flexibility must be in [0, 1]")
+    if np.any(Phi <= 0):
+        raise ValueError("prices must be positive")
+    if flexibility == 0:
+        return np.broadcast_to(Delta, np.broadcast_shapes(Delta.shape, Phi.shape[:-1] + (slots, 1))).copy()
+
+    D = _windows(Delta, window, (clients,))
+    Phi = _windows(Phi[..., None], window, (1,))
+    if Lambda.ndim >= 2:
+        Lambda = Lambda[..., None, :, :]
+    Lambda = np.broadcast_to(Lambda, Lambda.shape[:-1] + (clients,))
+    shifted = np.empty(np.broadcast_shapes(D.shape, Phi.shape, Lambda.shape))
+    with instrumentation.stage("shift_demand"):
+        for start in range(0, clients, block_clients):
+            part = D[..., start:start + block_clients]
+            shifted[..., start:start + block_clients] = water_fill(
+                Lambda[..., start:start + block_clients], Phi, (1 - flexibility) * part,
+                np.sum(part, axis=-2, keepdims=True))
+    instrumentation.count("shifted_client_slots", shifted.size)
+    return shifted.reshape(shifted.shape[:-3] + (slots, clients))
+
+
+def peak_share(load, peak):
+    # Share of an hourly load (..., slots), e.g. resource_utilization, in the slots where `peak` is True
+    load = np.asarray(load, dtype=np.float64)
+    total = np.sum(load, axis=-1)
+    return np.divide(np.sum(np.where(peak, load, 0.0), axis=-1), total, out=np.zeros_like(total), where=total > 0)
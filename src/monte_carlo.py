@@ -0,0 +1,150 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from dsp_kernels import dsp_price, adaptive_price, hourly_metrics, cost_savings
+
+# Bootstrap / Monte Carlo confidence intervals for the headline cost savings and provider utility.
+#
+# Every replicate is a resampled or perturbed copy of the simulation input, and all replicates of
+# a block are evaluated together as arrays of shape (replicates, policy, hours, clients):
+#
+#   hours  resample the hours of the demand matrix with replacement (each keeps its hour-of-day
+#          price; the adaptive price follows the resampled sequence)
+#   apps   resample the clients (columns) with replacement
+#   days   resample the days of the raw hourly invocation series with replacement, fold them into
+#          hour of day and min-max normalize to 0–100 like the loader (needs `series`)
+#   Lambda_sigma / Mu_sigma  multiply λ and μ by lognormal noise per replicate
+#
+# Replicates come in fixed blocks with one seeded Generator stream per block
+# (SeedSequence(seed, spawn_key=(block,))), so results do not depend on the worker count.
+
+replicate_block = 1000          # replicates per Generator stream / parallel task
+resample_modes = ("hours", "apps", "days")
+policies = ("dsp", "adaptive")
+
+defaults = {
+    "Lambda": 800,              # λ_u per developer
+    "Mu": 6,                    # Marginal cost μ
+    "peak_Phi": 16.6667,        # DSP peak price (8 AM–8 PM)
+    "off_peak_Phi": 8.333,      # DSP off-peak price
+    "static_Phi": 16.6667,      # Static price
+    "adaptive_min_Phi": 12,     # Smith and Lee (2024) adaptive pricing range [6]
+    "adaptive_max_Phi": 20,
+}
+
+
+def normalize_columns(counts):
+    # Min-max normalization to 0–100 over the hour axis, per replicate and app
+    counts = np.asarray(counts, dtype=np.float64)
+    col_min = counts.min(axis=-2, keepdims=True)
+    col_range = counts.max(axis=-2, keepdims=True) - col_min
+    return np.divide(100 * (counts - col_min), col_range, out=np.zeros_like(counts), where=col_range > 0)
+
+
+def daily_counts(series, hours_per_day=24):
+    # (days, hour of day, apps) raw counts of the complete days of an hourly invocation series
+    series = np.asarray(series)
+    days = len(series) // hours_per_day
+    return series[:days * hours_per_day].reshape(days, hours_per_day, series.shape[-1])
+
+
+def replicate_inputs(rng, size, Delta, resample=(), series=None, Lambda=800, Mu=6, Lambda_sigma=0.0, Mu_sigma=0.0):
+    # (Delta, hour of day, λ, μ) for `size` replicates; shapes (R, hours, clients), (R, hours),
+    # broadcastable to (R, hours, clients) and (R,)
+    unknown = set(resample).difference(resample_modes)
+    if unknown:
+        raise ValueError(f"Unknown resample modes: {sorted(unknown)}")
+    if "days" in resample:
+        days = daily_counts(series)
+        weights = rng.multinomial(len(days), np.full(len(days), 1 / len(days)), size=size)
+        Delta_r = normalize_columns(np.einsum("rd,dhn->rhn", weights, days))
+    else:
+        Delta_r = np.broadcast_to(np.asarray(Delta, dtype=np.float64), (size,) + np.shape(Delta))
+    hours = np.broadcast_to(np.arange(Delta_r.shape[1]), Delta_r.shape[:2])
+    Lambda = np.asarray(Lambda, dtype=np.float64)
+    Lambda_r = np.broadcast_to(Lambda, (size, 1, Delta_r.shape[2]) if Lambda.ndim else (size, 1, 1))
+
+    if "hours" in resample:
+        hours = rng.integers(0, Delta_r.shape[1], hours.shape)
+        Delta_r = np.take_along_axis(Delta_r, hours[..., None], axis=1)
+    if "apps" in resample:
+        apps = rng.integers(0, Delta_r.shape[2], (size, Delta_r.shape[2]))
+        Delta_r = np.take_along_axis(Delta_r, apps[:, None, :], axis=2)
+        if Lambda.ndim:
+            Lambda_r = Lambda[apps][:, None, :]
+    if Lambda_sigma:
+        Lambda_r = Lambda_r * rng.lognormal(0.0, Lambda_sigma, (size, 1, 1))
+    Mu_r = np.full(size, float(Mu))
+    if Mu_sigma:
+        Mu_r = Mu_r * rng.lognormal(0.0, Mu_sigma, size)
+    return Delta_r, hours, Lambda_r, Mu_r
+
+
+def replicate_totals(Delta, hours, Lambda, Mu, params):
+    # Totals per replicate and policy (dsp, adaptive), each of shape (R, 2)
+    number_of_clients = Delta.shape[-1]
+    Phi = np.stack([
+        dsp_price(hours, params["peak_Phi"], params["off_peak_Phi"]),
+        adaptive_price(np.arange(Delta.shape[1]), Delta, params["adaptive_min_Phi"], params["adaptive_max_Phi"],
+                       70 * number_of_clients, 100 * number_of_clients),
+    ], axis=1)
+    metrics = hourly_metrics(Delta[:, None], Lambda[:, None], Phi, Mu[:, None, None], params["static_Phi"])
+    total_static = np.sum(metrics["cost_static"], axis=-1)
+    total_dynamic = np.sum(metrics["cost_dynamic"], axis=-1)
+    # 05_ compares with every client paying the static price for its whole demand
+    total_static_all = np.sum(Delta * params["static_Phi"], axis=(-2, -1))[:, None]
+    return {
+        "cost_savings": cost_savings(total_static, total_dynamic),
+        "cost_savings_all": cost_savings(np.broadcast_to(total_static_all, total_dynamic.shape), total_dynamic),
+        "provider_utility": np.sum(metrics["provider_utility"], axis=-1),
+        "client_utility": np.sum(metrics["client_utility"], axis=-1),
+        "resource_utilization": np.sum(metrics["resource_utilization"], axis=-1),
+    }
+
+
+def _run_block(block, replicates, seed, Delta, series, options, params):
+    size = min(replicate_block, replicates - block * replicate_block)
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    return replicate_totals(*replicate_inputs(rng, size, Delta, series=series, **options), params)
+
+
+def bootstrap(Delta, replicates=10_000, seed=0, resample=("hours",), series=None, Lambda_sigma=0.0, Mu_sigma=0.0,
+              workers=1, **params):
+    # {metric: (replicates, 2)} for the dsp and adaptive policies
+    from sweep_runner import pool_context
+    params = dict(defaults, **params)
+    options = {"resample": tuple(resample), "Lambda": params["Lambda"], "Mu": params["Mu"],
+               "Lambda_sigma": Lambda_sigma, "Mu_sigma": Mu_sigma}
+    if "days" in resample and series is None:
+        raise ValueError("resampling days needs the hourly invocation series")
+    task = partial(_run_block, replicates=replicates, seed=seed, Delta=Delta, series=series, options=options, params=params)
+    blocks = range(-(-replicates // replicate_block))
+    if workers == 1:
+        parts = [task(block) for block in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            parts = list(pool.map(task, blocks))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def point_estimate(Delta, **params):
+    # The same totals without resampling, {metric: (2,)}
+    params = dict(defaults, **params)
+    Delta = np.asarray(Delta, dtype=np.float64)[None]
+    hours = np.arange(Delta.shape[1])[None]
+    Lambda = np.asarray(params["Lambda"], dtype=np.float64)
+    Lambda = Lambda.reshape(1, 1, -1) if Lambda.ndim else Lambda.reshape(1, 1, 1)
+    totals = replicate_totals(Delta, hours, Lambda, np.array([float(params["Mu"])]), params)
+    return {name: values[0] for name, values in totals.items()}
+
+
+def confidence_intervals(samples, level=0.95):
+    # Percentile intervals per metric and policy: {metric: {policy: {mean, std, low, high}}}
+    tail = (1 - level) / 2 * 100
+    result = {}
+    for name, values in samples.items():
+        low, high = np.percentile(values, [tail, 100 - tail], axis=0)
+        result[name] = {policy: {"mean": float(np.mean(values[:, k])), "std": float(np.std(values[:, k])),
+                                 "low": float(low[k]), "high": float(high[k])}
+                        for k, policy in enumerate(policies)}
+    return result
@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import numpy as np
+from dsp_kernels import hours_per_day, peak_start, peak_end
+
+# Online DSP / adaptive pricing from a live stream of invocation events.
+#
+# Events (app, end_timestamp) land in a ring of time slots: per-(slot, app) counts, a global
+# count per slot and a running normalized demand per slot. A slot is cleared when the clock
+# moves on to a new bucket, so ingesting an event and serving a quote are both O(1) (a slot
+# reset is O(apps) once per bucket, not per event). With fold_days=True the ring is the 24
+# hours of the day and is never cleared, which reproduces the hour-of-day matrix of the loader.
+#
+# The adaptive quote uses the previous slot's demand like 05_DSP_vs_Adaptive_Simulation.py.
+# Pass the loader's per-app min and range to quote on the normalized 0–100 scale of Delta_List;
+# without them demand is in raw invocation counts. Events are expected in time order (events
+# older than the window are dropped), and apps are either int codes or string IDs (coded in
+# first-seen order), not a mix of both.
+#
+#   python online_pricing.py --socket /tmp/dsp.sock   (line protocol, see handle_client)
+#
+# Over a Unix socket, one E line per event sustains about 170k events/s (line parsing dominates);
+# B lines of 10,000 events each reach about 2.5M events/s. add_batch called directly is faster still.
+
+line_limit = 1 << 24            # bytes per protocol line, room for a B batch of ~1M events
+
+
+class OnlinePricer:
+
+    def __init__(self, number_of_apps, bucket_seconds=3600, window_slots=hours_per_day, fold_days=False,
+                 peak_Phi=16.6667, off_peak_Phi=8.333, adaptive_min_Phi=12, adaptive_max_Phi=20,
+                 min_invocations=None, max_invocations=None, col_min=None, col_range=None):
+        self.number_of_apps = number_of_apps
+        self.bucket_seconds = 3600 if fold_days else bucket_seconds
+        self.fold_days = fold_days
+        self.slots = hours_per_day if fold_days else window_slots
+        self.peak_Phi, self.off_peak_Phi = peak_Phi, off_peak_Phi
+        self.adaptive_min_Phi, self.adaptive_max_Phi = adaptive_min_Phi, adaptive_max_Phi
+        self.min_invocations = 70 * number_of_apps if min_invocations is None else min_invocations
+        self.max_invocations = 100 * number_of_apps if max_invocations is None else max_invocations
+
+        # Normalized demand: δ_u = 100 * (count - min) / range, so each event adds 100 / range
+        # and every slot starts from -sum(100 * min / range)
+        if col_range is None:
+            self.weight = np.ones(number_of_apps)
+            self.offset = 0.0
+        else:
+            col_range = np.asarray(col_range, dtype=np.float64)
+            self.weight = np.divide(100.0, col_range, out=np.zeros_like(col_range), where=col_range > 0)
+            self.offset = -float(np.sum(np.asarray(col_min, dtype=np.float64) * self.weight))
+        self._weight = self.weight.tolist()
+
+        self.app_counts = np.zeros((self.slots, number_of_apps), dtype=np.int64)
+        self.app_window = np.zeros(number_of_apps, dtype=np.int64)
+        self.slot_counts = [0] * self.slots
+        self.slot_demand = [self.offset] * self.slots
+        self.slot_bucket = [None] * self.slots
+        self.clock = None              # latest bucket seen
+        self.app_index = {}
+        self.events = 0
+
+    def app_code(self, app):
+        # Codes in first-seen order for string app IDs, ints pass through
+        if isinstance(app, (int, np.integer)):
+            return int(app)
+        code = self.app_index.get(app)
+        if code is None:
+            code = self.app_index[app] = len(self.app_index)
+        return code
+
+    def _reset(self, slot, bucket):
+        # Evict the slot's old bucket from the window aggregates
+        self.app_window -= self.app_counts[slot]
+        self.app_counts[slot] = 0
+        self.slot_counts[slot] = 0
+        self.slot_demand[slot] = self.offset
+        self.slot_bucket[slot] = bucket
+
+    def _slot(self, bucket):
+        # Slot of `bucket`, None once the bucket has left the window. When the clock moves on, the
+        # slot of every bucket it skipped is cleared too (at most `slots`, once per bucket), so the
+        # window always holds exactly the last `slots` buckets.
+        slot = bucket % self.slots
+        if self.fold_days or self.slot_bucket[slot] == bucket:
+            return slot
+        if self.clock is not None and bucket <= self.clock - self.slots:
+            return None
+        if self.clock is None or bucket > self.clock:
+            first = bucket if self.clock is None else max(self.clock + 1, bucket - self.slots + 1)
+            for skipped in range(first, bucket):
+                self._reset(skipped % self.slots, skipped)
+            self.clock = bucket
+        self._reset(slot, bucket)
+        return slot
+
+    def add(self, app, end_timestamp):
+        # One event, O(1)
+        code = self.app_code(app)
+        if not 0 <= code < self.number_of_apps:
+            return
+        slot = self._slot(int(end_timestamp // self.bucket_seconds))
+        if slot is None:
+            return
+        self.app_counts[slot, code] += 1
+        self.app_window[code] += 1
+        self.slot_counts[slot] += 1
+        self.slot_demand[slot] += self._weight[code]
+        self.events += 1
+
+    def add_batch(self, apps, end_timestamps):
+        # Micro-batch of int app codes, vectorized per bucket. Buckets are applied in time order,
+        # each slot cleared before it is filled, so a batch spanning more than the window evicts
+        # its own early buckets exactly like one event at a time would.
+        apps = np.asarray(apps, dtype=np.int64)
+        buckets = np.floor_divide(np.asarray(end_timestamps, dtype=np.float64), self.bucket_seconds).astype(np.int64)
+        keep = (apps >= 0) & (apps < self.number_of_apps)
+        apps, buckets = apps[keep], buckets[keep]
+        if not len(apps):
+            return
+        order = np.argsort(buckets, kind="stable")
+        apps, buckets = apps[order], buckets[order]
+        starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+        for bucket, part in zip(buckets[starts], np.split(apps, starts[1:])):
+            slot = self._slot(int(bucket))
+            if slot is None:
+                continue
+            counts = np.bincount(part, minlength=self.number_of_apps)
+            self.app_counts[slot] += counts
+            self.app_window += counts
+            self.slot_counts[slot] += len(part)
+            self.slot_demand[slot] += float(np.sum(self.weight[part]))
+            self.events += len(part)
+
+    def hour_of_day(self, timestamp):
+        return int(timestamp // 3600) % hours_per_day
+
+    def dsp_quote(self, timestamp):
+        # Peak / off-peak tariff, O(1)
+        hour = self.hour_of_day(timestamp)
+        return self.peak_Phi if peak_start <= hour < peak_end else self.off_peak_Phi
+
+    def demand(self, bucket):
+        # Total (normalized) demand of a bucket still inside the window, else the empty-slot value
+        slot = bucket % self.slots
+        if self.fold_days or self.slot_bucket[slot] == bucket:
+            return self.slot_demand[slot]
+        return self.offset
+
+    def adaptive_quote(self, timestamp):
+        # Adaptive price from the previous bucket's total demand, O(1)
+        bucket = int(timestamp // self.bucket_seconds)
+        if self.fold_days and bucket % self.slots == 0:
+            return (self.adaptive_min_Phi + self.adaptive_max_Phi) / 2
+        normalized = (self.demand(bucket - 1) - self.min_invocations) / (self.max_invocations - self.min_invocations)
+        price = self.adaptive_min_Phi + normalized * (self.adaptive_max_Phi - self.adaptive_min_Phi)
+        return max(min(price, self.adaptive_max_Phi), self.adaptive_min_Phi)
+
+    def quote(self, policy, timestamp):
+        return self.dsp_quote(timestamp) if policy == "dsp" else self.adaptive_quote(timestamp)
+
+    def stats(self):
+        return {"events": self.events, "apps": self.number_of_apps,
+                "window_invocations": int(self.app_window.sum())}
+
+
+async def handle_client(pricer, reader, writer):
+    # Line protocol:
+    #   E <app> <end_timestamp>       ingest one event (no reply)
+    #   B <app> <end_timestamp> ...   ingest a batch of int app codes with add_batch (no reply)
+    #   Q <dsp|adaptive> <timestamp>  reply with the price
+    #   S                             reply with JSON stats
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        parts = line.split()
+        if not parts:
+            continue
+        command = parts[0]
+        if command == b"E":
+            app = parts[1].decode()
+            pricer.add(int(app) if app.isdigit() else app, float(parts[2]))
+        elif command == b"B":
+            values = np.array(parts[1:], dtype=np.float64).reshape(-1, 2)
+            pricer.add_batch(values[:, 0].astype(np.int64), values[:, 1])
+        elif command == b"Q":
+            writer.write(f"{pricer.quote(parts[1].decode(), float(parts[2])):.6f}\n".encode())
+            await writer.drain()
+        elif command == b"S":
+            writer.write((json.dumps(pricer.stats()) + "\n").encode())
+            await writer.drain()
+    writer.close()
+
+
+async def serve(pricer, socket_path=None, host="127.0.0.1", port=8765):
+    handler = lambda reader, writer: handle_client(pricer, reader, writer)
+    if socket_path:
+        server = await asyncio.start_unix_server(handler, path=socket_path, limit=line_limit)
+    else:
+        server = await asyncio.start_server(handler, host, port, limit=line_limit)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online DSP pricing server")
+    parser.add_argument("--apps", type=int, default=10)
+    parser.add_argument("--bucket", type=int, default=3600)
+    parser.add_argument("--window", type=int, default=hours_per_day, help="slots kept in the rolling window")
+    parser.add_argument("--fold-days", action="store_true", help="accumulate by hour of day like the loader")
+    parser.add_argument("--socket", help="unix socket path (default: TCP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+    pricer = OnlinePricer(args.apps, args.bucket, args.window, args.fold_days)
+    asyncio.run(serve(pricer, args.socket, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
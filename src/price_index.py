@@ -0,0 +1,107 @@
+import numpy as np
+import instrumentation
+from collections import namedtuple
+
+# Sorted price-response index: the client responses to a price are threshold functions of φ,
+# so after one sort they can be answered for any number of prices by binary search.
+#
+#   Q(φ) = sum_u max((λ_u / φ) - 1, 0) = (sum of λ_u > φ) / φ - #(λ_u > φ)
+#   client u takes part in an hour iff δ_u > 0 and φ < λ_u * log(1+ δ_u ) / δ_u (break-even price)
+#
+# Both keys are sorted ascending per row with suffix sums of the summed quantities, so a price
+# query is one searchsorted per row plus a gather: O((n + prices) * log n) instead of
+# O(n * prices). Rows are hours (Lambda may differ per hour) or a single row shared by all hours.
+# Sums come from the prefix arrays, so they match dsp_kernels.hourly_metrics up to rounding;
+# δ_u is assumed to be >= 0 like the normalized demand matrix.
+
+ConsumptionIndex = namedtuple("ConsumptionIndex", ["Lambda", "Lambda_sum"])
+ParticipationIndex = namedtuple("ParticipationIndex", ["break_even", "Delta_sum", "value_sum"])
+
+
+def _rows(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values.reshape(-1, values.shape[-1]) if values.ndim else values.reshape(1, 1)
+
+
+def _suffix_sums(values):
+    # out[..., k] = sum(values[..., k:]), out[..., n] = 0
+    total = np.cumsum(values[..., ::-1], axis=-1)[..., ::-1]
+    return np.concatenate([total, np.zeros(values.shape[:-1] + (1,))], axis=-1)
+
+
+def _search(keys, Phi):
+    # (row, position of the first key > φ) for prices Phi of shape (..., rows), or any shape with one row
+    Phi = np.asarray(Phi, dtype=np.float64)
+    if len(keys) == 1:
+        return 0, np.searchsorted(keys[0], Phi, side="right")
+    position = np.empty(Phi.shape, dtype=np.intp)
+    for row in range(len(keys)):
+        position[..., row] = np.searchsorted(keys[row], Phi[..., row], side="right")
+    return np.arange(len(keys)), position
+
+
+def consumption_index(Lambda_List):
+    # λ_u sorted per row: (clients,) for one row, (hours, clients) for per-hour λ
+    Lambda = np.sort(_rows(Lambda_List), axis=-1)
+    return ConsumptionIndex(Lambda, _suffix_sums(Lambda))
+
+
+def aggregate_demand(index, Phi):
+    # Q(φ) for every price in Phi
+    Phi = np.asarray(Phi, dtype=np.float64)
+    row, position = _search(index.Lambda, Phi)
+    count = index.Lambda.shape[-1] - position
+    return index.Lambda_sum[row, position] / Phi - count
+
+
+def provider_utility(index, Phi, Mu):
+    # (φ - μ ) * Q(φ)
+    Phi = np.asarray(Phi, dtype=np.float64)
+    return (Phi - Mu) * aggregate_demand(index, Phi)
+
+
+def participation_index(Delta, Lambda):
+    # Break-even prices λ_u * log(1+ δ_u ) / δ_u per (hour, client), sorted per hour, with suffix
+    # sums of δ_u and λ_u * log(1+ δ_u ) in the same order. Idle clients (δ_u = 0) never take part.
+    Delta = _rows(Delta)
+    Lambda = np.broadcast_to(np.asarray(Lambda, dtype=np.float64), Delta.shape)
+    value = Lambda * np.log(1 + Delta)
+    break_even = np.divide(value, Delta, out=np.full(Delta.shape, -np.inf), where=Delta > 0)
+    order = np.argsort(break_even, axis=-1, kind="stable")
+    return ParticipationIndex(np.take_along_axis(break_even, order, axis=-1),
+                              _suffix_sums(np.take_along_axis(Delta, order, axis=-1)),
+                              _suffix_sums(np.take_along_axis(value, order, axis=-1)))
+
+
+def participation(index, Phi, static_Phi=None):
+    # Participating clients and their sums for prices Phi of shape (..., hours)
+    Phi = np.asarray(Phi, dtype=np.float64)
+    row, position = _search(index.break_even, Phi)
+    Delta_sum = index.Delta_sum[row, position]
+    result = {
+        "resource_utilization": Delta_sum,
+        "client_count": index.break_even.shape[-1] - position,
+        "client_utility": index.value_sum[row, position] - Phi * Delta_sum,
+        "cost_dynamic": Phi * Delta_sum,
+    }
+    if static_Phi is not None:
+        result["cost_static"] = np.asarray(static_Phi, dtype=np.float64) * Delta_sum
+    return result
+
+
+def price_response_index(Delta, Lambda):
+    # Both indexes for hourly_metrics-style queries; Lambda is a scalar, (clients,) or (hours, clients)
+    Delta = np.asarray(Delta, dtype=np.float64)
+    Lambda = np.asarray(Lambda, dtype=np.float64)
+    Lambda_List = Lambda if Lambda.ndim == 2 else np.broadcast_to(Lambda, Delta.shape[-1:])
+    return consumption_index(Lambda_List), participation_index(Delta, Lambda)
+
+
+def indexed_hourly_metrics(indexes, Phi, Mu, static_Phi):
+    # Same dict as dsp_kernels.hourly_metrics for prices Phi of shape (..., hours)
+    consumption, clients = indexes
+    with instrumentation.stage("price_index"):
+        metrics = participation(clients, Phi, static_Phi)
+        metrics["provider_utility"] = provider_utility(consumption, Phi, Mu)
+    instrumentation.count("index_queries", np.size(Phi))
+    return metrics
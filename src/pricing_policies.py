@@ -0,0 +1,134 @@
+import numpy as np
+from dsp_kernels import dsp_price, adaptive_price, hourly_metrics, cost_savings
+from sparse_demand import is_sparse, as_sparse, step_totals, hourly_metrics as sparse_hourly_metrics
+
+# Pluggable pricing policies evaluated together in one vectorized pass.
+#
+# A policy is any callable policy(Delta) -> φ per hour, shape (hours,), or a block of
+# candidates, shape (candidates, hours). Delta is the (hours, clients) demand matrix, so
+# user-defined policies can look at demand (a sparse_demand.SparseDemand for sparse input;
+# Delta.shape and step_totals work for both). The factories below build the standard ones
+# and accept arrays to produce whole candidate blocks at once, e.g.
+#     time_of_use(np.linspace(10, 20, 100), 8.333)  -> 100 candidate tariffs
+# evaluate_policies stacks every price vector into one (policies, hours) matrix and computes
+# participation, cost and utility for all of them in a single hourly_metrics call.
+
+
+def static(Phi):
+    # One price all day
+    Phi = np.asarray(Phi, dtype=np.float64)
+    return lambda Delta: np.broadcast_to(Phi[..., None], Phi.shape + (Delta.shape[0],))
+
+
+def time_of_use(peak_Phi, off_peak_Phi, peak_start=8, peak_end=20):
+    # Peak price for peak_start <= hour < peak_end, off-peak otherwise (the DSP tariff);
+    # array arguments broadcast into a block of candidate tariffs
+    params = np.broadcast_arrays(*(np.asarray(p, dtype=np.float64) for p in (peak_Phi, off_peak_Phi, peak_start, peak_end)))
+    return lambda Delta: dsp_price(np.arange(Delta.shape[0]), *(p[..., None] for p in params))
+
+
+def schedule(Phi_hours):
+    # Explicit price per hour of the day, (24,) or a block (candidates, 24)
+    Phi_hours = np.asarray(Phi_hours, dtype=np.float64)
+    return lambda Delta: Phi_hours[..., np.arange(Delta.shape[0]) % Phi_hours.shape[-1]]
+
+
+def lagged_adaptive(min_Phi=12, max_Phi=20, min_invocations=None, max_invocations=None):
+    # Adaptive pricing of Smith and Lee [6]: linear in the previous hour's total demand.
+    # The invocation range defaults to 70–100 per client like 05_.
+    def policy(Delta):
+        number_of_clients = Delta.shape[-1]
+        low = 70 * number_of_clients if min_invocations is None else min_invocations
+        high = 100 * number_of_clients if max_invocations is None else max_invocations
+        return adaptive_price(np.arange(Delta.shape[0]), step_totals(Delta), min_Phi, max_Phi, low, high)
+    return policy
+
+
+def tiered(thresholds, prices, lag=1):
+    # Price tier by the total demand `lag` hours earlier: prices[..., k] applies when the demand
+    # falls in [thresholds[..., k-1], thresholds[..., k]); hour < lag uses the lowest tier.
+    # Leading axes of thresholds (..., tiers - 1) and prices (..., tiers) broadcast into a block
+    # of candidate tariffs.
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.shape[-1] != thresholds.shape[-1] + 1:
+        raise ValueError("tiered pricing needs one more price than thresholds")
+
+    def policy(Delta):
+        total = step_totals(Delta)[..., 0]
+        lagged = np.concatenate([np.full(min(lag, len(total)), -np.inf), total[:len(total) - lag]])
+        # Number of thresholds <= the lagged demand (searchsorted side="right" along the last axis)
+        tier = np.sum(thresholds[..., None, :] <= lagged[:, None], axis=-1)
+        lead = np.broadcast_shapes(thresholds.shape[:-1], prices.shape[:-1])
+        tier = np.broadcast_to(tier, lead + tier.shape[-1:])
+        return np.take_along_axis(np.broadcast_to(prices[..., None, :], lead + (1, prices.shape[-1])),
+                                  tier[..., None], axis=-1)[..., 0]
+    return policy
+
+
+def price_matrix(policies, Delta):
+    # (names, φ matrix of shape (policies, hours)); blocks expand to name[0], name[1], ...
+    names, rows = [], []
+    for name, policy in policies.items():
+        Phi = np.asarray(policy(Delta), dtype=np.float64)
+        if Phi.ndim == 1:
+            names.append(name)
+            rows.append(Phi[None, :])
+        else:
+            Phi = Phi.reshape(-1, Phi.shape[-1])
+            names.extend(f"{name}[{k}]" for k in range(len(Phi)))
+            rows.append(Phi)
+    return names, np.concatenate(rows)
+
+
+def evaluate_policies(policies, Delta, Lambda=800, Mu=6, static_Phi=16.6667, chunk=1024, indexed=False,
+                      flexibility=0, window=None):
+    # Hourly metrics (policies, hours) and totals per policy from one pass over Delta.
+    # Cost savings are against every client paying static_Phi for its whole demand (05_).
+    # indexed=True answers every policy from the sorted price-response index (price_index),
+    # worth it for many policies over many clients; sums then agree up to rounding.
+    # flexibility > 0 lets every client move that share of its demand within windows of `window`
+    # hours towards each policy's cheaper hours first (load_shifting); prices of demand-dependent
+    # policies still come from the unshifted Delta.
+    # A sparse Delta (sparse_demand.SparseDemand or scipy.sparse) is evaluated from its non-zero
+    # entries only (sparse_demand.hourly_metrics).
+    sparse = is_sparse(Delta)
+    Delta = as_sparse(Delta) if sparse else np.asarray(Delta, dtype=np.float64)
+    names, Phi = price_matrix(policies, Delta)
+    if indexed and flexibility:
+        raise ValueError("the price-response index needs the same demand for every policy, not shifted demand")
+    if sparse and (indexed or flexibility):
+        raise ValueError("the price-response index and load shifting need a dense demand matrix")
+    if sparse:
+        metrics = sparse_hourly_metrics(Delta, Lambda, Phi, Mu, static_Phi)
+    elif indexed:
+        from price_index import price_response_index, indexed_hourly_metrics
+        metrics = indexed_hourly_metrics(price_response_index(Delta, Lambda), Phi, Mu, static_Phi)
+    else:
+        def demand(Phi):
+            if not flexibility:
+                return Delta
+            from load_shifting import shift_demand
+            return shift_demand(Delta, Lambda, Phi, flexibility, window)
+        parts = [hourly_metrics(demand(Phi[start:start + chunk]), Lambda, Phi[start:start + chunk], Mu, static_Phi)
+                 for start in range(0, len(Phi), chunk)]
+        metrics = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    total_cost_static = float(np.sum(step_totals(Delta)[:, 0] * static_Phi) if sparse else np.sum(Delta * static_Phi))
+    total_cost = np.sum(metrics["cost_dynamic"], axis=-1)
+    totals = {
+        "total_cost": total_cost,
+        "cost_savings": cost_savings(np.full(len(Phi), total_cost_static), total_cost),
+        "provider_utility": np.sum(metrics["provider_utility"], axis=-1),
+        "client_utility": np.sum(metrics["client_utility"], axis=-1),
+        "resource_utilization": np.sum(metrics["resource_utilization"], axis=-1),
+    }
+    return {"names": names, "Phi": Phi, "metrics": metrics, "totals": totals,
+            "total_cost_static": total_cost_static, "flexibility": flexibility}
+
+
+def rank_policies(result, by="provider_utility", descending=True):
+    # [(name, value)] sorted by one of the totals
+    values = result["totals"][by]
+    order = np.argsort(-values if descending else values, kind="stable")
+    return [(result["names"][k], float(values[k])) for k in order]
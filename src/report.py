@@ -0,0 +1,162 @@
+import html
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sweep_runner import pool_context
+
+# Off-screen report rendering: figures are described as plain dicts of panels and arrays,
+# rendered with the Agg backend in a process pool and written as PNG/SVG next to an index.html.
+# Nothing opens a window, and matplotlib is only imported by the rendering processes.
+#
+#   figures = [figure("lambda_100", [line_panel(...), bar_panel(...)], layout=(1, 2))]
+#   render_report(figures, report_dir("01_Lambda_simulation"), "λ sweep")
+#
+# Long series are decimated to a min/max envelope of max_points (peaks survive), and surfaces
+# are strided down to max_side points per axis before anything reaches matplotlib.
+
+default_formats = ("png",)
+max_points = 2000               # points per line series after decimation
+max_side = 200                  # grid points per surface axis after downsampling
+
+
+def report_dir(name):
+    # reports/<name> under the working directory, or under DSP_REPORTS_DIR
+    return os.path.join(os.environ.get("DSP_REPORTS_DIR", "reports"), name)
+
+
+def series(y, x=None, label=None, marker=None):
+    return {"x": x, "y": np.asarray(y), "label": label, "marker": marker}
+
+
+def line_panel(lines, title=None, xlabel=None, ylabel=None, xticks=None, legend=True):
+    return {"kind": "line", "lines": lines, "title": title, "xlabel": xlabel, "ylabel": ylabel,
+            "xticks": xticks, "legend": legend}
+
+
+def bar_panel(labels, values, title=None, ylabel=None):
+    return {"kind": "bar", "labels": list(labels), "values": [float(v) for v in values], "title": title, "ylabel": ylabel}
+
+
+def hist_panel(samples, labels, bins=50, title=None, xlabel=None, ylabel=None):
+    return {"kind": "hist", "samples": [np.asarray(s) for s in samples], "labels": list(labels), "bins": bins,
+            "title": title, "xlabel": xlabel, "ylabel": ylabel}
+
+
+def surface_panel(x, y, z, title=None, xlabel=None, ylabel=None, zlabel=None):
+    # z has shape (len(y), len(x)), like np.meshgrid(x, y)
+    return {"kind": "surface", "x": np.asarray(x), "y": np.asarray(y), "z": np.asarray(z),
+            "title": title, "xlabel": xlabel, "ylabel": ylabel, "zlabel": zlabel}
+
+
+def figure(name, panels, layout=None, figsize=(10, 6), title=None):
+    return {"name": name, "panels": panels, "layout": layout or (1, len(panels)), "figsize": figsize, "title": title}
+
+
+def decimate(x, y, points=max_points):
+    # Min/max envelope: the lowest and highest sample of each of points/2 equal windows, in order
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(len(y)) if x is None else np.asarray(x)
+    if len(y) <= points:
+        return x, y
+    width = -(-len(y) // max(1, points // 2))
+    padded = np.full(-(-len(y) // width) * width, np.nan)
+    padded[:len(y)] = y
+    windows = padded.reshape(-1, width)
+    offsets = np.arange(len(windows)) * width
+    keep = np.unique(np.concatenate([offsets + np.nanargmin(windows, axis=1), offsets + np.nanargmax(windows, axis=1)]))
+    return x[keep], y[keep]
+
+
+def downsample_grid(x, y, z, side=max_side):
+    # Every k-th point per axis so that each axis has at most `side` points, last point kept
+    def take(n):
+        index = np.arange(0, n, max(1, -(-n // side)))
+        return index if index[-1] == n - 1 else np.append(index, n - 1)
+    rows, columns = take(len(y)), take(len(x))
+    return x[columns], y[rows], z[np.ix_(rows, columns)]
+
+
+def _draw(fig, position, layout, panel, points, side):
+    if panel["kind"] == "surface":
+        ax = fig.add_subplot(*layout, position, projection='3d')
+        x, y, z = downsample_grid(panel["x"], panel["y"], panel["z"], side)
+        X, Y = np.meshgrid(x, y)
+        ax.plot_surface(X, Y, z, cmap='viridis')
+        ax.set_zlabel(panel["zlabel"] or "")
+    else:
+        ax = fig.add_subplot(*layout, position)
+    if panel["kind"] == "line":
+        for line in panel["lines"]:
+            x, y = decimate(line["x"], line["y"], points)
+            marker = line["marker"] if len(y) <= 100 else None
+            ax.plot(x, y, marker=marker, label=line["label"])
+        if panel["xticks"] is not None:
+            ax.set_xticks(panel["xticks"])
+        if panel["legend"] and any(line["label"] for line in panel["lines"]):
+            ax.legend()
+    elif panel["kind"] == "bar":
+        ax.bar(panel["labels"], panel["values"])
+    elif panel["kind"] == "hist":
+        for samples, label in zip(panel["samples"], panel["labels"]):
+            ax.hist(samples, bins=panel["bins"], alpha=0.6, label=label)
+        ax.legend()
+    if panel["title"]:
+        ax.set_title(panel["title"])
+    if panel.get("xlabel"):
+        ax.set_xlabel(panel["xlabel"])
+    if panel.get("ylabel"):
+        ax.set_ylabel(panel["ylabel"])
+
+
+def render_figure(spec, out_dir, formats=default_formats, points=max_points, side=max_side):
+    # Draw one figure spec with Agg and save it once per format; returns the file names
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=spec["figsize"])
+    for position, panel in enumerate(spec["panels"], start=1):
+        _draw(fig, position, spec["layout"], panel, points, side)
+    if spec["title"]:
+        fig.suptitle(spec["title"])
+    fig.tight_layout()
+    names = []
+    for fmt in formats:
+        names.append(f"{spec['name']}.{fmt}")
+        fig.savefig(os.path.join(out_dir, names[-1]))
+    plt.close(fig)
+    return names
+
+
+def _render_task(args):
+    return render_figure(*args)
+
+
+def write_index(out_dir, title, figures, files):
+    # index.html listing every figure; the first format is shown inline, the others are linked
+    rows = []
+    for spec, names in zip(figures, files):
+        caption = html.escape(spec["title"] or spec["name"])
+        links = " ".join(f'<a href="{html.escape(name)}">{html.escape(name.rsplit(".", 1)[-1])}</a>' for name in names)
+        rows.append(f'<figure><img src="{html.escape(names[0])}" alt="{caption}" loading="lazy">'
+                    f'<figcaption>{caption} {links}</figcaption></figure>')
+    path = os.path.join(out_dir, "index.html")
+    with open(path, "w") as f:
+        f.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>\n'
+                '<style>body{font-family:sans-serif} figure{display:inline-block;margin:8px} img{max-width:640px}</style>\n'
+                f'</head><body>\n<h1>{html.escape(title)}</h1>\n' + "\n".join(rows) + "\n</body></html>\n")
+    return path
+
+
+def render_report(figures, out_dir, title="DSP report", formats=default_formats, workers=None,
+                  points=max_points, side=max_side):
+    # Render all figures (in a process pool unless workers=1) and write out_dir/index.html
+    os.makedirs(out_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, max(len(figures), 1))
+    tasks = [(spec, out_dir, tuple(formats), points, side) for spec in figures]
+    if workers == 1:
+        files = [_render_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            files = list(pool.map(_render_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    return write_index(out_dir, title, figures, files)
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import numpy as np
+import instrumentation
+
+# Content-addressed on-disk cache of sweep results, one entry per grid cell.
+#
+# A cell key is a hash of the demand matrix fingerprint, the kernel (module.name and a hash of the
+# kernel's source, module_hash) and every pricing parameter of the cell (sweep defaults, fixed values and the
+# cell's axis values, sorted by name), so the same cell is found again from a different or
+# extended grid, or after a parameter moved between `fixed` and `axes`. Values are the cell's
+# slice of every kernel output packed into one blob; the output layout is stored once per sweep id.
+# Entries live in one SQLite file (standard library) with a last-used time, and the oldest are
+# evicted once the blobs exceed max_bytes. Only the parent process of a sweep touches the file.
+#
+#   cache/results.sqlite
+#
+# module_hash covers the kernel's module and every module of the same directory it imports, at
+# top level or inside functions, so any edit to code a kernel runs gives new keys; there is no
+# version to bump by hand.
+
+default_max_bytes = 1 << 30
+query_batch = 500               # keys per SELECT, below SQLite's variable limit
+import_pattern = re.compile(rb"^\s*(?:from|import)\s+(\w+)", re.MULTILINE)
+_module_hashes = {}
+
+
+def result_cache_path(cache=None):
+    from demand_cache import cache_dir
+    return os.path.join(cache or cache_dir, "results.sqlite")
+
+
+def demand_fingerprint(Delta):
+    from sparse_demand import SparseDemand
+    if isinstance(Delta, SparseDemand):
+        digest = hashlib.blake2b(repr(("sparse",) + tuple(Delta.shape)).encode(), digest_size=16)
+        for values, dtype in zip(Delta[:3], (np.int64, np.int64, np.float64)):
+            digest.update(np.ascontiguousarray(values, dtype=dtype).data)
+        return digest.hexdigest()
+    Delta = np.ascontiguousarray(Delta, dtype=np.float64)
+    digest = hashlib.blake2b(repr(Delta.shape).encode(), digest_size=16)
+    digest.update(Delta.data)
+    return digest.hexdigest()
+
+
+def module_hash(module_name):
+    # Hash of a module's source and of the sources it imports from its own directory, transitively
+    if module_name not in _module_hashes:
+        path = getattr(sys.modules.get(module_name), "__file__", None)
+        sources = {}
+        pending = [os.path.abspath(path)] if path else []
+        while pending:
+            path = pending.pop()
+            if path in sources or not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                sources[path] = f.read()
+            pending.extend(os.path.join(os.path.dirname(path), name.decode() + ".py")
+                           for name in import_pattern.findall(sources[path]))
+        digest = hashlib.blake2b(digest_size=8)
+        for path in sorted(sources):
+            digest.update(os.path.basename(path).encode() + b"\0" + sources[path])
+        _module_hashes[module_name] = digest.hexdigest()
+    return _module_hashes[module_name]
+
+
+def kernel_id(kernel):
+    return f"{kernel.__module__}.{kernel.__qualname__}@{module_hash(kernel.__module__)}"
+
+
+def cell_keys(Delta, axes, fixed, kernel):
+    # (sweep id, one 16-byte key per grid cell in C order of the grid); the sweep id names the
+    # demand, kernel and parameter names shared by all cells and keys their output layout
+    from sweep import sweep_defaults
+    params = dict(sweep_defaults)
+    params.update(fixed or {})
+    names = sorted(set(params) | set(axes))
+    prefix = json.dumps([demand_fingerprint(Delta), kernel_id(kernel), names]).encode()
+    grids = np.meshgrid(*(np.asarray(values, dtype=np.float64) for values in axes.values()), indexing="ij")
+    values = np.empty((grids[0].size if grids else 1, len(names)))
+    for k, name in enumerate(names):
+        if name in axes:
+            values[:, k] = grids[list(axes).index(name)].ravel()
+        else:
+            values[:, k] = params[name]
+    sweep_id = hashlib.blake2b(prefix, digest_size=16).hexdigest()
+    return sweep_id, [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest() for row in values]
+
+
+def output_layout(result, grid_ndim):
+    # (kind, [(name, dtype, per-cell shape)]) of a kernel result: an array, a tuple or a dict of arrays
+    if isinstance(result, dict):
+        return "dict", [(name, str(values.dtype), values.shape[grid_ndim:]) for name, values in result.items()]
+    if isinstance(result, tuple):
+        return "tuple", [(k, str(values.dtype), values.shape[grid_ndim:]) for k, values in enumerate(result)]
+    return "array", [(0, str(result.dtype), result.shape[grid_ndim:])]
+
+
+def _outputs(result):
+    if isinstance(result, dict):
+        return list(result.values())
+    return list(result) if isinstance(result, tuple) else [result]
+
+
+def pack_cells(result, grid_ndim):
+    # One bytes blob per cell of the result grid, in C order
+    cells = int(np.prod(_outputs(result)[0].shape[:grid_ndim]))
+    columns = [np.ascontiguousarray(values).reshape(cells, -1).view(np.uint8) for values in _outputs(result)]
+    packed = np.concatenate(columns, axis=1) if len(columns) > 1 else columns[0]
+    return [row.tobytes() for row in packed]
+
+
+def unpack_cells(blobs, layout, shape):
+    # Kernel result of grid `shape` from one blob per cell
+    kind, fields = layout
+    packed = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), -1)
+    outputs, offset = [], 0
+    for _, dtype, trailing in fields:
+        width = np.dtype(dtype).itemsize * int(np.prod(trailing, dtype=np.int64))
+        column = np.ascontiguousarray(packed[:, offset:offset + width]).view(dtype)
+        outputs.append(column.reshape(tuple(shape) + tuple(trailing)))
+        offset += width
+    if kind == "dict":
+        return {name: values for (name, _, _), values in zip(fields, outputs)}
+    return tuple(outputs) if kind == "tuple" else outputs[0]
+
+
+def empty_result(layout, shape):
+    kind, fields = layout
+    outputs = [np.zeros(tuple(shape) + tuple(trailing), dtype=dtype) for _, dtype, trailing in fields]
+    if kind == "dict":
+        return {name: values for (name, _, _), values in zip(fields, outputs)}
+    return tuple(outputs) if kind == "tuple" else outputs[0]
+
+
+class ResultCache:
+
+    def __init__(self, path=None, max_bytes=default_max_bytes):
+        self.path = path or result_cache_path()
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS cells (key BLOB PRIMARY KEY, value BLOB, size INTEGER, used REAL);
+            CREATE INDEX IF NOT EXISTS cells_used ON cells (used);
+            CREATE TABLE IF NOT EXISTS layouts (sweep TEXT PRIMARY KEY, layout TEXT);
+        """)
+        self.bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM cells").fetchone()[0]
+
+    def layout(self, sweep_id):
+        row = self.db.execute("SELECT layout FROM layouts WHERE sweep = ?", (sweep_id,)).fetchone()
+        if row is None:
+            return None
+        kind, fields = json.loads(row[0])
+        return kind, [(name, dtype, tuple(trailing)) for name, dtype, trailing in fields]
+
+    def get_many(self, keys):
+        # {key: blob} for the keys present, marking them as used
+        found = {}
+        now = time.time()
+        for start in range(0, len(keys), query_batch):
+            batch = keys[start:start + query_batch]
+            marks = ",".join("?" * len(batch))
+            found.update(self.db.execute(f"SELECT key, value FROM cells WHERE key IN ({marks})", batch))
+            self.db.execute(f"UPDATE cells SET used = ? WHERE key IN ({marks})", [now] + list(batch))
+        self.db.commit()
+        return found
+
+    def put_many(self, sweep_id, keys, blobs, layout):
+        now = time.time()
+        kind, fields = layout
+        self.db.execute("INSERT OR REPLACE INTO layouts VALUES (?, ?)",
+                        (sweep_id, json.dumps([kind, [[name, dtype, list(trailing)] for name, dtype, trailing in fields]])))
+        replaced = 0
+        for start in range(0, len(keys), query_batch):
+            batch = keys[start:start + query_batch]
+            marks = ",".join("?" * len(batch))
+            replaced += self.db.execute(f"SELECT COALESCE(SUM(size), 0) FROM cells WHERE key IN ({marks})", batch).fetchone()[0]
+        self.db.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)",
+                            [(key, blob, len(blob), now) for key, blob in zip(keys, blobs)])
+        self.bytes += sum(len(blob) for blob in blobs) - replaced
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        # Drop the least recently used cells until the blobs fit in max_bytes
+        while self.bytes > self.max_bytes:
+            rows = self.db.execute("SELECT key, size FROM cells ORDER BY used LIMIT ?", (query_batch,)).fetchall()
+            if not rows:
+                self.bytes = 0
+                break
+            dropped = []
+            for key, size in rows:
+                if self.bytes <= self.max_bytes:
+                    break
+                dropped.append((key,))
+                self.bytes -= size
+            self.db.executemany("DELETE FROM cells WHERE key = ?", dropped)
+            instrumentation.count("result_cache_evictions", len(dropped))
+
+    def clear(self):
+        self.db.execute("DELETE FROM cells")
+        self.db.commit()
+        self.bytes = 0
+
+    def close(self):
+        self.db.close()
+
+
+def open_result_cache(cache=None):
+    # Default cache of the simulation scripts, switched off with DSP_RESULT_CACHE=0
+    if os.environ.get("DSP_RESULT_CACHE", "1") in ("0", "off", "false"):
+        return None
+    return ResultCache(result_cache_path(cache))
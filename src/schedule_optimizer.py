@@ -0,0 +1,380 @@
+import os
+import numpy as np
+import instrumentation
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Time-of-use schedule optimizer: the provider picks a price for every slot of the day, or for K
+# tiers of consecutive slots with movable boundaries, to maximize its utility over the trace,
+# subject to a minimum developer cost saving against the static price and/or a minimum share of
+# participating client-hours.
+#
+# Every hour's metrics only depend on that hour's price, so one batched evaluation of a price grid
+# for all hours gives tables (prices, slots) of provider utility θ, developer cost and participating
+# client-hours, with the trace's hours folded onto the slots (hour % slots). Participation is one
+# histogram of the clients' break-even prices over the grid per hour, no sort and no (prices x
+# hours x clients) array. The totals of any schedule are sums of one table entry per slot, so the
+# search runs on the tables:
+#
+#   Per-slot prices: a knapsack DP over the slots on the cost budget (rounded up to budget_bins
+#   steps, so every result fits), or on the participation shortfall; with both constraints the
+#   participation enters the objective with a multiplier β, bisected until it is met.
+#   Tiers: for multipliers α (cost) and β (participation) the best tiered schedule maximizes
+#       sum_s θ[g_s, s] - α cost[g_s, s] + β participation[g_s, s]
+#   by dynamic programming over the segment boundaries of the cyclic day. Cost falls with α and
+#   participation rises with β, so the multipliers come from alternating bisections.
+#   Every feasible schedule visited is a candidate and the best few are kept.
+#   Coordinate descent on the schedule itself then changes one or two slot prices (or tier prices
+#   and boundaries) at a time while that stays feasible and raises θ, which closes most of the
+#   duality gap of the discrete price grid; the best descended candidate wins.
+#
+# evaluate_schedules checks schedules against the demand matrix itself, in blocks of candidates
+# and optionally in a process pool.
+
+SlotTable = namedtuple("SlotTable", ["prices", "provider_utility", "cost", "participation",
+                                     "total_cost_static", "client_hours"])
+ScheduleFit = namedtuple("ScheduleFit", ["Phi", "levels", "provider_utility", "cost", "participation",
+                                         "cost_savings", "feasible"])
+
+default_prices = np.arange(1.0, 100.5, 0.5)     # candidate φ per 100,000 invocations
+dual_rounds = 6                 # alternating α / β bisections
+bisection_steps = 20            # per multiplier, over scale * 10^[-6, 6]
+max_sweeps = 20                 # coordinate-descent passes over the slots / tiers
+min_gain = 1e-6                 # smallest relative θ gain of a coordinate-descent move
+restarts = 2                    # best feasible schedules the descent starts from
+budget_bins = 2000              # resolution of the knapsack budget (cost or participation)
+
+
+def _fold(values, slots):
+    # (..., hours) -> (..., slots), summed over hour % slots
+    hours = values.shape[-1]
+    padded = np.zeros(values.shape[:-1] + (-(-hours // slots) * slots,))
+    padded[..., :hours] = values
+    return padded.reshape(values.shape[:-1] + (-1, slots)).sum(axis=-2)
+
+
+def _grid_participation(Delta, Lambda, prices, block):
+    # (participating clients, their demand) per (price, hour) for an ascending price grid. A client
+    # takes part at φ iff φ < λ_u * log(1+ δ_u ) / δ_u (price_index), i.e. at the grid prices below
+    # its break-even price: one weighted histogram per hour over the grid, then suffix sums.
+    hours, clients = Delta.shape
+    number_of_prices = len(prices)
+    counts = np.zeros((hours, number_of_prices + 1))
+    demand = np.zeros((hours, number_of_prices + 1))
+    for start in range(0, hours, block):
+        part = Delta[start:start + block]
+        value = np.broadcast_to(Lambda, (hours, clients))[start:start + block] * np.log1p(part)
+        break_even = np.divide(value, part, out=np.full(part.shape, -np.inf), where=part > 0)
+        cells = (np.arange(len(part))[:, None] * (number_of_prices + 1)
+                 + np.searchsorted(prices, break_even, side="left")).ravel()
+        size = len(part) * (number_of_prices + 1)
+        counts[start:start + block] = np.bincount(cells, minlength=size).reshape(len(part), -1)
+        demand[start:start + block] = np.bincount(cells, weights=part.ravel(), minlength=size).reshape(len(part), -1)
+    # Clients with k grid prices below their break-even take part at the prices 0..k-1
+    suffix = lambda values: np.cumsum(values[:, ::-1], axis=1)[:, ::-1][:, 1:].T
+    return suffix(counts), suffix(demand)
+
+
+def slot_table(Delta, Lambda=800, Mu=6, static_Phi=16.6667, prices=default_prices, slots=24, block=None):
+    # Provider utility, developer cost and participating client-hours of every candidate price in
+    # every slot, the metrics of hourly_metrics for flat prices; Lambda is a scalar, (clients,) or
+    # (hours, clients), Mu a scalar or one value per hour
+    from dsp_kernels import aggregate_consumption
+    Delta = np.asarray(Delta, dtype=np.float64)
+    Lambda = np.asarray(Lambda, dtype=np.float64)
+    prices = np.sort(np.asarray(prices, dtype=np.float64))
+    block = block or max(1, (1 << 22) // max(Delta.shape[1], 1))
+    with instrumentation.stage("slot_table"):
+        count, utilization = _grid_participation(Delta, Lambda, prices, block)
+        if Lambda.ndim == 2:
+            consumption = np.stack([aggregate_consumption(prices, row) for row in Lambda], axis=-1)
+        else:
+            consumption = aggregate_consumption(prices, np.broadcast_to(Lambda, Delta.shape[-1:]))[:, None]
+        provider = (prices[:, None] - np.asarray(Mu, dtype=np.float64)) * consumption
+        provider = np.broadcast_to(provider, (len(prices), len(Delta)))
+    instrumentation.count("client_hours", Delta.size)
+    return SlotTable(prices, _fold(provider, slots), _fold(prices[:, None] * utilization, slots), _fold(count, slots),
+                     float(np.sum(Delta * static_Phi)), int(np.count_nonzero(Delta > 0)))
+
+
+def schedule_totals(table, levels):
+    # (θ, cost, participation) of schedules given as price-grid indexes (..., slots)
+    levels = np.asarray(levels)
+    slots = np.arange(levels.shape[-1])
+    return tuple(np.sum(values[levels, slots], axis=-1)
+                 for values in (table.provider_utility, table.cost, table.participation))
+
+
+def tier_levels(starts, tier_prices, slots):
+    # Price-grid index per slot (..., slots) of cyclic tiers (..., tiers) starting at the slots
+    # `starts` (distinct, any order) with the grid indexes `tier_prices`
+    starts, tier_prices = np.broadcast_arrays(np.asarray(starts), np.asarray(tier_prices))
+    order = np.argsort(starts, axis=-1, kind="stable")
+    starts = np.take_along_axis(starts, order, axis=-1)
+    tier_prices = np.take_along_axis(tier_prices, order, axis=-1)
+    tier = np.sum(starts[..., None, :] <= np.arange(slots)[:, None], axis=-1) - 1     # -1 wraps to the last tier
+    return np.take_along_axis(tier_prices, tier % starts.shape[-1], axis=-1)
+
+
+def _cyclic_prefix(values):
+    # out[:, k] = sum of values[:, :k] over the doubled day, (prices, 2 * slots + 1)
+    return np.concatenate([np.zeros((len(values), 1)), np.cumsum(np.tile(values, 2), axis=1)], axis=1)
+
+
+def _tier_totals(prefixes, starts, tier_prices, slots):
+    # Totals of tiered schedules (..., tiers) for every table in `prefixes` (cyclic prefix sums)
+    order = np.argsort(starts, axis=-1, kind="stable")
+    starts = np.take_along_axis(starts, order, axis=-1)
+    tier_prices = np.take_along_axis(tier_prices, order, axis=-1)
+    ends = np.concatenate([starts[..., 1:], starts[..., :1] + slots], axis=-1)
+    return tuple(np.sum(prefix[tier_prices, ends] - prefix[tier_prices, starts], axis=-1) for prefix in prefixes)
+
+
+def _best_tiers(score, tiers):
+    # (starts, tier prices) of the best schedule of `tiers` cyclic segments, one price each.
+    # Segment values come from prefix sums over the doubled day; for every rotation r (a boundary
+    # at slot r) a DP over the segment ends finds the best split of the day into `tiers` segments.
+    number_of_prices, slots = score.shape
+    tiers = min(tiers, slots)
+    prefix = _cyclic_prefix(score)
+    segments = prefix[:, None, :] - prefix[:, :, None]            # (price, a, b): slots [a, b)
+    level = np.argmax(segments, axis=0)
+    value = np.max(segments, axis=0)
+    value[np.tril_indices(len(value))] = -np.inf
+    positions = np.arange(slots + 1)
+    best, best_value = None, -np.inf
+    for r in range(slots if tiers > 1 else 1):
+        block = value[r:r + slots + 1, r:r + slots + 1]
+        f = np.where(positions == 0, 0.0, -np.inf)
+        back = []
+        for _ in range(tiers):
+            total = f[:, None] + block
+            back.append(np.argmax(total, axis=0))
+            f = total[back[-1], positions]
+        if f[-1] > best_value:
+            best_value, end, bounds = f[-1], slots, []
+            for start in reversed(back):
+                bounds.append((int(start[end]), end))
+                end = bounds[-1][0]
+            bounds.reverse()
+            best = ([(r + a) % slots for a, _ in bounds], [level[r + a, r + b] for a, b in bounds])
+    order = np.argsort(best[0], kind="stable")
+    return np.asarray(best[0])[order], np.asarray(best[1])[order]
+
+
+def _knapsack(value, weight, capacity, bins):
+    # Price-grid index per slot maximizing sum_s value[g_s, s] subject to sum_s weight[g_s, s] <=
+    # capacity (weights >= 0). Weights are rounded up to multiples of capacity / bins, so the
+    # result always fits; None if nothing does. One DP step per slot over all budgets and prices.
+    unit = capacity / bins if capacity > 0 else 1.0
+    used = np.arange(bins + 1 if capacity > 0 else 1)
+    weight = np.ceil(weight / unit).astype(np.int64)
+    number_of_prices, slots = value.shape
+    f = np.where(used == 0, 0.0, -np.inf)
+    choice = np.empty((slots, len(used)), dtype=np.intp)
+    for s in range(slots):
+        source = used[None, :] - weight[:, s][:, None]                 # (price, budget used)
+        candidate = np.where(source >= 0, f[np.maximum(source, 0)], -np.inf) + value[:, s][:, None]
+        choice[s] = np.argmax(candidate, axis=0)
+        f = candidate[choice[s], used]
+    if not np.isfinite(f).any():
+        return None
+    levels, budget = np.empty(slots, dtype=np.intp), int(np.argmax(f))
+    for s in reversed(range(slots)):
+        levels[s] = choice[s, budget]
+        budget -= weight[levels[s], s]
+    return levels
+
+
+def _smallest_multiplier(satisfied, scale, steps):
+    # Smallest multiplier (0 or scale * 10^t, -6 <= t <= 6) for which satisfied(multiplier) holds,
+    # the largest one if none does
+    if satisfied(0.0):
+        return 0.0
+    low, high = -6.0, 6.0
+    if not satisfied(scale * 10 ** high):
+        return scale * 10 ** high
+    for _ in range(steps):
+        middle = (low + high) / 2
+        if satisfied(scale * 10 ** middle):
+            high = middle
+        else:
+            low = middle
+    return scale * 10 ** high
+
+
+def _scale(numerator, denominator):
+    return max(np.ptp(numerator), 1e-12) / max(np.ptp(denominator), 1e-12)
+
+
+def optimize_schedule(table, min_savings=None, min_participation=None, tiers=None, rounds=dual_rounds,
+                      steps=bisection_steps, sweeps=max_sweeps, starts=restarts, bins=budget_bins):
+    # ScheduleFit maximizing θ over the slot table. min_savings is the developer cost saving
+    # against the static price in % (05_), min_participation the share of the client-hours with
+    # demand that take part; tiers=K restricts the day to K cyclic segments of one price each.
+    U, C, N = table.provider_utility, table.cost, table.participation
+    slots = U.shape[1]
+    max_cost = np.inf if min_savings is None else table.total_cost_static * (1 - min_savings / 100)
+    min_count = -np.inf if min_participation is None else min_participation * table.client_hours
+    tolerance = 1e-9 * max(abs(max_cost) if np.isfinite(max_cost) else 1.0, 1.0)
+
+    def feasible(cost, count):
+        return (cost <= max_cost + tolerance) & (count >= min_count)
+
+    def record(plan):
+        levels = plan[0] if tiers is None else tier_levels(*plan, slots)
+        theta, cost, count = schedule_totals(table, levels)
+        if feasible(cost, count):
+            found[levels.tobytes()] = (theta, plan)
+        last[:] = [plan]
+        return cost, count
+
+    def solve(alpha, beta):
+        score = U - alpha * C + beta * N
+        return record((np.argmax(score, axis=0),) if tiers is None else _best_tiers(score, tiers))
+
+    def pack(beta):
+        levels = _knapsack(U + beta * N, weight, capacity, bins)
+        return (np.inf, -np.inf) if levels is None else record((levels,))
+
+    found, last = {}, [None]
+    alpha = beta = 0.0
+    with instrumentation.stage("optimize_schedule"):
+        if tiers is None and (np.isfinite(max_cost) or np.isfinite(min_count)):
+            # Knapsack over the slots on the cost budget (or on the participation shortfall), with
+            # a multiplier on participation when both constraints are set
+            if np.isfinite(max_cost):
+                weight, capacity = C, max_cost
+            else:
+                top = N.max(axis=0)
+                weight, capacity = top - N, top.sum() - min_count
+            if np.isfinite(max_cost) and np.isfinite(min_count):
+                _smallest_multiplier(lambda b: pack(b)[1] >= min_count, _scale(U, N), steps)
+            else:
+                pack(0.0)
+        else:
+            for _ in range(rounds):
+                if np.isfinite(max_cost):
+                    alpha = _smallest_multiplier(lambda a: solve(a, beta)[0] <= max_cost + tolerance, _scale(U, C), steps)
+                if np.isfinite(min_count):
+                    beta = _smallest_multiplier(lambda b: solve(alpha, b)[1] >= min_count, _scale(U, N), steps)
+                if feasible(*solve(alpha, beta)):
+                    break
+        if last[0] is None:
+            solve(_scale(U, C) * 1e6 if np.isfinite(max_cost) else 0.0, _scale(U, N) * 1e6 if np.isfinite(min_count) else 0.0)
+        plan = last[0]
+        if found:
+            ranked = sorted(found.values(), key=lambda item: -item[0])[:starts]
+            plans = [_descend(table, plan, tiers, feasible, sweeps) for _, plan in ranked]
+            value = [schedule_totals(table, p[0] if tiers is None else tier_levels(*p, slots))[0] for p in plans]
+            plan = plans[int(np.argmax(value))]
+    levels = plan[0] if tiers is None else tier_levels(*plan, slots)
+    theta, cost, count = schedule_totals(table, levels)
+    savings = 100 * (1 - cost / table.total_cost_static) if table.total_cost_static > 0 else 0.0
+    return ScheduleFit(table.prices[levels], levels, float(theta), float(cost), float(count), float(savings),
+                       bool(feasible(cost, count)))
+
+
+def _descend(table, plan, tiers, feasible, sweeps):
+    # Coordinate descent from a feasible plan: apply feasible moves that raise θ until none is
+    # left. Moves are one slot's price (then the best pair of slots), or one or two tier prices or
+    # one boundary together with a neighbouring tier's price.
+    U, C, N = table.provider_utility, table.cost, table.participation
+    slots = U.shape[1]
+    if tiers is None:
+        levels = plan[0].copy()
+        theta, cost, count = schedule_totals(table, levels)
+        for _ in range(sweeps):
+            moved = False
+            # One slot, then the pairs (s1, later slots) with s1 against all of them at once as
+            # (later slot, price of s1, price of s2); improvements are applied as they are found
+            for s in range(slots):
+                candidate = theta + U[:, s] - U[levels[s], s]
+                ok = feasible(cost + C[:, s] - C[levels[s], s], count + N[:, s] - N[levels[s], s]) & (candidate > theta + min_gain * abs(theta))
+                if ok.any():
+                    levels[s] = int(np.argmax(np.where(ok, candidate, -np.inf)))
+                    theta, cost, count = schedule_totals(table, levels)
+                    moved = True
+            for s1 in range(slots - 1):
+                rest = np.arange(s1 + 1, slots)
+
+                def change(values):
+                    return ((values[:, s1] - values[levels[s1], s1])[None, :, None]
+                            + (values[:, rest] - values[levels[rest], rest]).T[:, None, :])
+                candidate = np.where(feasible(cost + change(C), count + change(N)), theta + change(U), -np.inf)
+                k = int(np.argmax(candidate))
+                if candidate.flat[k] > theta + min_gain * abs(theta):
+                    r, g1, g2 = np.unravel_index(k, candidate.shape)
+                    levels[s1], levels[rest[r]] = g1, g2
+                    theta, cost, count = schedule_totals(table, levels)
+                    moved = True
+            if not moved:
+                break
+        return (levels,)
+
+    starts, prices = (np.asarray(p) for p in plan)
+    tiers, number_of_prices = len(starts), len(table.prices)
+    prefixes = [_cyclic_prefix(values) for values in (U, C, N)]
+    theta = _tier_totals(prefixes, starts, prices, slots)[0]
+    grid = np.arange(number_of_prices)
+    for _ in range(sweeps):
+        # One tier price, two tier prices, or one boundary moved to any free slot with or
+        # without a new price for either tier next to it
+        move_starts, move_prices = [], []
+        for k in range(tiers):
+            single = np.repeat(prices[None], number_of_prices, axis=0)
+            single[:, k] = grid
+            move_starts.append(np.repeat(starts[None], number_of_prices, axis=0))
+            move_prices.append(single)
+            for k2 in range(k + 1, tiers):
+                pair = np.repeat(prices[None], number_of_prices ** 2, axis=0)
+                pair[:, k], pair[:, k2] = np.repeat(grid, number_of_prices), np.tile(grid, number_of_prices)
+                move_starts.append(np.repeat(starts[None], number_of_prices ** 2, axis=0))
+                move_prices.append(pair)
+            free = np.setdiff1d(np.arange(slots), starts)
+            moved = np.repeat(starts[None], len(free), axis=0)
+            moved[:, k] = free
+            for neighbour in (k, (k - 1) % tiers):
+                variants = np.repeat(prices[None], number_of_prices, axis=0)
+                variants[:, neighbour] = grid
+                move_starts.append(np.repeat(moved, number_of_prices, axis=0))
+                move_prices.append(np.tile(variants, (len(free), 1)))
+            move_starts.append(moved)
+            move_prices.append(np.repeat(prices[None], len(free), axis=0))
+        move_starts, move_prices = np.concatenate(move_starts), np.concatenate(move_prices)
+        candidate, cost, count = _tier_totals(prefixes, move_starts, move_prices, slots)
+        ok = feasible(cost, count) & (candidate > theta + min_gain * abs(theta))
+        if not ok.any():
+            break
+        best = int(np.argmax(np.where(ok, candidate, -np.inf)))
+        starts, prices, theta = move_starts[best], move_prices[best], candidate[best]
+    order = np.argsort(starts, kind="stable")
+    return starts[order], prices[order]
+
+
+def _evaluate_block(start, Delta, Lambda, schedules, Mu, static_Phi, block):
+    from pricing_policies import schedule, evaluate_policies
+    result = evaluate_policies({"schedule": schedule(schedules[start:start + block])}, Delta, Lambda, Mu, static_Phi)
+    return dict(result["totals"], participation=np.sum(result["metrics"]["client_count"], axis=-1))
+
+
+def evaluate_schedules(Delta, schedules, Lambda=800, Mu=6, static_Phi=16.6667, workers=1, block=None):
+    # Totals of candidate schedules (candidates, slots) on Delta itself (the totals of
+    # evaluate_policies plus the participating client-hours), block by block and in a process
+    # pool with workers > 1
+    from sweep_runner import pool_context
+    Delta = np.asarray(Delta, dtype=np.float64)
+    schedules = np.atleast_2d(np.asarray(schedules, dtype=np.float64))
+    block = block or max(1, (1 << 22) // max(Delta.size, 1))
+    starts = range(0, len(schedules), block)
+    task = partial(_evaluate_block, Delta=Delta, Lambda=Lambda, schedules=schedules, Mu=Mu,
+                   static_Phi=static_Phi, block=block)
+    with instrumentation.stage("evaluate_schedules"):
+        if workers == 1 or len(starts) == 1:
+            parts = [task(start) for start in starts]
+        else:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=pool_context()) as pool:
+                parts = list(pool.map(task, starts))
+    instrumentation.count("evaluated_schedules", len(schedules))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
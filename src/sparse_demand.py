@@ -0,0 +1,176 @@
+import numpy as np
+import instrumentation
+from collections import namedtuple
+from dsp_kernels import client_utility, optimal_consumption
+
+# Sparse (COO) demand matrix for minute-level and many-app workloads, where almost every
+# (time step, app) cell is zero.
+#
+# A SparseDemand holds the non-zero δ_u only, sorted by (step, client), plus the dense shape
+# (steps, clients). Clients with δ_u = 0 never take part (dsp_kernels.evaluate_clients), so the
+# participation and cost sums only visit the stored entries, and the provider utility, which
+# depends on λ_u of every client but not on δ_u, comes from the sorted λ of price_index or a
+# closed form for a uniform λ. Memory and runtime scale with the non-zero entries instead of
+# steps x clients. Stored entries may be explicit zeros (e.g. a normalized minimum); they never
+# take part either.
+#
+# as_sparse accepts a SparseDemand, a dense matrix (converted in row blocks, so a memory map is
+# never loaded whole) or anything with .tocoo() such as a scipy.sparse matrix (scipy is optional).
+
+SparseDemand = namedtuple("SparseDemand", ["step", "client", "value", "shape"])
+block_entries = 1 << 20         # entries x scenarios evaluated together, bounds the temporaries
+
+
+def from_coo(step, client, value, shape):
+    # SparseDemand from unsorted (step, client, value) triples; duplicates add up, zeros are dropped
+    step = np.asarray(step, dtype=np.int64)
+    client = np.asarray(client, dtype=np.int64)
+    value = np.asarray(value, dtype=np.float64)
+    steps, clients = shape
+    key, inverse = np.unique(step * clients + client, return_inverse=True)
+    total = np.bincount(inverse.ravel(), weights=value, minlength=len(key))
+    keep = total != 0
+    return SparseDemand(key[keep] // clients, key[keep] % clients, total[keep], (int(steps), int(clients)))
+
+
+def from_dense(Delta, block=block_entries):
+    # Non-zero cells of a dense (steps, clients) matrix, read in blocks of rows
+    steps, clients = np.shape(Delta)
+    rows = max(1, block // max(clients, 1))
+    parts = []
+    for start in range(0, steps, rows):
+        window = np.asarray(Delta[start:start + rows], dtype=np.float64)
+        step, client = np.nonzero(window)
+        parts.append((step + start, client, window[step, client]))
+    if not parts:
+        return SparseDemand(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), (steps, clients))
+    return SparseDemand(*(np.concatenate(column).astype(dtype) for column, dtype
+                          in zip(zip(*parts), (np.int64, np.int64, np.float64))), (steps, clients))
+
+
+def is_sparse(demand):
+    return isinstance(demand, SparseDemand) or hasattr(demand, "tocoo")
+
+
+def as_sparse(demand, block=block_entries):
+    if isinstance(demand, SparseDemand):
+        return demand
+    if hasattr(demand, "tocoo"):
+        coo = demand.tocoo()
+        return from_coo(coo.row, coo.col, coo.data, coo.shape)
+    return from_dense(demand, block)
+
+
+def to_dense(demand):
+    Delta = np.zeros(demand.shape)
+    Delta[demand.step, demand.client] = demand.value
+    return Delta
+
+
+def window(demand, start, stop):
+    # Steps [start, stop) as a SparseDemand of their own, step 0 = start
+    stop = min(stop, demand.shape[0])
+    lo, hi = np.searchsorted(demand.step, [start, stop])
+    return SparseDemand(np.asarray(demand.step[lo:hi]) - start, np.asarray(demand.client[lo:hi]),
+                        np.asarray(demand.value[lo:hi], dtype=np.float64), (stop - start, demand.shape[1]))
+
+
+def first_clients(demand, clients):
+    # Only the first `clients` columns
+    keep = np.asarray(demand.client) < clients
+    return SparseDemand(np.asarray(demand.step)[keep], np.asarray(demand.client)[keep],
+                        np.asarray(demand.value)[keep], (demand.shape[0], min(clients, demand.shape[1])))
+
+
+def step_totals(Delta):
+    # Total δ per step as (..., steps, 1), for a dense matrix or a SparseDemand
+    if isinstance(Delta, SparseDemand):
+        return np.bincount(Delta.step, weights=Delta.value, minlength=Delta.shape[0])[:, None]
+    return np.sum(np.asarray(Delta, dtype=np.float64), axis=-1, keepdims=True)
+
+
+def packed_rows(demand):
+    # (steps, width) matrix of every step's stored δ_u, left-aligned and padded with zeros, width =
+    # the most entries of any step. Idle cells never take part, so kernels that only sum over
+    # participating clients (sweep.sweep_utilities) give the same result on it as on the dense matrix.
+    per_step = np.bincount(demand.step, minlength=demand.shape[0])
+    starts = np.concatenate([[0], np.cumsum(per_step)[:-1]])
+    packed = np.zeros((demand.shape[0], int(per_step.max(initial=0))))
+    packed[demand.step, np.arange(len(demand.step)) - starts[demand.step]] = demand.value
+    return packed
+
+
+def _step_sums(values, step, out):
+    # out[..., s] += sum of values[..., k] with step[k] == s; step is sorted
+    if not len(step):
+        return
+    starts = np.flatnonzero(np.concatenate([[True], step[1:] != step[:-1]]))
+    out[..., step[starts]] += np.add.reduceat(values, starts, axis=-1)
+
+
+def _at_entries(values, steps, step, client=None):
+    # Gather values broadcastable to (..., steps, clients) (client is None: to (..., steps)) per entry
+    if client is None:
+        values = values[..., None]
+        client = np.zeros(1, dtype=np.intp)
+    rows = step if values.shape[-2] == steps else np.zeros_like(step)
+    return values[..., rows, client if values.shape[-1] > 1 else np.zeros_like(client)]
+
+
+def aggregate_consumption(Lambda, Phi, clients):
+    # Q = sum_u max((λ_u / φ) - 1, 0) over all `clients`, idle or not; Lambda is broadcastable to
+    # (..., hours, clients), Phi (..., hours)
+    Lambda = np.asarray(Lambda, dtype=np.float64)
+    Lambda = Lambda.reshape((1,) * (2 - Lambda.ndim) + Lambda.shape) if Lambda.ndim < 2 else Lambda
+    Phi = np.asarray(Phi, dtype=np.float64)
+    if Lambda.shape[-1] == 1:
+        # Uniform λ: every client has the same optimal consumption
+        return clients * optimal_consumption(Lambda[..., 0], Phi)
+    from price_index import consumption_index, aggregate_demand
+    lead = Lambda.shape[:-2]
+    shape = np.broadcast_shapes(Lambda.shape[:-1], Phi.shape)
+    Phi = np.broadcast_to(Phi, shape)
+    Q = np.empty(shape)
+    # One sorted λ index per leading λ row (rows are hours when λ differs per hour)
+    for index in np.ndindex(*shape[len(shape) - 1 - len(lead):-1]):
+        at = (Ellipsis,) + index + (slice(None),)
+        Q[at] = aggregate_demand(consumption_index(Lambda[tuple(k if n > 1 else 0 for k, n in zip(index, lead))]), Phi[at])
+    return Q
+
+
+def hourly_metrics(demand, Lambda, Phi, Mu, static_Phi, block=block_entries):
+    # Same dict as dsp_kernels.hourly_metrics from the stored entries only. Lambda is broadcastable
+    # to (..., steps, clients), Phi (..., steps) and Mu, static_Phi broadcastable to Phi; leading
+    # axes are scenarios. Sums agree with the dense kernel up to rounding.
+    demand = as_sparse(demand)
+    steps, clients = demand.shape
+    Lambda = np.asarray(Lambda, dtype=np.float64)
+    Lambda = Lambda.reshape((1,) * (2 - Lambda.ndim) + Lambda.shape) if Lambda.ndim < 2 else Lambda
+    Phi = np.atleast_1d(np.asarray(Phi, dtype=np.float64))
+    static_Phi = np.asarray(static_Phi, dtype=np.float64)
+    lead = np.broadcast_shapes(Lambda.shape[:-2], Phi.shape[:-1], static_Phi.shape[:-1])
+    if static_Phi.ndim == 0:
+        static_Phi = static_Phi.reshape(1)
+    metrics = {name: np.zeros(lead + (steps,), dtype=np.int64 if name == "client_count" else np.float64)
+               for name in ("resource_utilization", "client_count", "client_utility", "cost_static", "cost_dynamic")}
+
+    with instrumentation.stage("sparse_hourly_metrics"):
+        entries = max(1, block // max(int(np.prod(lead)), 1))
+        for start in range(0, len(demand.step), entries):
+            step = np.asarray(demand.step[start:start + entries])
+            client = np.asarray(demand.client[start:start + entries])
+            Delta = np.asarray(demand.value[start:start + entries], dtype=np.float64)
+            Phi_k = _at_entries(Phi, steps, step)
+            utility = client_utility(Delta, _at_entries(Lambda, steps, step, client), Phi_k)
+            participating = (utility > 0) & (Delta > 0)
+            used = np.where(participating, Delta, 0.0)
+            _step_sums(used, step, metrics["resource_utilization"])
+            _step_sums(participating.astype(np.int64), step, metrics["client_count"])
+            _step_sums(np.where(participating, utility, 0.0), step, metrics["client_utility"])
+            _step_sums(used * _at_entries(static_Phi, steps, step), step, metrics["cost_static"])
+            _step_sums(used * Phi_k, step, metrics["cost_dynamic"])
+        metrics["provider_utility"] = (Phi - Mu) * aggregate_consumption(Lambda, Phi, clients)
+    if instrumentation.enabled:
+        instrumentation.count("client_hours", len(demand.step) * int(np.prod(lead)))
+        instrumentation.count("participating_client_hours", int(np.sum(metrics["client_count"])))
+    return metrics
@@ -0,0 +1,92 @@
+import numpy as np
+from dsp_kernels import dsp_price, client_utility, optimal_consumption, hourly_metrics
+from sparse_demand import SparseDemand, packed_rows, hourly_metrics as sparse_hourly_metrics
+
+# Broadcasted parameter sweeps of the provider and developer utility surfaces.
+#
+# Each swept parameter gets its own array dimension and is kept at size 1 on every other
+# dimension (an open mesh, like np.ix_), so a term that does not depend on an axis is only
+# evaluated once along it (e.g. the developer utility never depends on μ). Hours not on
+# a swept axis are accumulated one at a time, so memory stays at one grid per term.
+# Delta may be a sparse_demand.SparseDemand; only its non-zero entries are then visited.
+
+sweep_defaults = {
+    "Mu": 6,                    # Marginal cost μ per 100,000 invocations
+    "Lambda": 800,              # Uniform λ_u for all clients
+    "peak_Phi": 16.6667,        # φ for peak hours per 100,000 invocations
+    "off_peak_Phi": 8.333,      # φ for off-peak hours per 100,000 invocations
+    "peak_start": 8,            # peak window is peak_start <= hour < peak_end
+    "peak_end": 20,
+}
+sweep_parameters = tuple(sweep_defaults) + ("hour",)
+
+
+def open_grid(axes, fixed=None):
+    # Parameter arrays shaped for broadcasting: axis k has its values on dimension k only
+    unknown = set(axes).union(fixed or {}).difference(sweep_parameters)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    params = dict(sweep_defaults)
+    params.update(fixed or {})
+    ndim = len(axes)
+    for k, (name, values) in enumerate(axes.items()):
+        shape = [1] * ndim
+        shape[k] = len(values)
+        params[name] = np.asarray(values).reshape(shape)
+    return params
+
+
+def _hour_slices(Delta, params, axes):
+    # (hour, δ_u) pairs: one pair per hour of the day, or a single pair on the swept hour axis
+    if "hour" in axes:
+        hour = params["hour"]
+        yield hour, Delta[hour.ravel()].reshape(hour.shape + Delta.shape[-1:])
+    else:
+        for hour in range(Delta.shape[0]):
+            yield hour, Delta[hour]
+
+
+def sweep_utilities(Delta, axes, fixed=None):
+    # Provider and developer utility over the full grid of `axes` (name -> 1-D values, in
+    # output dimension order). Without an "hour" axis both are summed over all hours of Delta.
+    # provider: sum_h max((φ_h - μ) * sum_u max((λ / φ_h) - 1, 0), 0)
+    # clients : sum_h sum_u [θ_u > 0 and δ_u > 0] (λ * log(1 + δ_u) - δ_u * φ_h)
+    number_of_clients = Delta.shape[-1]
+    # Idle clients never take part, so a sparse matrix is swept over its packed non-zero entries
+    Delta = packed_rows(Delta) if isinstance(Delta, SparseDemand) else np.asarray(Delta, dtype=np.float64)
+    params = open_grid(axes, fixed)
+    shape = tuple(len(values) for values in axes.values())
+    Mu, Lambda = params["Mu"], params["Lambda"]
+
+    provider = np.zeros(())
+    clients = np.zeros(())
+    for hour, Delta_u in _hour_slices(Delta, params, axes):
+        Phi = dsp_price(hour, params["peak_Phi"], params["off_peak_Phi"], params["peak_start"], params["peak_end"])
+
+        # Uniform λ: every client has the same optimal consumption
+        utility = (Phi - Mu) * (number_of_clients * optimal_consumption(Lambda, Phi))
+        provider = provider + np.maximum(utility, 0)
+
+        utility = client_utility(Delta_u, np.asarray(Lambda)[..., None], np.asarray(Phi)[..., None])
+        participating = (utility > 0) & (Delta_u > 0)
+        clients = clients + np.sum(np.where(participating, utility, 0.0), axis=-1)
+
+    return np.broadcast_to(provider, shape).copy(), np.broadcast_to(clients, shape).copy()
+
+
+def sweep_hourly(Delta, axes, fixed=None):
+    # Per-hour metrics of the hour x client simulation loop (hourly_metrics) for every grid cell.
+    # Each metric has shape grid + (hours,).
+    sparse = isinstance(Delta, SparseDemand)
+    Delta = Delta if sparse else np.asarray(Delta, dtype=np.float64)
+    params = open_grid(axes, fixed)
+    shape = tuple(len(values) for values in axes.values())
+    hour = np.arange(Delta.shape[0])
+    Phi = dsp_price(hour, *(np.asarray(params[name])[..., None]
+                            for name in ("peak_Phi", "off_peak_Phi", "peak_start", "peak_end")))
+    Lambda = np.asarray(params["Lambda"])[..., None, None]
+    Mu = np.asarray(params["Mu"])[..., None]
+    # Static pricing charges the peak price all day
+    static_Phi = np.asarray(params["peak_Phi"])[..., None]
+    metrics = (sparse_hourly_metrics if sparse else hourly_metrics)(Delta, Lambda, Phi, Mu, static_Phi)
+    return {name: np.broadcast_to(values, shape + values.shape[-1:]).copy() for name, values in metrics.items()}
@@ -0,0 +1,220 @@
+import os
+import time
+import multiprocessing
+import numpy as np
+import instrumentation
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from sweep import sweep_utilities
+from sparse_demand import SparseDemand
+
+# Process-pool runner for parameter sweeps.
+#
+# The grid is split into chunks along one axis and each chunk is evaluated by `kernel`
+# (a module-level function kernel(Delta, axes, fixed) such as sweep.sweep_utilities or
+# sweep.sweep_hourly) in a worker process. Delta is placed in shared memory once and
+# attached by every worker, so tasks only pickle the axis values of their chunk. A sparse Delta
+# (sparse_demand.SparseDemand) is small by construction and is pickled once per worker instead.
+# Every cell is computed independently, so the merged result is bit-identical to a serial run.
+#
+# With a result_cache.ResultCache, cells already in the cache are read back and only the
+# missing ones are computed: the smallest slab of the grid (along one axis) covering them.
+# Chunks are stored as they finish, so an interrupted sweep resumes from the last chunk and an
+# extended grid only computes its new rows. Serial sweeps are chunked too (about 4 chunks per
+# worker, at most max_chunk_values axis values each), so there is always a chunk to resume from.
+
+max_chunk_values = 256          # split-axis values per default chunk
+_worker_Delta = None
+_worker_memory = None
+
+
+def _attach_demand(name, shape, dtype):
+    # Worker initializer: read-only view of the shared demand matrix
+    global _worker_Delta, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_Delta = np.ndarray(shape, dtype=dtype, buffer=_worker_memory.buf)
+    _worker_Delta.flags.writeable = False
+
+
+def _set_demand(Delta):
+    global _worker_Delta
+    _worker_Delta = Delta
+
+
+def _run_chunk(kernel, axes, fixed, Delta=None):
+    start = time.perf_counter()
+    result = kernel(_worker_Delta if Delta is None else Delta, axes, fixed)
+    return result, time.perf_counter() - start, os.getpid()
+
+
+def pool_context():
+    # The simulation scripts have no __main__ guard, so prefer fork over re-importing them
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def default_chunk_size(length, workers):
+    return max(1, min(-(-length // (4 * workers)), max_chunk_values))
+
+
+def chunk_axes(axes, split_axis, chunk_size):
+    # (start, stop, axes) per chunk of `split_axis`, in order
+    values = np.asarray(axes[split_axis])
+    for start in range(0, len(values), chunk_size):
+        chunk = dict(axes)
+        chunk[split_axis] = values[start:start + chunk_size]
+        yield start, min(start + chunk_size, len(values)), chunk
+
+
+def merge_chunks(results, dimension):
+    # Concatenate chunk results (an array, a tuple of arrays or a dict of arrays) along `dimension`
+    first = results[0]
+    if isinstance(first, dict):
+        return {name: np.concatenate([r[name] for r in results], axis=dimension) for name in first}
+    if isinstance(first, tuple):
+        return tuple(np.concatenate(parts, axis=dimension) for parts in zip(*results))
+    return np.concatenate(results, axis=dimension)
+
+
+def _missing_slab(missing):
+    # (dimension, indices) of the fewest cells along one axis that cover every missing cell
+    best = None
+    for dimension in range(missing.ndim):
+        others = tuple(k for k in range(missing.ndim) if k != dimension)
+        indices = np.flatnonzero(np.any(missing, axis=others))
+        cells = len(indices) * missing.size // missing.shape[dimension]
+        if best is None or cells < best[0]:
+            best = (cells, dimension, indices)
+    return best[1], best[2]
+
+
+def _cell_index(shape, dimension, indices):
+    # Flat C-order indices of the grid cells of `shape` whose `dimension` coordinate is in `indices`
+    grid = np.arange(int(np.prod(shape))).reshape(shape)
+    return np.take(grid, indices, axis=dimension).ravel()
+
+
+def _report_chunks(result, axes, split_axis, chunk_size, workers, on_chunk):
+    # on_chunk(start, stop, result) per chunk of `split_axis` of an assembled (cached) result
+    dimension = list(axes).index(split_axis)
+    chunk_size = chunk_size or default_chunk_size(len(axes[split_axis]), workers or os.cpu_count() or 1)
+    for start, stop, _ in chunk_axes(axes, split_axis, chunk_size):
+        index = (slice(None),) * dimension + (slice(start, stop),)
+        if isinstance(result, dict):
+            on_chunk(start, stop, {name: values[index] for name, values in result.items()})
+        elif isinstance(result, tuple):
+            on_chunk(start, stop, tuple(values[index] for values in result))
+        else:
+            on_chunk(start, stop, result[index])
+
+
+def _run_cached_sweep(Delta, axes, fixed, kernel, workers, chunk_size, split_axis, cache, on_chunk):
+    from result_cache import cell_keys, pack_cells, unpack_cells, output_layout, empty_result
+    shape = tuple(len(values) for values in axes.values())
+    sweep_id, keys = cell_keys(Delta, axes, fixed, kernel)
+    found = cache.get_many(keys)
+    layout = cache.layout(sweep_id)
+    if layout is None:
+        found = {}
+    missing = np.array([key not in found for key in keys]).reshape(shape)
+    instrumentation.count("result_cache_hits", int(missing.size - np.sum(missing)))
+    instrumentation.count("result_cache_misses", int(np.sum(missing)))
+    if not missing.any():
+        result = unpack_cells([found[key] for key in keys], layout, shape)
+        if on_chunk:
+            _report_chunks(result, axes, split_axis, chunk_size, workers, on_chunk)
+        return result, []
+
+    dimension, indices = _missing_slab(missing)
+    name = list(axes)[dimension]
+    sub_axes = dict(axes)
+    sub_axes[name] = np.asarray(axes[name])[indices]
+    sub_keys = [keys[k] for k in _cell_index(shape, dimension, indices)]
+    sub_shape = tuple(len(values) for values in sub_axes.values())
+
+    def checkpoint(start, stop, result):
+        # Store a finished chunk [start, stop) of the missing axis values, cells in C order of the chunk
+        chunk_index = _cell_index(sub_shape, dimension, np.arange(start, stop))
+        cache.put_many(sweep_id, [sub_keys[k] for k in chunk_index], pack_cells(result, len(shape)),
+                       output_layout(result, len(shape)))
+
+    computed, timings = run_sweep(Delta, sub_axes, fixed, kernel, workers, chunk_size, name, on_chunk=checkpoint)
+    result = empty_result(output_layout(computed, len(shape)), shape)
+    cached = [k for k, key in enumerate(keys) if key in found]
+    if cached:
+        values = unpack_cells([found[keys[k]] for k in cached], layout, (len(cached),))
+        for target, part in zip(_as_list(result), _as_list(values)):
+            target.reshape((-1,) + part.shape[1:])[cached] = part
+    for target, values in zip(_as_list(result), _as_list(computed)):
+        target[(slice(None),) * dimension + (indices,)] = values
+    if on_chunk:
+        _report_chunks(result, axes, split_axis, chunk_size, workers, on_chunk)
+    return result, timings
+
+
+def _as_list(result):
+    if isinstance(result, dict):
+        return list(result.values())
+    return list(result) if isinstance(result, tuple) else [result]
+
+
+def run_sweep(Delta, axes, fixed=None, kernel=sweep_utilities, workers=None, chunk_size=None, split_axis=None,
+              cache=None, on_chunk=None):
+    # Returns (merged result, per-chunk timings). workers=1 runs in-process without a pool.
+    # split_axis defaults to the longest axis; chunk_size to about 4 chunks per worker (default_chunk_size).
+    # cache: a result_cache.ResultCache to reuse cells; on_chunk(start, stop, result) is called per finished
+    # chunk, and with a cache per chunk of the assembled result once cached and computed cells are merged.
+    if not isinstance(Delta, SparseDemand):
+        Delta = np.ascontiguousarray(Delta, dtype=np.float64)
+    split_axis = split_axis or max(axes, key=lambda name: len(axes[name]))
+    if cache is not None:
+        return _run_cached_sweep(Delta, axes, fixed, kernel, workers, chunk_size, split_axis, cache, on_chunk)
+    workers = workers or os.cpu_count() or 1
+    dimension = list(axes).index(split_axis)
+    if not chunk_size:
+        chunk_size = default_chunk_size(len(axes[split_axis]), workers)
+    chunks = list(chunk_axes(axes, split_axis, chunk_size))
+    instrumentation.count("grid_cells", int(np.prod([len(values) for values in axes.values()])))
+    instrumentation.count("sweep_chunks", len(chunks))
+
+    with instrumentation.stage("sweep"):
+        if workers == 1:
+            outputs = []
+            for start, stop, chunk in chunks:
+                outputs.append(_run_chunk(kernel, chunk, fixed, Delta))
+                if on_chunk:
+                    on_chunk(start, stop, outputs[-1][0])
+        else:
+            memory = None
+            if isinstance(Delta, SparseDemand):
+                initializer, initargs = _set_demand, (Delta,)
+            else:
+                memory = shared_memory.SharedMemory(create=True, size=max(Delta.nbytes, 1))
+                initializer, initargs = _attach_demand, (memory.name, Delta.shape, Delta.dtype)
+            try:
+                if memory is not None:
+                    np.ndarray(Delta.shape, dtype=Delta.dtype, buffer=memory.buf)[...] = Delta
+                with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(), initializer=initializer,
+                                         initargs=initargs) as pool:
+                    futures = [pool.submit(_run_chunk, kernel, chunk, fixed) for _, _, chunk in chunks]
+                    outputs = []
+                    for (start, stop, _), future in zip(chunks, futures):
+                        outputs.append(future.result())
+                        if on_chunk:
+                            on_chunk(start, stop, outputs[-1][0])
+            finally:
+                if memory is not None:
+                    memory.close()
+                    memory.unlink()
+
+    timings = [{"chunk": k, "start": start, "stop": stop, "seconds": seconds, "pid": pid}
+               for k, ((start, stop, _), (_, seconds, pid)) in enumerate(zip(chunks, outputs))]
+    return merge_chunks([result for result, _, _ in outputs], dimension), timings
+
+
+def print_timings(timings):
+    total = sum(t["seconds"] for t in timings)
+    for t in timings:
+        print(f"chunk {t['chunk']:4d} [{t['start']}:{t['stop']}] {t['seconds']:.4f}s pid={t['pid']}")
+    print(f"{len(timings)} chunks, {total:.4f}s of kernel time")
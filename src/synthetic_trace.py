@@ -0,0 +1,175 @@
+import argparse
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from demand_cache import trace_dir, write_raw_columns, finalize_trace
+
+# Synthetic invocation traces in the Azure Functions Invocation Trace 2021 schema
+# (app, func, end_timestamp, duration), written as CSV or straight into the columnar cache.
+#
+# Apps get heavy-tailed (Pareto) invocation volumes. Timestamps follow a diurnal hour-of-day
+# profile, and a `burstiness` fraction of each app's invocations is clustered around per-app
+# burst centres. Apps are split into fixed blocks with one seeded NumPy Generator stream per
+# block, so a block can be generated by any worker and the output does not depend on the
+# worker count. Rows are produced in chunks, so 1B-row traces never sit in memory.
+
+seconds_per_hour = 3600
+seconds_per_day = 86400
+default_days = 14
+default_chunk_rows = 1_000_000
+default_block_apps = 1_000      # apps per Generator stream / parallel task
+
+
+def diurnal_profile(peak_hour=14, amplitude=0.6):
+    # Hour-of-day weights: a cosine around peak_hour, amplitude 0 gives a flat day
+    hours = np.arange(24)
+    weights = 1 + amplitude * np.cos(2 * np.pi * (hours - peak_hour) / 24)
+    return weights / weights.sum()
+
+
+def app_volumes(rows, apps, seed=0, tail=1.2):
+    # Expected invocations per app: Pareto(tail) weights scaled to `rows` in total, Poisson counts
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(0,)))
+    weights = rng.pareto(tail, apps) + 1e-3
+    return rng.poisson(rows * weights / weights.sum())
+
+
+def sample_times(rng, size, profile, days):
+    # Day uniform, hour from the diurnal profile, uniform offset inside the hour
+    day = rng.integers(0, days, size)
+    hour = np.searchsorted(np.cumsum(profile), rng.random(size), side="right").clip(0, 23)
+    return day * seconds_per_day + hour * seconds_per_hour + rng.random(size) * seconds_per_hour
+
+
+def block_chunks(counts, block, block_apps=default_block_apps, seed=0, days=default_days, profile=None,
+                 burstiness=0.3, bursts_per_app=24, burst_width=60.0, chunk_rows=default_chunk_rows):
+    # Column chunks (app, end_timestamp, duration) for apps [block * block_apps, (block + 1) * block_apps)
+    profile = diurnal_profile() if profile is None else np.asarray(profile) / np.sum(profile)
+    first_app = block * block_apps
+    counts = np.asarray(counts[first_app:first_app + block_apps])
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1, block)))
+    centres = sample_times(rng, (len(counts), bursts_per_app), profile, days)
+    mean_duration = rng.lognormal(0.0, 1.0, len(counts))
+    ends = np.cumsum(counts)
+    horizon = days * seconds_per_day
+
+    for start in range(0, int(ends[-1]) if len(ends) else 0, chunk_rows):
+        rows = np.arange(start, min(start + chunk_rows, ends[-1]))
+        app = np.searchsorted(ends, rows, side="right")
+        n = len(rows)
+        end_timestamp = sample_times(rng, n, profile, days)
+        burst = rng.random(n) < burstiness
+        centre = centres[app, rng.integers(0, bursts_per_app, n)]
+        end_timestamp = np.where(burst, centre + rng.exponential(burst_width, n), end_timestamp) % horizon
+        duration = rng.exponential(mean_duration[app])
+        yield {"app": (app + first_app).astype(np.int32), "end_timestamp": end_timestamp, "duration": duration}
+
+
+def app_names(apps, first_app=0):
+    return [f"app{app:08d}" for app in range(first_app, apps)]
+
+
+def _write_csv_block(path, counts, block, options, header):
+    import pandas as pd
+    with open(path, "w") as f:
+        if header:
+            f.write("app,func,end_timestamp,duration\n")
+        first_app = block * options["block_apps"]
+        last_app = min(len(counts), first_app + options["block_apps"])
+        apps = np.array(app_names(last_app, first_app), dtype=object)
+        funcs = np.array([f"func{app}" for app in range(first_app, last_app)], dtype=object)
+        for columns in block_chunks(counts, block, **options):
+            local = columns["app"] - first_app
+            frame = pd.DataFrame({
+                "app": apps[local],
+                "func": funcs[local],
+                "end_timestamp": columns["end_timestamp"],
+                "duration": columns["duration"],
+            })
+            frame.to_csv(f, header=False, index=False, float_format="%.3f")
+    return path
+
+
+def _write_column_block(out_dir, counts, block, options):
+    return write_raw_columns(block_chunks(counts, block, **options), out_dir, suffix=f".{block:06d}.raw")
+
+
+def _run_blocks(task, blocks, workers):
+    from sweep_runner import pool_context
+    if workers == 1:
+        return [task(block) for block in blocks]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+        return list(pool.map(task, blocks))
+
+
+class _BlockTask:
+    # Picklable per-block job for the process pool
+    def __init__(self, kind, target, counts, options):
+        self.kind, self.target, self.counts, self.options = kind, target, counts, options
+
+    def __call__(self, block):
+        if self.kind == "csv":
+            path = f"{self.target}.part{block:06d}" if block else self.target
+            return _write_csv_block(path, self.counts, block, self.options, header=block == 0)
+        return _write_column_block(self.target, self.counts, block, self.options)
+
+
+def _blocks(apps, block_apps):
+    return range(-(-apps // block_apps))
+
+
+def generate_csv(path, rows, apps, seed=0, workers=1, **options):
+    # Azure-schema CSV; each app block is written to its own part and the parts are appended in order
+    options.setdefault("block_apps", default_block_apps)
+    options["seed"] = seed
+    counts = app_volumes(rows, apps, seed)
+    parts = _run_blocks(_BlockTask("csv", path, counts, options), _blocks(apps, options["block_apps"]), workers)
+    with open(path, "ab") as f:
+        for part in parts[1:]:
+            with open(part, "rb") as src:
+                while True:
+                    data = src.read(1 << 24)
+                    if not data:
+                        break
+                    f.write(data)
+            os.remove(part)
+    return int(counts.sum())
+
+
+def generate_columns(rows, apps, cache=None, seed=0, workers=1, **options):
+    # Columnar cache (demand_cache layout), app codes are the synthetic app ids
+    options.setdefault("block_apps", default_block_apps)
+    options["seed"] = seed
+    out_dir = trace_dir(cache)
+    os.makedirs(out_dir, exist_ok=True)
+    counts = app_volumes(rows, apps, seed)
+    blocks = _blocks(apps, options["block_apps"])
+    _run_blocks(_BlockTask("columns", out_dir, counts, options), blocks, workers)
+    return finalize_trace(out_dir, app_names(apps), [f".{block:06d}.raw" for block in blocks])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Azure Functions invocation trace")
+    parser.add_argument("--rows", type=float, default=1e6, help="expected number of invocations")
+    parser.add_argument("--apps", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=default_days)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--burstiness", type=float, default=0.3)
+    parser.add_argument("--peak-hour", type=int, default=14)
+    parser.add_argument("--amplitude", type=float, default=0.6, help="diurnal amplitude, 0 for a flat day")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--csv", help="write an Azure-schema CSV to this path")
+    parser.add_argument("--cache", help="write the columnar cache to this directory")
+    args = parser.parse_args(argv)
+
+    options = {"days": args.days, "burstiness": args.burstiness,
+               "profile": diurnal_profile(args.peak_hour, args.amplitude)}
+    if args.csv:
+        print(generate_csv(args.csv, int(args.rows), args.apps, args.seed, args.workers, **options), "rows written to", args.csv)
+    if args.cache or not args.csv:
+        rows = generate_columns(int(args.rows), args.apps, args.cache, args.seed, args.workers, **options)
+        print(rows, "rows written to", trace_dir(args.cache))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Streaming ingestion of the Azure Functions Invocation Trace 2021
+# https://github.com/Azure/AzurePublicDataset/blob/master/AzureFunctionsInvocationTrace2021.md
+# Columns: app, func, end_timestamp, duration
+#
+# A trace can be one file or a list / glob of files (read in that order, as if concatenated),
+# plain or compressed (.gz, .bz2, .xz, .zip, .zst, inferred by pandas from the extension).
+# Several files are parsed in parallel, one worker per file, and each worker returns a
+# PartialCounts: sparse (time bucket x app) counts keyed by app ID, plus the position of each
+# app's first invocation. merge_partials is associative and commutative, so the merged counts,
+# and the "first N unique apps" picked from them, equal serial ingestion of the same files.
+
+hours_per_day = 24
+seconds_per_hour = 3600
+default_chunksize = 1_000_000   # rows per chunk, bounds peak memory
+position_bits = 40              # first_seen = file index << position_bits | row in file
+step_bits = 32                  # cell key = step << step_bits | app
+
+# apps: app IDs sorted by name; first_seen: position of each app's first row; step, app, count:
+# non-zero cells sorted by (step, app), app indexes into apps
+PartialCounts = namedtuple("PartialCounts", ["apps", "first_seen", "step", "app", "count"])
+
+
+def hour_of_day(end_timestamp):
+    # floor(t / 3600) mod 24 == pd.to_datetime(t, unit='s').dt.hour
+    hours = np.floor_divide(np.asarray(end_timestamp, dtype=np.float64), seconds_per_hour)
+    return np.mod(hours, hours_per_day).astype(np.int64)
+
+
+def read_trace_chunks(path, columns=("app", "end_timestamp"), chunksize=default_chunksize):
+    # Only the requested columns are parsed, one chunk at a time
+    return pd.read_csv(path, usecols=list(columns), chunksize=chunksize)
+
+
+def trace_files(paths):
+    # Files of a trace given as a path, a glob or a list of either, in the given (glob: sorted) order
+    files = []
+    for path in [paths] if isinstance(paths, (str, os.PathLike)) else paths:
+        path = os.fspath(path)
+        files += sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+    if not files:
+        raise FileNotFoundError(f"No trace files match {paths!r}")
+    return files
+
+
+def _reduce_cells(key, count):
+    # Sum the counts of equal cell keys, sorted by key
+    if not len(key):
+        return key, count
+    order = np.argsort(key, kind="stable")
+    key, count = key[order], count[order]
+    starts = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+    return key[starts], np.add.reduceat(count, starts)
+
+
+def _partial(apps, first_seen, key, count):
+    # PartialCounts with apps sorted by name and cells keyed by sorted app index
+    apps = np.asarray(apps, dtype=object)
+    order = np.argsort(apps, kind="stable")
+    rank = np.empty(len(apps), dtype=np.int64)
+    rank[order] = np.arange(len(apps))
+    key, count = _reduce_cells((key >> step_bits << step_bits) | rank[key & ((1 << step_bits) - 1)], count)
+    return PartialCounts(apps[order], np.asarray(first_seen, dtype=np.int64)[order],
+                         key >> step_bits, key & ((1 << step_bits) - 1), count)
+
+
+def partial_counts(path, file_index=0, bucket_seconds=seconds_per_hour, chunksize=default_chunksize):
+    # (bucket x app) counts of every app in one trace file, one chunk at a time
+    app_index = {}
+    first_seen = []
+    key = np.zeros(0, dtype=np.int64)
+    count = np.zeros(0, dtype=np.int64)
+    row = 0
+    for chunk in read_trace_chunks(path, chunksize=chunksize):
+        codes, uniques = pd.factorize(chunk["app"])
+        _, first_rows = np.unique(codes, return_index=True)
+        for app, first_row in zip(uniques, first_rows):
+            if app not in app_index:
+                app_index[app] = len(app_index)
+                first_seen.append((file_index << position_bits) | (row + int(first_row)))
+        local = np.array([app_index[app] for app in uniques], dtype=np.int64)[codes]
+        step = np.floor_divide(chunk["end_timestamp"].to_numpy(np.float64), bucket_seconds).astype(np.int64)
+        cells, cell_counts = np.unique((step << step_bits) | local, return_counts=True)
+        key, count = _reduce_cells(np.concatenate([key, cells]), np.concatenate([count, cell_counts]))
+        row += len(chunk)
+    return _partial(list(app_index), first_seen, key, count)
+
+
+def merge_partials(partials):
+    # One PartialCounts from several: counts of the same (bucket, app ID) add up, first_seen is the earliest
+    partials = list(partials)
+    names = np.concatenate([part.apps for part in partials])
+    apps, inverse = np.unique(names, return_inverse=True) if len(names) else (names, np.zeros(0, dtype=np.intp))
+    first_seen = np.full(len(apps), np.iinfo(np.int64).max)
+    np.minimum.at(first_seen, inverse, np.concatenate([part.first_seen for part in partials]))
+    offsets = np.cumsum([0] + [len(part.apps) for part in partials])
+    key = np.concatenate([(part.step << step_bits) | inverse[offset:][part.app]
+                          for part, offset in zip(partials, offsets)])
+    key, count = _reduce_cells(key, np.concatenate([part.count for part in partials]))
+    return PartialCounts(apps, first_seen, key >> step_bits, key & ((1 << step_bits) - 1), count)
+
+
+def ingest_partials(paths, bucket_seconds=seconds_per_hour, workers=None, chunksize=default_chunksize):
+    # Merged PartialCounts of all files, parsed by `workers` processes (one file per task)
+    from sweep_runner import pool_context
+    files = trace_files(paths)
+    task = partial(_partial_task, bucket_seconds=bucket_seconds, chunksize=chunksize)
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers == 1:
+        parts = [task(item) for item in enumerate(files)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            parts = list(pool.map(task, enumerate(files)))
+    return merge_partials(parts)
+
+
+def _partial_task(item, bucket_seconds, chunksize):
+    file_index, path = item
+    return partial_counts(path, file_index, bucket_seconds, chunksize)
+
+
+def first_apps(partial_counts, number_of_apps=10, by="first", bucket_seconds=seconds_per_hour):
+    # Indexes into partial_counts.apps of the first `number_of_apps` apps in trace order ("first"),
+    # or of the busiest apps by invocations ("count") or by peak-hour invocations ("peak", buckets
+    # must divide an hour); the partial holds every app, so these rankings are exact
+    if by == "first":
+        return np.argsort(partial_counts.first_seen, kind="stable")[:number_of_apps]
+    weights = partial_counts.count
+    if by == "peak":
+        from dsp_kernels import peak_start, peak_end
+        hour = hour_of_day(partial_counts.step * float(bucket_seconds))
+        weights = np.where((peak_start <= hour) & (hour < peak_end), weights, 0)
+    elif by != "count":
+        raise ValueError(f"Unknown app selection {by!r}")
+    volume = np.bincount(partial_counts.app, weights=weights, minlength=len(partial_counts.apps))
+    return np.argsort(-volume, kind="stable")[:number_of_apps]
+
+
+def partial_matrix(partial_counts, number_of_apps=10, steps=None, by="first", bucket_seconds=seconds_per_hour):
+    # Dense (bucket x app) counts of the selected apps (columns in selection order)
+    selected = first_apps(partial_counts, number_of_apps, by, bucket_seconds)
+    column = np.full(len(partial_counts.apps), -1, dtype=np.int64)
+    column[selected] = np.arange(len(selected))
+    keep = column[partial_counts.app] >= 0
+    if steps is None:
+        steps = int(partial_counts.step.max(initial=-1)) + 1
+    counts = np.zeros((steps, len(selected)), dtype=np.int64)
+    np.add.at(counts, (partial_counts.step[keep], column[partial_counts.app[keep]]), partial_counts.count[keep])
+    return counts, list(partial_counts.apps[selected])
+
+
+def parallel_invocation_counts(paths, number_of_apps=10, workers=None, chunksize=default_chunksize, by="first"):
+    # (hour of day x app) counts like stream_invocation_counts, for a list / glob of files in parallel
+    merged = ingest_partials(paths, seconds_per_hour, workers, chunksize)
+    hour = np.mod(merged.step, hours_per_day)
+    counts, apps = partial_matrix(merged._replace(step=hour), number_of_apps, hours_per_day, by)
+    return counts, apps
+
+
+def stream_invocation_counts(path, number_of_apps=10, chunksize=default_chunksize, apps=None):
+    # Running (hour x app) accumulator over the first `number_of_apps` unique apps in file order,
+    # or over the app IDs `apps` in that order
+    if apps is None:
+        apps = []
+    else:
+        apps = list(apps)
+        number_of_apps = len(apps)
+    app_index = {app: k for k, app in enumerate(apps)}
+    counts = np.zeros((hours_per_day, number_of_apps), dtype=np.int64)
+
+    for chunk in read_trace_chunks(path, chunksize=chunksize):
+        if len(apps) < number_of_apps:
+            for app in pd.unique(chunk["app"]):
+                if len(apps) == number_of_apps:
+                    break
+                if app not in app_index:
+                    app_index[app] = len(apps)
+                    apps.append(app)
+
+        column = chunk["app"].map(app_index)
+        selected = column.notna().to_numpy()
+        if not selected.any():
+            continue
+        column = column.to_numpy()[selected].astype(np.int64)
+        hour = hour_of_day(chunk["end_timestamp"].to_numpy()[selected])
+
+        cell = hour * number_of_apps + column
+        counts += np.bincount(cell, minlength=hours_per_day * number_of_apps).reshape(hours_per_day, number_of_apps)
+
+    return counts[:, :len(apps)], apps
+
+
+def invocation_matrix_from_counts(counts, apps):
+    # Same layout as df.groupby(["hour", "app"]).size().unstack(fill_value=0): apps sorted, 24 hour rows
+    matrix = pd.DataFrame(counts, index=pd.RangeIndex(hours_per_day, name="hour"),
+                          columns=pd.Index(apps, name="app"))
+    return matrix.sort_index(axis=1)
+
+
+def normalize_matrix(invocation_matrix):
+    # Min-max normalize each app column to 0–100, constant columns become 0
+    values = invocation_matrix.to_numpy(dtype=np.float64)
+    col_min = values.min(axis=0)
+    col_range = values.max(axis=0) - col_min
+    normalized = np.divide(100 * (values - col_min), col_range,
+                           out=np.zeros_like(values), where=col_range > 0)
+    return pd.DataFrame(normalized, index=invocation_matrix.index,
+                        columns=invocation_matrix.columns)
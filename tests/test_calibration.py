@@ -0,0 +1,22 @@
+import numpy as np
+from calibration import calibrate_lambda
+from dsp_kernels import dsp_price, optimal_consumption
+
+# Two weeks of the DSP tariff, apps responding in every hour (λ > 16.6667) or only off-peak
+Phi = dsp_price(np.arange(336) % 24, 16.6667, 8.333)
+rng = np.random.default_rng(4)
+Lambda = np.concatenate([rng.uniform(9, 16, 50), rng.uniform(17, 2000, 200)])
+Delta = optimal_consumption(Lambda[None, :], Phi[:, None])
+
+
+def test_round_trip_serial():
+    fit = calibrate_lambda(Delta, Phi)
+    assert np.allclose(fit.Lambda, Lambda)
+    assert np.all(fit.rmse < 1e-6 * Lambda)
+    assert np.array_equal(fit.responsive_hours[:50], np.full(50, 168))
+
+
+def test_round_trip_process_pool():
+    fit = calibrate_lambda(Delta, Phi, workers=2, block=64)
+    assert np.allclose(fit.Lambda, Lambda)
+    assert np.array_equal(fit.Lambda, calibrate_lambda(Delta, Phi, block=64).Lambda)
@@ -0,0 +1,17 @@
+import numpy as np
+from demand_cache import load_trace, build_rollups, build_sparse_series, fold_sparse_series, load_rollup, load_sparse_series
+from sparse_demand import to_dense
+from synthetic_trace import generate_columns
+
+
+def test_sparse_hour_of_day_matches_the_rollup(tmp_path):
+    cache = str(tmp_path)
+    generate_columns(50_000, 30, cache, days=2)
+    trace = load_trace(cache)
+    apps = np.array([3, 0, 7, 12, 25])
+    build_rollups(trace, buckets=(3600,), cache=cache, apps=apps)
+    build_sparse_series(trace, bucket_seconds=3600, cache=cache, apps=apps)
+    assert fold_sparse_series(cache) == 24
+    for normalized in (True, False):
+        sparse = load_sparse_series("hour_of_day", cache, normalized)
+        assert np.array_equal(to_dense(sparse), load_rollup("hour_of_day", cache, normalized))
@@ -0,0 +1,39 @@
+import numpy as np
+from dsp_kernels import provider_utility, optimal_consumption
+from equilibrium import stackelberg_equilibrium
+
+
+def grid_best(Lambda_hours, Mu, Phi_min=0.01, Phi_max=None):
+    # Dense φ grid argmax of the provider utility per hour
+    Phi_max = Phi_max or 1.5 * Lambda_hours.max()
+    Phi = np.linspace(Phi_min, Phi_max, 200_001)
+    utility = provider_utility(Phi[:, None, None], Lambda_hours[None], Mu)
+    return Phi[np.argmax(utility, axis=0)], utility.max(axis=0)
+
+
+def test_matches_a_dense_grid_for_mixed_profiles():
+    rng = np.random.default_rng(3)
+    # Mixed profiles: spread-out λ, one dominant client, identical clients
+    Lambda_hours = np.stack([rng.uniform(1, 300, 8), np.array([900.0] + [20.0] * 7), np.full(8, 120.0),
+                             rng.lognormal(4, 1, 8)])
+    result = stackelberg_equilibrium(Lambda_hours, 6)
+    Phi, best = grid_best(Lambda_hours, 6)
+    assert np.all(result["provider_utility"] >= best - 1e-9 * np.abs(best))
+    assert np.allclose(result["provider_utility"], best, rtol=1e-6)
+    assert np.allclose(result["Phi"], Phi, rtol=1e-3)
+    assert np.allclose(result["consumption"], optimal_consumption(Lambda_hours, result["Phi"][:, None]))
+
+
+def test_every_client_drops_out():
+    # μ above every λ: any price at which someone consumes loses money, θ = 0 with nobody consuming
+    Lambda_hours = np.array([[3.0, 5.0, 1.0]])
+    result = stackelberg_equilibrium(Lambda_hours, 6)
+    _, best = grid_best(Lambda_hours, 6)
+    assert result["provider_utility"][0] == 0
+    assert np.isclose(best[0], 0, atol=1e-9)
+    assert result["aggregate_consumption"][0] == 0
+    assert not result["consumption"].any()
+    # A price floor above every λ: same outcome
+    floor = stackelberg_equilibrium(np.array([[30.0, 50.0]]), 6, Phi_min=60)
+    assert floor["Phi"][0] >= 60
+    assert floor["provider_utility"][0] == 0 and floor["aggregate_consumption"][0] == 0
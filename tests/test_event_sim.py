@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import dsp_cli
+from event_sim import effective_mu
+from synthetic_trace import generate_columns
+
+stats = {"execution_seconds": np.array([100.0, 10.0, 0.0, 50.0]),
+         "cold_start_seconds": np.array([5.0, 2.0, 0.0, 0.0]),
+         "idle_seconds": np.array([1000.0, 5000.0, 3600.0, 200.0]),
+         "wait_seconds": np.array([0.0, 0.0, 0.0, 30.0])}
+
+
+@pytest.fixture(scope="module")
+def cache(tmp_path_factory):
+    cache = str(tmp_path_factory.mktemp("cache"))
+    generate_columns(200_000, 50, cache, days=2)
+    return cache
+
+
+def simulate(cache, *options):
+    args = dsp_cli.parse_args(["simulate", "--cache", cache] + list(options))
+    summary, _ = dsp_cli.run_simulate(args)
+    return args, summary
+
+
+def test_effective_mu():
+    # μ * (execution + cold start + 0.1 idle + wait) / execution, hours without executions keep μ
+    assert np.allclose(effective_mu(stats, Mu=6), 6 * np.array([205 / 100, 512 / 10, 1, 100 / 50]))
+    normalized = effective_mu(stats, Mu=6, normalize=True)
+    assert np.isclose(np.mean(normalized), 6)
+    assert np.argmax(normalized) == 1 and normalized[2] == 6
+
+
+def test_lightly_loaded_pool_stays_close_to_nominal_mu(cache):
+    args, summary = simulate(cache, "--capacity", "100000", "--idle-cost", "0")
+    assert summary["mean_wait"] == 0
+    assert np.all(np.array(summary["Mu"]) >= args.mu)
+    utility = np.array(summary["provider_utility"])
+    assert np.all(utility > 0)
+    assert np.allclose(utility, summary["provider_utility_nominal_mu"], rtol=0.05)
+
+
+def test_saturated_pool_costs_the_provider_more(cache):
+    _, light = simulate(cache, "--capacity", "100000", "--idle-cost", "0")
+    _, saturated = simulate(cache, "--capacity", "4", "--keep-alive", "1", "--idle-cost", "0")
+    assert saturated["mean_wait"] > 0 and saturated["cold_start_rate"] > light["cold_start_rate"]
+    assert np.mean(saturated["Mu"]) > 2 * np.mean(light["Mu"])
+    assert np.all(np.array(saturated["provider_utility"]) < np.array(light["provider_utility"]))
+    # Normalized, the saturated pool only moves cost between hours
+    args, normalized = simulate(cache, "--capacity", "4", "--keep-alive", "1", "--idle-cost", "0", "--normalize-mu")
+    assert np.isclose(np.mean(normalized["Mu"]), args.mu)
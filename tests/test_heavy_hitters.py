@@ -0,0 +1,49 @@
+import numpy as np
+from heavy_hitters import MisraGries
+
+rng = np.random.default_rng(5)
+stream = rng.zipf(1.3, 200_000) % 5_000
+true = np.bincount(stream, minlength=5_000)
+
+
+def check_bounds(sketch, capacity):
+    # counts <= true <= counts + total / (capacity + 1) for every key, kept or dropped
+    bound = sketch.total / (capacity + 1)
+    assert sketch.error <= bound
+    counts = np.zeros(len(true), dtype=np.int64)
+    counts[sketch.keys] = sketch.counts
+    assert np.all(counts <= true)
+    assert np.all(true <= counts + bound)
+
+
+def test_error_bound():
+    for capacity in (10, 100, 1_000):
+        sketch = MisraGries(capacity)
+        for start in range(0, len(stream), 7_000):
+            sketch.update(stream[start:start + 7_000])
+        assert sketch.total == len(stream)
+        assert len(sketch.keys) <= capacity
+        check_bounds(sketch, capacity)
+
+
+def test_merge():
+    capacity = 100
+    parts = [MisraGries(capacity) for _ in range(4)]
+    for k, start in enumerate(range(0, len(stream), 10_000)):
+        parts[k % 4].update(stream[start:start + 10_000])
+    merged = MisraGries(capacity)
+    for part in parts:
+        merged.merge(part)
+    assert merged.total == len(stream)
+    check_bounds(merged, capacity)
+    # The busiest keys are well separated and come out in order
+    keys, _ = merged.top(3)
+    assert list(keys) == list(np.argsort(-true, kind="stable")[:3])
+    # With room for every key nothing is subtracted and the counts are exact
+    exact = MisraGries(10_000)
+    for start in range(0, len(stream), 50_000):
+        part = MisraGries(10_000)
+        part.update(stream[start:start + 50_000])
+        exact.merge(part)
+    assert exact.error == 0 and merged.error > 0
+    assert np.array_equal(exact.keys, np.flatnonzero(true)) and np.array_equal(exact.counts, true[true > 0])
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from load_shifting import shift_demand
+
+rng = np.random.default_rng(2)
+Delta = rng.uniform(0, 50, (48, 6)) * (rng.random((48, 6)) < 0.7)
+Lambda = np.array([0.0, 40.0, 150.0, 400.0, 800.0, 2000.0])
+Phi = np.where((np.arange(48) % 24 >= 8) & (np.arange(48) % 24 < 20), 16.6667, 8.333) * rng.uniform(0.8, 1.2, 48)
+
+
+def test_daily_total_is_conserved():
+    shifted = shift_demand(Delta, Lambda, Phi, 0.3, window=24)
+    assert np.all(shifted >= 0.7 * Delta - 1e-12)
+    assert np.allclose(shifted.reshape(2, 24, -1).sum(axis=1), Delta.reshape(2, 24, -1).sum(axis=1))
+
+
+def test_no_flexibility_moves_nothing():
+    assert np.array_equal(shift_demand(Delta, Lambda, Phi, 0.0, window=24), Delta)
+    # One row of prices per policy
+    assert np.array_equal(shift_demand(Delta, Lambda, np.stack([Phi, 2 * Phi]), 0.0), np.stack([Delta, Delta]))
+
+
+def test_matches_a_constrained_optimizer():
+    optimize = pytest.importorskip("scipy.optimize")
+    flexibility = 0.5
+    day, prices = Delta[:24], Phi[:24]
+    shifted = shift_demand(day, Lambda, prices, flexibility)
+    for u in range(1, len(Lambda)):
+        floor, total = (1 - flexibility) * day[:, u], day[:, u].sum()
+
+        def utility(x):
+            return np.sum(Lambda[u] * np.log1p(x) - prices * x)
+        reference = optimize.minimize(lambda x: -utility(x), np.full(24, total / 24).clip(floor),
+                                      jac=lambda x: -(Lambda[u] / (1 + x) - prices), method="SLSQP",
+                                      bounds=[(low, None) for low in floor],
+                                      constraints=[{"type": "eq", "fun": lambda x: np.sum(x) - total}],
+                                      options={"ftol": 1e-12, "maxiter": 500})
+        assert utility(shifted[:, u]) >= utility(reference.x) - 1e-6 * max(1.0, abs(utility(reference.x)))
+        assert np.allclose(shifted[:, u], reference.x, atol=1e-3 * max(1.0, total))
@@ -0,0 +1,19 @@
+import numpy as np
+from monte_carlo import bootstrap
+
+rng = np.random.default_rng(7)
+Delta = rng.uniform(0, 100, (24, 10)) * (rng.random((24, 10)) < 0.8)
+series = rng.poisson(20, (72, 10))
+
+
+def test_same_seed_same_result_for_any_worker_count():
+    options = dict(replicates=2_500, seed=11, resample=("hours", "apps", "days"), series=series,
+                   Lambda_sigma=0.1, Mu_sigma=0.1)
+    serial = bootstrap(Delta, workers=1, **options)
+    for workers in (2, 3):
+        parallel = bootstrap(Delta, workers=workers, **options)
+        assert serial.keys() == parallel.keys()
+        for name in serial:
+            assert np.array_equal(serial[name], parallel[name]), name
+    other = bootstrap(Delta, workers=1, **dict(options, seed=12))
+    assert not np.array_equal(serial["provider_utility"], other["provider_utility"])
@@ -0,0 +1,40 @@
+import numpy as np
+from online_pricing import OnlinePricer
+
+
+def test_batch_wrapping_the_window_evicts_its_early_buckets():
+    batch = OnlinePricer(5, bucket_seconds=60, window_slots=3)
+    batch.add_batch([0, 0, 0], [0, 60, 240])
+    single = OnlinePricer(5, bucket_seconds=60, window_slots=3)
+    for app, end_timestamp in [(0, 0), (0, 60), (0, 240)]:
+        single.add(app, end_timestamp)
+    # Buckets 0 and 1 left the window of buckets 2..4
+    assert batch.stats()["window_invocations"] == 1
+    assert single.stats()["window_invocations"] == 1
+    assert np.array_equal(batch.app_counts, single.app_counts)
+    assert batch.slot_demand == single.slot_demand
+
+
+def test_batches_match_single_events():
+    rng = np.random.default_rng(0)
+    apps = rng.integers(0, 20, 5000)
+    end_timestamps = np.sort(rng.uniform(0, 86400, 5000))
+    batch = OnlinePricer(20, bucket_seconds=600, window_slots=6)
+    for start in range(0, 5000, 700):
+        batch.add_batch(apps[start:start + 700], end_timestamps[start:start + 700])
+    single = OnlinePricer(20, bucket_seconds=600, window_slots=6)
+    for app, end_timestamp in zip(apps, end_timestamps):
+        single.add(int(app), end_timestamp)
+    assert batch.stats() == single.stats()
+    assert np.array_equal(batch.app_counts, single.app_counts)
+    assert np.allclose(batch.slot_demand, single.slot_demand)
+    assert batch.adaptive_quote(86400) == single.adaptive_quote(86400)
+
+
+def test_out_of_range_app_codes_are_dropped():
+    pricer = OnlinePricer(3)
+    pricer.add(-1, 10.0)
+    pricer.add(3, 10.0)
+    pricer.add_batch([-1, 3], [10.0, 10.0])
+    assert pricer.events == 0
+    assert pricer.app_counts.sum() == 0
@@ -0,0 +1,40 @@
+import numpy as np
+from dsp_kernels import hourly_metrics
+from price_index import price_response_index, indexed_hourly_metrics
+
+rng = np.random.default_rng(6)
+
+
+def check(Delta, Lambda, Phi):
+    dense = hourly_metrics(Delta, Lambda, Phi, 6, 16.6667)
+    indexed = indexed_hourly_metrics(price_response_index(Delta, Lambda), Phi, 6, 16.6667)
+    assert np.array_equal(indexed["client_count"], dense["client_count"])
+    for name in dense:
+        assert np.allclose(indexed[name], dense[name], rtol=1e-9, atol=1e-6), name
+
+
+def test_matches_dense_hourly_metrics():
+    Delta = rng.uniform(0, 100, (24, 40)) * (rng.random((24, 40)) < 0.6)
+    Phi = rng.uniform(2, 60, (5, 24))
+    check(Delta, rng.uniform(10, 1500, 40), Phi)                 # λ per client
+    check(Delta, rng.uniform(10, 1500, (24, 40)), Phi)           # λ per hour and client
+    check(Delta, 800, Phi)                                       # uniform λ
+
+
+def test_prices_at_a_break_even_value():
+    # δ and λ powers of two keep λ log(1 + δ) / δ and δ φ exact, so the dense kernel sees utility
+    # exactly 0 at the break-even price: that client must not take part in either kernel
+    Delta = 2.0 ** rng.integers(0, 6, (24, 30)) * (rng.random((24, 30)) < 0.7)
+    Delta[:, 0] = 4.0
+    Lambda = 2.0 ** rng.integers(5, 11, 30)
+    Phi = rng.uniform(2, 60, (3, 24))
+    hours = np.arange(24)
+    Phi[0] = Lambda[0] * np.log(1 + Delta[:, 0]) / Delta[:, 0]
+    client = rng.integers(0, 30, 24)
+    Delta[hours, client] = 2.0
+    Phi[1] = Lambda[client] * np.log(1 + Delta[hours, client]) / Delta[hours, client]
+    dense = hourly_metrics(Delta, Lambda, Phi, 6, 16.6667)
+    assert np.all(dense["client_count"][0] < np.count_nonzero(Delta, axis=1))
+    check(Delta, Lambda, Phi)
+    # A hair below the break-even price the client takes part again
+    check(Delta, Lambda, np.nextafter(Phi, 0))
@@ -0,0 +1,27 @@
+import numpy as np
+from pricing_policies import tiered, evaluate_policies
+
+
+def test_tiered_with_a_block_of_price_rows():
+    Delta = np.random.default_rng(0).uniform(0, 100, (24, 10))
+    prices = np.array([[8.0, 12.0, 16.0], [9.0, 13.0, 17.0]])
+    Phi = tiered([300, 600], prices)(Delta)
+    assert Phi.shape == (2, 24)
+    for row, row_prices in zip(Phi, prices):
+        assert np.array_equal(row, tiered([300, 600], row_prices)(Delta))
+
+
+def test_tiered_with_a_block_of_thresholds():
+    Delta = np.random.default_rng(1).uniform(0, 100, (24, 10))
+    thresholds = np.array([[300.0, 600.0], [450.0, 550.0], [0.0, 1e9]])
+    Phi = tiered(thresholds, [8.0, 12.0, 16.0])(Delta)
+    assert Phi.shape == (3, 24)
+    for row, row_thresholds in zip(Phi, thresholds):
+        assert np.array_equal(row, tiered(row_thresholds, [8.0, 12.0, 16.0])(Delta))
+    result = evaluate_policies({"tiered": tiered(thresholds, [8.0, 12.0, 16.0])}, Delta)
+    assert result["names"] == ["tiered[0]", "tiered[1]", "tiered[2]"]
+
+
+def test_tiered_lowest_tier_before_lag():
+    Delta = np.full((6, 2), 100.0)
+    assert np.array_equal(tiered([150], [5.0, 9.0], lag=2)(Delta), [5, 5, 9, 9, 9, 9])
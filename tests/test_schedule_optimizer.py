@@ -0,0 +1,51 @@
+import itertools
+import numpy as np
+from dsp_kernels import dsp_price
+from schedule_optimizer import slot_table, optimize_schedule, evaluate_schedules, schedule_totals
+
+rng = np.random.default_rng(1)
+Delta = rng.uniform(0, 100, (24, 12)) * (rng.random((24, 12)) < 0.8)
+Lambda = rng.uniform(100, 1200, 12)
+prices = np.array([6.0, 9.0, 13.0, 18.0, 26.0])
+
+
+def brute_force(table, min_savings=None, min_participation=None):
+    # Best θ of every schedule on the price grid that meets the constraints
+    slots = table.provider_utility.shape[1]
+    levels = np.array(list(itertools.product(range(len(table.prices)), repeat=slots)))
+    theta, cost, count = schedule_totals(table, levels)
+    ok = np.ones(len(levels), dtype=bool)
+    if min_savings is not None:
+        ok &= cost <= table.total_cost_static * (1 - min_savings / 100) + 1e-9
+    if min_participation is not None:
+        ok &= count >= min_participation * table.client_hours
+    return theta[ok].max()
+
+
+def test_small_instance_matches_brute_force():
+    # 4 slots of 6 hours each, 5^4 schedules
+    table = slot_table(Delta, Lambda, 6, 16.6667, prices, slots=4)
+    for constraints in ({}, {"min_savings": 30}, {"min_participation": 0.99}, {"min_savings": 20, "min_participation": 0.98}):
+        fit = optimize_schedule(table, **constraints)
+        assert fit.feasible
+        assert np.isclose(fit.provider_utility, brute_force(table, **constraints))
+
+
+def test_constraints_hold_on_the_demand_matrix():
+    table = slot_table(Delta, Lambda, 6, 16.6667, np.arange(4.0, 40.5, 0.5))
+    for tiers in (None, 3):
+        fit = optimize_schedule(table, min_savings=25, min_participation=0.95, tiers=tiers)
+        assert fit.feasible
+        totals = evaluate_schedules(Delta, fit.Phi, Lambda, 6, 16.6667)
+        assert totals["cost_savings"][0] >= 25 - 1e-9
+        assert totals["participation"][0] >= 0.95 * np.count_nonzero(Delta > 0)
+        assert np.isclose(totals["provider_utility"][0], fit.provider_utility)
+
+
+def test_two_tiers_reproduce_the_dsp_split():
+    # Uniform λ per hour with the unconstrained optimum φ* = sqrt(μλ) at the DSP prices
+    peak = (np.arange(24) >= 8) & (np.arange(24) < 20)
+    Lambda_hours = np.where(peak, 16.6667 ** 2 / 6, 8.333 ** 2 / 6)[:, None] * np.ones(12)
+    table = slot_table(Delta, Lambda_hours, 6, 16.6667, [4.0, 8.333, 12.0, 16.6667, 24.0])
+    fit = optimize_schedule(table, tiers=2)
+    assert np.array_equal(fit.Phi, dsp_price(np.arange(24), 16.6667, 8.333))
@@ -0,0 +1,37 @@
+import numpy as np
+from result_cache import ResultCache, kernel_id, module_hash
+from sweep import sweep_utilities
+from sweep_runner import run_sweep
+
+Delta = np.random.default_rng(0).uniform(0, 100, (24, 10))
+axes = {"Lambda": np.linspace(100, 2000, 40), "Mu": np.linspace(1, 12, 6)}
+
+
+def test_serial_sweep_is_checkpointed_in_chunks():
+    chunks = []
+    result, timings = run_sweep(Delta, axes, workers=1, on_chunk=lambda start, stop, _: chunks.append((start, stop)))
+    assert len(timings) > 1
+    assert chunks == [(t["start"], t["stop"]) for t in timings]
+    whole, _ = run_sweep(Delta, axes, workers=1, chunk_size=len(axes["Lambda"]))
+    for part, expected in zip(result, whole):
+        assert np.array_equal(part, expected)
+
+
+def test_cache_hits_are_reported_per_chunk(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    computed, _ = run_sweep(Delta, axes, workers=1, cache=cache)
+    chunks = {}
+    cached, timings = run_sweep(Delta, axes, workers=1, cache=cache,
+                                on_chunk=lambda start, stop, result: chunks.update({(start, stop): result}))
+    assert timings == []
+    assert sorted(chunks)[0][0] == 0 and sorted(chunks)[-1][1] == len(axes["Lambda"])
+    for (start, stop), result in chunks.items():
+        for part, expected in zip(result, computed):
+            assert np.array_equal(part, expected[start:stop])
+    for part, expected in zip(cached, computed):
+        assert np.array_equal(part, expected)
+
+
+def test_kernel_id_follows_the_source():
+    assert module_hash("sweep") in kernel_id(sweep_utilities)
+    assert len(module_hash("sweep")) == 16
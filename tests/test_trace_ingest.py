@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+from synthetic_trace import generate_csv
+from trace_ingest import parallel_invocation_counts, stream_invocation_counts
+
+
+def test_parallel_ingestion_matches_serial(tmp_path):
+    generated = str(tmp_path / "generated.csv")
+    generate_csv(generated, 20_000, 60, block_apps=16)
+    # Shuffle the rows so that apps are first seen in every part, not one block per part
+    rows = pd.read_csv(generated).sample(frac=1, random_state=0)
+    whole = str(tmp_path / "trace.csv")
+    rows.to_csv(whole, index=False)
+    parts = []
+    for k, (start, stop) in enumerate([(0, 3_000), (3_000, 9_000), (9_000, 9_001), (9_001, len(rows))]):
+        parts.append(str(tmp_path / f"part{k}.csv"))
+        rows.iloc[start:stop].to_csv(parts[-1], index=False)
+
+    for number_of_apps in (5, 25, 60):
+        serial_counts, serial_apps = stream_invocation_counts(whole, number_of_apps, chunksize=4_000)
+        for workers in (1, 2):
+            counts, apps = parallel_invocation_counts(parts, number_of_apps, workers=workers, chunksize=1_500)
+            # Same apps in the same first-seen order across files, same (hour, app) counts
+            assert list(apps) == list(serial_apps)
+            assert np.array_equal(counts, serial_counts)